@@ -5,132 +5,1006 @@ Created on Mon Aug  1 13:22:23 2022
 @author: chris
 """
 
-import pandas as pd
+import os
+import csv
+import json
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+import flask
 import dash
-from dash import html, dcc, dash_table
-from dash.dash_table.Format import Format, Scheme, Trim
-from dash.dependencies import Input, Output
-import yfinance as yf
-from datetime import date, timedelta
-import plotly.graph_objects as go
-
-# Import list of index tickers and index names from a .csv file
-index_list = pd.read_csv('Index_list.csv', header = None)
-index_dict = dict(index_list.values)
+# dash_table is imported by dash itself (dash 2.9.3: 4 ms of the 420 ms of 'import dash'), it
+# cannot be deferred by the app
+from dash import html, dcc, dash_table, ctx, no_update, Patch
+from dash.dash_table.Format import Format, Scheme
+from dash.dependencies import Input, Output, State
+from dash.exceptions import MissingCallbackContextException
+from datetime import date, datetime, timedelta
+from startup import lazy_import, prepare_imports, WarmUp
+from price_store import PriceStore
+from caching import LRUCache, dataframe_size
+from prefetch import PrefetchScheduler, FetchQueue
+from intraday import IntradayFeed
+from indicators import TechnicalIndicators, INDICATOR_PERIODS
+from forecasting import ForecastScheduler
+from metrics import MetricsRegistry, RequestProfiler, SIZE_BUCKETS
+from price_analytics import date_window_positions, price_extrema, summary_table_records, RollingStatistics, downsample_ohlc, lttb_positions
+from price_analytics import period_starts, align_closing_prices, rebase, return_correlation, asof_rates, convert_prices
+
+# pandas and the plotly figure classes are imported on first use (see startup.py), so the first
+# page can be served before they have been loaded
+prepare_imports()
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+go = lazy_import('plotly.graph_objects')
+
+# The ticker lists and the price store are found relative to this file, so the app can be started
+# from any directory
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Local price store: the full history of each ticker is downloaded once and kept on disk,
+# afterwards only the most recent bars are fetched once the cached data is older than
+# PRICE_STORE_MAX_STALENESS
+PRICE_STORE_DIR = os.path.join(APP_DIR, 'price_store')
+PRICE_STORE_MAX_STALENESS = timedelta(hours = 12)
+# 'float32' halves the memory used by the prices (summary table values are then rounded to
+# about 7 significant digits, at most 0.0024 off on an index level of 40,000)
+PRICE_STORE_PRICE_DTYPE = 'float64'
+price_store = PriceStore(PRICE_STORE_DIR, max_staleness = PRICE_STORE_MAX_STALENESS, price_dtype = PRICE_STORE_PRICE_DTYPE)
+
+# In-memory cache of per-ticker histories in front of the price store, shared by all
+# callbacks of this process (memory budget in bytes, time to live in seconds)
+TICKER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+TICKER_CACHE_TTL = 15 * 60
+ticker_cache = LRUCache(TICKER_CACHE_MAX_BYTES, TICKER_CACHE_TTL)
+
+# Instrumentation: latency of the chart callback stages and of the ticker data loads, callback
+# response sizes and cache statistics, served in the Prometheus text format on /metrics. The
+# instrumentation and status routes expose internal state, they are only served when the
+# DASHBOARD_STATUS_ROUTES environment variable is set to 1 (/ready is always served).
+STATUS_ROUTES_ENABLED = os.environ.get('DASHBOARD_STATUS_ROUTES', '0') == '1'
+metrics_registry = MetricsRegistry()
+stage_seconds = metrics_registry.histogram('dashboard_stage_seconds', 'Latency of the chart callback stages in seconds', ['panel', 'stage'])
+ticker_data_seconds = metrics_registry.histogram('dashboard_ticker_data_seconds', 'Latency of ticker data loads (get_stock_ticker_data calls and background downloads) in seconds')
+price_store_seconds = metrics_registry.histogram('dashboard_price_store_seconds', 'Latency of price store loads (cache misses, downloads included) in seconds')
+request_seconds = metrics_registry.histogram('dashboard_callback_request_seconds', 'Latency of Dash callback requests in seconds', ['output'])
+response_bytes = metrics_registry.histogram('dashboard_callback_response_bytes', 'Size of Dash callback responses in bytes', ['output'], buckets = SIZE_BUCKETS)
+metrics_registry.collected('dashboard_ticker_cache_requests_total', 'Ticker cache lookups by result', 'counter',
+                           lambda: {(result,):ticker_cache.stats()[result] for result in ['hits', 'misses', 'coalesced']}, ['result'])
+metrics_registry.collected('dashboard_ticker_cache_evictions_total', 'Ticker cache evictions', 'counter',
+                           lambda: {():ticker_cache.stats()['evictions']})
+metrics_registry.collected('dashboard_ticker_cache_bytes', 'Memory used by the ticker cache in bytes', 'gauge',
+                           lambda: {():ticker_cache.stats()['bytes']})
+metrics_registry.collected('dashboard_chart_cache_requests_total', 'Chart pipeline result cache lookups by result', 'counter',
+                           lambda: {(result,):price_chart_cache.stats()[result] for result in ['hits', 'misses']}, ['result'])
+metrics_registry.collected('dashboard_chart_cache_bytes', 'Memory used by the chart pipeline result cache in bytes', 'gauge',
+                           lambda: {():price_chart_cache.stats()['bytes']})
+
+# Per-request profiling (set the DASHBOARD_PROFILING environment variable to 1 to enable): requests
+# sent with an 'X-Profile: 1' header are run under cProfile and their hot spots are printed
+PROFILING_ENABLED = os.environ.get('DASHBOARD_PROFILING', '0') == '1'
+request_profiler = RequestProfiler()
+
+def read_ticker_list(file_name):
+    # (ticker, name, quote currency) rows of a ticker list .csv file (no header row)
+    with open(os.path.join(APP_DIR, file_name), newline = '') as ticker_file:
+        return [tuple(row) for row in csv.reader(ticker_file) if row]
+
+# Import list of index tickers, index names and quote currencies from a .csv file
+index_list = read_ticker_list('Index_list.csv')
+index_dict = {ticker_symbol:name for ticker_symbol, name, currency in index_list}
 index_dropdown_list = list({'label':index_dict[index_key],'value':index_key} for index_key in index_dict.keys())
 
-# Import list of stock tickers and company names from a .csv file
-stock_list = pd.read_csv('Stock_list.csv', header = None)
-stock_dict = dict(stock_list.values)
+# Import list of stock tickers, company names and quote currencies from a .csv file
+stock_list = read_ticker_list('Stock_list.csv')
+stock_dict = {ticker_symbol:name for ticker_symbol, name, currency in stock_list}
 stock_dropdown_list = list({'label':stock_dict[stock_key],'value':stock_key} for stock_key in stock_dict.keys())
 
+# Currency every stock & index is quoted in (ISO 4217 code, 'GBp' for prices quoted in pence)
+ticker_currencies = {ticker_symbol:currency for ticker_symbol, name, currency in stock_list + index_list}
+
+# The price store is shared by all worker processes on the host (e.g. under gunicorn), a scheduled
+# refresh is skipped if another worker refreshed the ticker less than SHARED_REFRESH_WINDOW ago
+SHARED_REFRESH_WINDOW = timedelta(minutes = 10)
+
+def load_ticker_data(ticker_symbol, force_refresh = False):
+    # Load a ticker from the price store (fetching new bars if needed) into the in-memory cache
+    if force_refresh:
+        ticker_data = price_store.refresh(ticker_symbol, refreshed_before = datetime.now() - SHARED_REFRESH_WINDOW)
+    else:
+        ticker_data = price_store.get(ticker_symbol)
+    ticker_cache.put(ticker_symbol, ticker_data)
+    return ticker_data
+
+# Warm up every stock & index at startup and refresh them after their exchange closes
+# (set the DASHBOARD_PREFETCH environment variable to 0 to disable)
+PREFETCH_ENABLED = os.environ.get('DASHBOARD_PREFETCH', '1') == '1'
+PREFETCH_MAX_WORKERS = 4
+prefetch_scheduler = PrefetchScheduler(list(stock_dict.keys()) + list(index_dict.keys()),
+                                       load_ticker_data,
+                                       max_workers = PREFETCH_MAX_WORKERS)
+
+# Downloads needed by the callbacks run on a background job queue, so a slow data source does not
+# hold up the web workers: the charts show a loading state and poll (every FETCH_POLL_INTERVAL ms)
+# until the data has arrived. Set the DASHBOARD_ASYNC_FETCH environment variable to 0 to download
+# within the callbacks instead.
+ASYNC_FETCH_ENABLED = os.environ.get('DASHBOARD_ASYNC_FETCH', '1') == '1'
+FETCH_MAX_WORKERS = 4
+FETCH_POLL_INTERVAL = 500
+
+def load_queued_ticker_data(ticker_symbol):
+    # Background download of a ticker requested by a callback, timed like get_stock_ticker_data
+    with ticker_data_seconds.time(), price_store_seconds.time():
+        return load_ticker_data(ticker_symbol)
+
+fetch_queue = FetchQueue(load_queued_ticker_data, max_workers = FETCH_MAX_WORKERS)
+
+# Price forecasts (see forecasting.py) are made by a batch process on a process pool, once the
+# prefetch has had time to load the histories and then every day after the histories have been
+# refreshed; the charts only look the stored forecasts up (set the DASHBOARD_FORECASTS environment
+# variable to 0 to disable the batch, forecasts already stored are still shown)
+FORECASTS_ENABLED = os.environ.get('DASHBOARD_FORECASTS', '1') == '1'
+FORECAST_MAX_WORKERS = 2
+forecast_scheduler = ForecastScheduler(price_store, max_workers = FORECAST_MAX_WORKERS)
+
+def get_stock_ticker_data_if_ready(ticker_symbol):
+    # Non-blocking version of get_stock_ticker_data: only the in-memory cache and the local price
+    # store are read. Returns None (and queues a download) if the ticker has not been stored yet;
+    # a stored history that is due for a refresh is served while the refresh runs in the background.
+    # Raises the exception of the last download if it failed.
+    stock_data = ticker_cache.get(ticker_symbol)
+    if stock_data is not None:
+        return stock_data
+    error = fetch_queue.take_error(ticker_symbol)
+    if error is not None:
+        raise error
+    stock_data = price_store.load(ticker_symbol)
+    if stock_data is None or not (prefetch_scheduler.is_loaded(ticker_symbol) or price_store.is_fresh(ticker_symbol)):
+        fetch_queue.submit(ticker_symbol)
+    if stock_data is not None:
+        # the history stored by a download that finished in the meantime is kept (and served)
+        stock_data = ticker_cache.setdefault(ticker_symbol, stock_data)
+    return stock_data
+
 def get_stock_ticker_data(ticker_symbol):
-    stock_data = yf.Ticker(ticker_symbol)
-    stock_data = stock_data.history(period = 'max')
-    stock_data.reset_index(inplace = True)
+    # Cached frames are shared between callbacks and must not be modified in place.
+    # Tickers already loaded by the prefetch scheduler are kept up to date in the background,
+    # so their stored history is served as is instead of blocking the callback on the network.
+    allow_stale = prefetch_scheduler.is_loaded(ticker_symbol)
+    def load_from_price_store(ticker_symbol):
+        with price_store_seconds.time():
+            return price_store.get(ticker_symbol, allow_stale = allow_stale)
+    with ticker_data_seconds.time():
+        stock_data = ticker_cache.get_or_load(ticker_symbol, load_from_price_store)
     return(stock_data)
 
+# Rolling statistics (moving averages, Bollinger bands) of the cached tickers per display currency,
+# kept up to date with the cached histories so changing the moving average period does not rescan
+# the history
+ROLLING_STATISTICS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+rolling_statistics_cache = LRUCache(ROLLING_STATISTICS_CACHE_MAX_BYTES, TICKER_CACHE_TTL, sizeof = lambda statistics: statistics.nbytes())
+
+BATCH_MAX_WORKERS = 8
+
+def load_ticker_data_batch(ticker_symbols, errors = None):
+    # Load several tickers at once: cached tickers are served from memory, the others are
+    # fetched concurrently. Returns {ticker: DataFrame} (tickers that could not be fetched are left out)
+    # in the currency the ticker is quoted in, London prices in pence (see quote_currency).
+    stock_data_dict = {}
+    missing_ticker_symbols = []
+    for ticker_symbol in ticker_symbols:
+        stock_data = ticker_cache.get(ticker_symbol)
+        if stock_data is None:
+            missing_ticker_symbols.append(ticker_symbol)
+        else:
+            stock_data_dict[ticker_symbol] = stock_data
+    fetched_data = price_store.get_many(missing_ticker_symbols, max_workers = BATCH_MAX_WORKERS, errors = errors)
+    for ticker_symbol, stock_data in fetched_data.items():
+        ticker_cache.put(ticker_symbol, stock_data)
+        stock_data_dict[ticker_symbol] = stock_data
+    return stock_data_dict
+
+def get_stock_ticker_data_batch(ticker_symbols, base_currency = 'local', errors = None):
+    # Batch version of the histories the charts show: {ticker: DataFrame} in the display currency
+    # (see display_currency, London prices in pounds), the FX rates needed are loaded in the same batch.
+    # Tickers that could not be fetched, or whose FX rates could not be, are left out; if an errors
+    # dict is given, the exception of every ticker (or FX ticker) that failed is stored in it.
+    currencies = {ticker_symbol:display_currency(ticker_symbol, base_currency) for ticker_symbol in ticker_symbols}
+    fx_symbols = {ticker_symbol:fx_ticker(ticker_symbol, currency) for ticker_symbol, currency in currencies.items()}
+    price_data_dict = load_ticker_data_batch(list(currencies) + sorted(set(fx_symbols.values()) - {None}), errors = errors)
+    stock_data_dict = {}
+    for ticker_symbol, currency in currencies.items():
+        fx_symbol = fx_symbols[ticker_symbol]
+        if ticker_symbol not in price_data_dict or (fx_symbol is not None and fx_symbol not in price_data_dict):
+            continue
+        stock_data_dict[ticker_symbol] = display_price_data(ticker_symbol, price_data_dict[ticker_symbol], currency, price_data_dict.get(fx_symbol))
+    return stock_data_dict
+
+# Long date ranges are downsampled before the figures are built (to about one point per horizontal
+# pixel of the chart), the summary tables always use the full resolution data
+DOWNSAMPLE_TARGET_POINTS = 800
+
+def downsample_plot_data(plot_data, plot_type):
+    # Weekly / monthly / ... candles for candlestick plots, LTTB for closing price lines.
+    # Also returns the row positions the points were taken from, to sample other series alike.
+    if (plot_type == 'candle'):
+        return downsample_ohlc(plot_data, DOWNSAMPLE_TARGET_POINTS)
+    sample_positions = lttb_positions(plot_data['Date'].to_numpy().astype(np.int64), plot_data['Close'].to_numpy(), DOWNSAMPLE_TARGET_POINTS)
+    return plot_data.iloc[sample_positions], sample_positions
+
 def stock_chart_title(ticker_symbol):
     # Convert the stock ticker to a descriptive name using stock dictionary
     stock_label = stock_dict.get(ticker_symbol, 'Uh-oh, something went wrong')
     return stock_label
     
-def stock_chart_y_label(ticker_symbol):
-    # Set stock price chart y-axis (currency) label
-    match ticker_symbol:
-        case 'BAS.DE' | 'AI.PA' | 'BAYN.DE' | 'EVK.DE' | 'LIN.DE' | 'OR.PA':
-            return 'Price (€)'
-        case 'BP.L'| 'JMAT.L' | 'SHEL.L':
-            return 'Price (£)'
-        case '4911.T' | '4042.T' | '4005.T' | '600028.SS' | '601857.SS':
-            return 'Price (¥)'
-        case 'NESN.SW' | 'ROG.SW':
-            return 'Price (CHF)' # Swiss Francs
-        case '0386.HK' | '0857.HK':
-            return 'Price (HK$)'
-        case _:
-            return 'Price ($)'
-
 def index_chart_title(ticker_symbol):
     # Convert the index ticker to a descriptive name using index dictionary
     index_label = index_dict.get(ticker_symbol, 'Uh-oh, something went wrong')
     return index_label
         
-def index_chart_y_label(ticker_symbol):
-    # Set index price chart y-axis (currency) label
-    match ticker_symbol:
-        case '^GDAXI':
-            return 'Price (€)'
-        case '^FTSE':
-            return 'Price (£)'
-        case '^N225' | '000001.SS' | '000300.SS':
-            return 'Price (¥)'
-        case '^HSI':
-            return 'Price (HK$)'
-        case _:
-            return 'Price ($)'
-        
-def construct_data_table(summary_data_max_high,summary_data_max_close,summary_data_min_close,summary_data_min_low,y_label):
-    for max_high in range(0,len(summary_data_max_high)):
-        # iterate through high price maxima
-        if max_high == 0:
-            # if only one maxima / first maxima
-            max_high_data = pd.DataFrame(data = {' ':'Maximum Price',
-                                                  'Date':summary_data_max_high.loc[max_high,'Date'].date().strftime("%m-%d-%Y"),
-                                                  y_label:summary_data_max_high.loc[max_high,'High']},
-                                         index = [max_high])
-        else:
-            # additional local maxima
-            max_high_data_vector = pd.DataFrame(data = {' ':'',
-                                                        'Date':summary_data_max_high.loc[max_high,'Date'].date().strftime("%m-%d-%Y"),
-                                                        y_label:summary_data_max_high.loc[max_high,'High']},
-                                                index = [max_high])
-            max_high_data = pd.concat([max_high_data, max_high_data_vector], ignore_index = True)
-    for max_close in range(0,len(summary_data_max_close)):
-        if max_close == 0:
-            max_close_data = pd.DataFrame(data = {' ':'Maximum Closing Price',
-                                                  'Date':summary_data_max_close.loc[max_close,'Date'].date().strftime("%m-%d-%Y"),
-                                                  y_label:summary_data_max_close.loc[max_close,'Close']},
-                                          index = [max_close])
-        else:
-            max_close_data_vector = pd.DataFrame(data = {' ':'',
-                                                         'Date':summary_data_max_close.loc[max_close,'Date'].date().strftime("%m-%d-%Y"),
-                                                         y_label:summary_data_max_close.loc[max_close,'Close']},
-                                                 index = [max_close])
-            max_close_data = pd.concat([max_close_data, max_close_data_vector], ignore_index = True)
-    for min_close in range(0,len(summary_data_min_close)):
-        if min_close == 0:
-            min_close_data = pd.DataFrame(data = {' ':'Minimum Closing Price',
-                                                  'Date':summary_data_min_close.loc[min_close,'Date'].date().strftime("%m-%d-%Y"),
-                                                  y_label:summary_data_min_close.loc[min_close,'Close']},
-                                          index = [min_close])
+# Prices are shown in the currency of their exchange ('local') or all in one base currency.
+# Conversions use the daily FX rates of Yahoo Finance ('EURUSD=X' = US dollars per euro), which
+# are stored and cached like the histories of the stocks & indices.
+BASE_CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CHF', 'CNY', 'HKD']
+CURRENCY_SYMBOLS = {'USD':'$', 'EUR':'€', 'GBP':'£', 'JPY':'¥', 'CNY':'¥', 'HKD':'HK$', 'CHF':'CHF'}
+# Currencies quoted in minor units: (currency, minor units per unit)
+MINOR_CURRENCY_UNITS = {'GBp':('GBP', 100)}
+
+def quote_currency(ticker_symbol):
+    # (currency, minor units per unit) the prices of a ticker are quoted in
+    currency = ticker_currencies.get(ticker_symbol, 'USD')
+    return MINOR_CURRENCY_UNITS.get(currency, (currency, 1))
+
+def display_currency(ticker_symbol, base_currency):
+    # Currency the prices of a ticker are shown in (London prices in pounds, not pence)
+    if (base_currency == 'local'):
+        return quote_currency(ticker_symbol)[0]
+    return base_currency
+
+def fx_ticker(ticker_symbol, currency):
+    # Ticker of the FX rates converting the prices of a ticker to currency (None if not needed)
+    ticker_currency = quote_currency(ticker_symbol)[0]
+    if (ticker_currency == currency):
+        return None
+    return f'{ticker_currency}{currency}=X'
+
+def price_y_label(currency):
+    # Price chart y-axis (currency) label
+    return f'Price ({CURRENCY_SYMBOLS.get(currency, currency)})'
+
+# Figure layout shared by the stock & index charts. Only the title, y-axis label and tick format
+# differ between figures. Kept as plain nested dicts (the way plotly.js takes them), so building
+# it does not load the plotly layout classes at startup.
+PRICE_CHART_LAYOUT = dict(title = dict(font = dict(size = 20),
+                                       x = 0.5),
+                          height = 430,
+                          margin = dict(
+                              b = 10,
+                              l = 80,
+                              r = 80,
+                              t = 40),
+                          showlegend = False,
+                          plot_bgcolor = 'white',
+                          xaxis = dict(title = dict(text = '<b>Date</b>'),
+                                       tickfont = dict(size = 12),
+                                       rangeslider = dict(visible = False),
+                                       showline = True, # plot area border line
+                                       linecolor = 'black', # plot area border line color
+                                       # use mirror = True to mirror make a rectangle around complet plot area
+                                       gridcolor = 'lightgray'),
+                          yaxis = dict(title = dict(font = dict(size = 15)),
+                                       tickfont = dict(size = 12),
+                                       showline = True, # plot area border line
+                                       linecolor = 'black', # plot area border line color
+                                       gridcolor = 'lightgray'))
+
+# Candlestick figures always have the same traces: the candles followed by three line slots,
+# the moving average (orange) and the upper / lower Bollinger bands (gray). Unused slots are
+# hidden, so partial figure updates can address every trace by its position.
+LINE_TRACE_SLOTS = 3
+LINE_TRACE_STYLES = [{'line_color':'orange','line_dash':'solid','line_width':2},
+                     {'line_color':'gray','line_dash':'dot','line_width':1},
+                     {'line_color':'gray','line_dash':'dot','line_width':1}]
+
+# Every figure also has three indicator slots (see indicators.py), after the line slots of a
+# candlestick figure or after the closing price line: the indicator lines (slots 0 and 1) and the
+# MACD histogram (slot 2). The indicators other than VWAP (drawn over the prices) are shown in a
+# lower pane of the chart, with its own y-axis (yaxis2).
+INDICATOR_TRACE_SLOTS = 3
+INDICATOR_TRACE_STYLES = [{'line_color':'purple','line_width':1.5},
+                          {'line_color':'orange','line_width':1.5},
+                          {'marker_color':'gray'}]
+INDICATOR_LABELS = {'RSI':'RSI', 'MACD':'MACD', 'ATR':'ATR', 'VWAP':'VWAP', 'drawdown':'Drawdown (%)'}
+INDICATOR_PANE_DOMAIN = [0, 0.24]
+PRICE_PANE_DOMAIN = [0.32, 1]
+# RSI overbought / oversold levels, drawn as reference lines
+RSI_LEVELS = [30, 70]
+
+# The last three slots of every figure hold the price forecast: the lower and upper bounds of its
+# confidence band (the area between them filled) and the forecast itself
+FORECAST_TRACE_SLOTS = 3
+FORECAST_TRACE_STYLES = [{'line_width':0,'showlegend':False},
+                         {'line_width':0,'fill':'tonexty','fillcolor':'rgba(70, 130, 180, 0.2)'},
+                         {'line_color':'steelblue','line_dash':'dash','line_width':2}]
+FORECAST_COLUMNS = ['Lower', 'Upper', 'Forecast']
+
+def indicator_trace_slot(plot_type):
+    # Position of the first indicator slot in the figure
+    return 1 + LINE_TRACE_SLOTS if (plot_type == 'candle') else 1
+
+def forecast_trace_slot(plot_type):
+    # Position of the first forecast slot in the figure
+    return indicator_trace_slot(plot_type) + INDICATOR_TRACE_SLOTS
+
+def forecast_trace_values(forecast_data):
+    # {'x', 'y', 'visible'} of every forecast slot (hidden and empty without a forecast)
+    if forecast_data is None:
+        return [{'x':[], 'y':[], 'visible':False} for _ in FORECAST_COLUMNS]
+    return [{'x':forecast_data['Date'], 'y':forecast_data[column], 'visible':True} for column in FORECAST_COLUMNS]
+
+def indicator_trace_values(plot_data, indicator, indicator_lines):
+    # {'x', 'y', 'visible', 'yaxis'} of every indicator slot, hidden slots empty
+    return [{'x':plot_data['Date'] if slot < len(indicator_lines) else [],
+             'y':indicator_lines[slot] if slot < len(indicator_lines) else [],
+             'visible':slot < len(indicator_lines),
+             'yaxis':'y' if (indicator == 'VWAP') else 'y2'}
+            for slot in range(INDICATOR_TRACE_SLOTS)]
+
+def indicator_layout(indicator):
+    # Layout properties that depend on the indicator shown: the lower pane (hidden when there is
+    # no indicator or for VWAP) and the RSI reference lines
+    pane = indicator is not None and (indicator != 'VWAP')
+    shapes = []
+    if (indicator == 'RSI'):
+        shapes = [dict(type = 'line', xref = 'paper', x0 = 0, x1 = 1, yref = 'y2', y0 = level, y1 = level,
+                       line = dict(color = 'gray', width = 1, dash = 'dash')) for level in RSI_LEVELS]
+    # (plain nested dicts, the way plotly.js takes them, as they are also sent as partial updates)
+    return {'xaxis':{'anchor':'y2' if pane else 'y'},
+            'yaxis':{'domain':PRICE_PANE_DOMAIN if pane else [0, 1]},
+            'yaxis2':dict(PRICE_CHART_LAYOUT['yaxis'],
+                          domain = INDICATOR_PANE_DOMAIN,
+                          anchor = 'x',
+                          visible = pane,
+                          title = dict(text = f'<b>{INDICATOR_LABELS[indicator]}</b>' if pane else '', font = dict(size = 13))),
+            'shapes':shapes}
+
+def price_chart_figure(plot_data, plot_type, line_values, title, y_label, tickformat, indicator = None, indicator_lines = (), forecast_data = None):
+    # Build the complete figure of a stock / index chart
+    if (plot_type == 'candle'):
+        traces = [go.Candlestick(x=plot_data['Date'],
+                                 open=plot_data['Open'],
+                                 high=plot_data['High'],
+                                 low=plot_data['Low'],
+                                 close=plot_data['Close'],
+                                 increasing_line_color = 'darkseagreen',
+                                 decreasing_line_color = 'red')]
+        for slot in range(LINE_TRACE_SLOTS):
+            traces.append(go.Scatter(x=plot_data['Date'] if slot < len(line_values) else [],
+                                     y=line_values[slot] if slot < len(line_values) else [],
+                                     visible = slot < len(line_values),
+                                     mode = 'lines',
+                                     **LINE_TRACE_STYLES[slot]))
+    else:
+        traces = [go.Scatter(x=plot_data['Date'],
+                             y=plot_data['Close'],
+                             mode = 'lines',
+                             line_color = 'black',
+                             line_width = 2)]
+    for slot, trace_values in enumerate(indicator_trace_values(plot_data, indicator, indicator_lines)):
+        if (slot == 2):
+            traces.append(go.Bar(**trace_values, **INDICATOR_TRACE_STYLES[slot]))
         else:
-            min_close_data_vector = pd.DataFrame(data = {' ':'',
-                                                         'Date':summary_data_min_close.loc[min_close,'Date'].date().strftime("%m-%d-%Y"),
-                                                         y_label:summary_data_min_close.loc[min_close,'Close']},
-                                                 index = [min_close])
-            min_close_data = pd.concat([min_close_data, min_close_data_vector], ignore_index = True)
-    for min_low in range(0,len(summary_data_min_low)):
-        if min_low == 0:
-            min_low_data = pd.DataFrame(data = {' ':'Minimum Price',
-                                                  'Date':summary_data_min_low.loc[min_low,'Date'].date().strftime("%m-%d-%Y"),
-                                                  y_label:summary_data_min_low.loc[min_low,'Low']},
-                                        index = [min_low])
+            traces.append(go.Scatter(**trace_values, mode = 'lines', **INDICATOR_TRACE_STYLES[slot]))
+    for slot, trace_values in enumerate(forecast_trace_values(forecast_data)):
+        traces.append(go.Scatter(**trace_values, mode = 'lines', **FORECAST_TRACE_STYLES[slot]))
+    fig = go.Figure(data = traces, layout = PRICE_CHART_LAYOUT)
+    fig.update_layout(title = f'<b>{title}</b>',
+                      yaxis_title = f'<b>{y_label}</b>')
+    fig.update_layout(indicator_layout(indicator))
+    if tickformat is not None:
+        fig.update_yaxes(tickformat = tickformat)
+    return fig
+
+@contextmanager
+def timed_callback(panel):
+    # Time a chart callback (stage 'callback'); within a request the duration is kept so that
+    # the time spent on serializing the outputs can be derived when the response is sent
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, panel, 'callback')
+        if flask.has_request_context():
+            flask.g.callback_panel = panel
+            flask.g.callback_seconds = elapsed
+
+def triggered_inputs():
+    # Inputs ('component_id.property') that triggered the running callback. Empty for the initial
+    # call of a callback, or when the callback function is called directly outside of Dash.
+    try:
+        return set(ctx.triggered_prop_ids)
+    except MissingCallbackContextException:
+        return set()
+
+def patch_line_traces(fig, plot_data, line_values):
+    # Partial figure update of the moving average / Bollinger band slots only
+    # (hidden slots are emptied, so they do not add to the size of the figure)
+    for slot in range(LINE_TRACE_SLOTS):
+        fig['data'][slot + 1]['x'] = plot_data['Date'] if slot < len(line_values) else []
+        fig['data'][slot + 1]['y'] = line_values[slot] if slot < len(line_values) else []
+        fig['data'][slot + 1]['visible'] = slot < len(line_values)
+
+def patch_indicator_traces(fig, plot_data, plot_type, indicator, indicator_lines, layout = True):
+    # Partial figure update of the indicator slots (and of the indicator pane / reference lines,
+    # unless the indicator stays the same)
+    first_slot = indicator_trace_slot(plot_type)
+    for slot, trace_values in enumerate(indicator_trace_values(plot_data, indicator, indicator_lines)):
+        for key, values in trace_values.items():
+            fig['data'][first_slot + slot][key] = values
+    if layout:
+        for key, values in indicator_layout(indicator).items():
+            if key in ('xaxis', 'yaxis'):
+                # only the properties set by indicator_layout, the rest of the axis is kept
+                for property_name, value in values.items():
+                    fig['layout'][key][property_name] = value
+            else:
+                fig['layout'][key] = values
+
+def patch_forecast_traces(fig, plot_type, forecast_data):
+    # Partial figure update of the forecast slots
+    first_slot = forecast_trace_slot(plot_type)
+    for slot, trace_values in enumerate(forecast_trace_values(forecast_data)):
+        for key, values in trace_values.items():
+            fig['data'][first_slot + slot][key] = values
+
+def patch_price_traces(fig, plot_data, plot_type, line_values, tickformat, indicator, indicator_lines, forecast_data):
+    # Partial figure update for a new date window: only the trace data and the y-axis tick
+    # format are sent, the layout and trace styles already on the page are kept
+    fig['data'][0]['x'] = plot_data['Date']
+    if (plot_type == 'candle'):
+        for column in ['Open', 'High', 'Low', 'Close']:
+            fig['data'][0][column.lower()] = plot_data[column]
+        patch_line_traces(fig, plot_data, line_values)
+    else:
+        fig['data'][0]['y'] = plot_data['Close']
+    patch_indicator_traces(fig, plot_data, plot_type, indicator, indicator_lines, layout = False)
+    patch_forecast_traces(fig, plot_type, forecast_data)
+    fig['layout']['yaxis']['tickformat'] = tickformat
+
+# Chart pipeline shared by the stock & index panels:
+# fetch -> currency conversion -> date window -> indicators -> downsampling -> figure & summary table.
+# Results are memoized per (panel, ticker, plot type, window, moving average settings, indicator
+# settings, forecast version, downsampling, display currency, data version), so identical views
+# (e.g. the default view of every new session) are computed once. The cache has a memory budget,
+# as the figures of long unsampled windows hold a copy of every bar.
+CHART_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+PriceChart = namedtuple('PriceChart', ['figure', 'plot_data', 'line_values', 'indicator', 'indicator_lines', 'forecast_data', 'tickformat', 'summary_title', 'columns', 'records'])
+# Placeholder while the price data is being downloaded (error is set if the download failed)
+LoadingChart = namedtuple('LoadingChart', ['title', 'error'])
+
+def data_version(price_data):
+    # Changes whenever bars are added to (or replaced in) a cached history. A missing last close is
+    # None rather than NaN, so the version compares equal to itself.
+    if len(price_data) == 0:
+        return (0,)
+    last_close = price_data['Close'].iloc[-1]
+    return (len(price_data), price_data.index[-1], None if np.isnan(last_close) else float(last_close))
+
+def price_chart_size(chart):
+    # Approximate memory of a memoized chart in bytes: its plotted data, counted twice as the
+    # figure holds a copy of every plotted array
+    size = dataframe_size(chart.plot_data) + sum(line.nbytes for line in list(chart.line_values) + list(chart.indicator_lines))
+    if chart.forecast_data is not None:
+        size += dataframe_size(chart.forecast_data)
+    return 2 * size
+
+price_chart_cache = LRUCache(CHART_CACHE_MAX_BYTES, TICKER_CACHE_TTL, sizeof = price_chart_size)
+
+# Histories converted to another currency, cached next to the ticker histories: a conversion is
+# only recomputed when the ticker or FX history changes, not on every callback
+CONVERTED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+converted_price_cache = LRUCache(CONVERTED_CACHE_MAX_BYTES, TICKER_CACHE_TTL, sizeof = lambda entry: dataframe_size(entry[1]))
+
+def display_price_data(ticker_symbol, price_data, currency, fx_data = None):
+    # History of a ticker in the display currency. fx_data is the history of fx_ticker(ticker_symbol,
+    # currency) (None if the prices are only converted from minor units, e.g. pence to pounds).
+    ticker_currency, minor_units = quote_currency(ticker_symbol)
+    if (ticker_currency == currency) and (minor_units == 1):
+        return price_data
+    version = (data_version(price_data), None if fx_data is None else data_version(fx_data))
+    entry = converted_price_cache.get((ticker_symbol, currency))
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    if fx_data is None:
+        rates = 1 / minor_units
+    else:
+        # the rate of every trading day of the ticker (the last FX close on or before it), prices
+        # before the first FX bar cannot be converted and are left out (NaN)
+        rates = asof_rates(price_data.index, fx_data) / minor_units
+    converted_data = convert_prices(price_data, rates)
+    converted_price_cache.put((ticker_symbol, currency), (version, converted_data))
+    return converted_data
+
+# Technical indicators (see indicators.py) of the histories in their display currency, cached next to
+# them: computed over the full history once per ticker, currency and history version, so a new date
+# window, indicator period or indicator only slices (or adds) precomputed arrays
+INDICATOR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+indicator_cache = LRUCache(INDICATOR_CACHE_MAX_BYTES, TICKER_CACHE_TTL, sizeof = lambda entry: entry[1].nbytes())
+
+def technical_indicator_lines(ticker_symbol, currency, price_data, version, window_start, window_stop, indicator_settings):
+    # Lines of an indicator for the rows [window_start, window_stop); version is (data version of
+    # the ticker history, data version of the FX history or None)
+    entry = indicator_cache.get((ticker_symbol, currency))
+    ticker_indicators = entry[1] if entry is not None and entry[0] == version else TechnicalIndicators(price_data)
+    cached_bytes = None if entry is None or entry[1] is not ticker_indicators else entry[1].nbytes()
+    indicator_lines = ticker_indicators.lines(indicator_settings[0], indicator_settings[1], window_start, window_stop)
+    if ticker_indicators.nbytes() != cached_bytes:
+        # new entry, or an indicator added to the entry: stored again to account for its size
+        indicator_cache.put((ticker_symbol, currency), (version, ticker_indicators))
+    return indicator_lines
+
+# Stored forecasts, looked up in the price store at most once per FORECAST_CACHE_TTL seconds per ticker
+FORECAST_CACHE_MAX_BYTES = 4 * 1024 * 1024
+FORECAST_CACHE_TTL = 5 * 60
+forecast_cache = LRUCache(FORECAST_CACHE_MAX_BYTES, FORECAST_CACHE_TTL, sizeof = lambda entry: 0 if entry[1] is None else dataframe_size(entry[1]))
+
+def get_forecast(ticker_symbol):
+    # (version, forecast frame) of the stored forecast of a ticker, (None, None) if it has none
+    entry = forecast_cache.get(ticker_symbol)
+    if entry is None:
+        stored_forecast = price_store.load_forecast(ticker_symbol)
+        entry = (None, None) if stored_forecast is None else (stored_forecast[0]['created'], stored_forecast[1])
+        forecast_cache.put(ticker_symbol, entry)
+    return entry
+
+def display_forecast(forecast, ticker_data, price_data):
+    # Forecast in the display currency (converted at the rate of the last bar, which also converts
+    # minor units) for the days after the last bar
+    forecast = forecast.loc[forecast['Date'] > price_data['Date'].iloc[-1]]
+    rate = price_data['Close'].iloc[-1] / ticker_data['Close'].iloc[-1]
+    return convert_prices(forecast, rate, FORECAST_COLUMNS)
+
+def chart_indicator_settings(indicator, indicator_days):
+    # None (no indicator) or (indicator, # of days), # of days None for the indicators without a period
+    if indicator not in INDICATOR_PERIODS:
+        return None
+    if not INDICATOR_PERIODS[indicator]:
+        return (indicator, None)
+    if indicator_days is None or indicator_days < 2:
+        return None
+    return (indicator, int(indicator_days))
+
+def chart_window(days_back, tail_days, start_date, end_date):
+    # Begin and end of the date window to display. The end is None for the 'days back from now'
+    # mode, meaning up to the last available bar.
+    if days_back:
+        return pd.Timestamp(date.today() - timedelta(days = tail_days)), None
+    return pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+def price_chart(panel, ticker_symbol, plot_type, begin_date, end_date, moving_average_settings, indicator_settings, show_forecast, downsample, currency):
+    # panel is 'stock' or 'index'; moving_average_settings is None or (moving average type, # of days);
+    # indicator_settings is None or (indicator, # of days); the stored forecast (if any) is shown with
+    # show_forecast; currency is the display currency of the prices
+    fx_symbol = fx_ticker(ticker_symbol, currency)
+    if ASYNC_FETCH_ENABLED:
+        title = stock_chart_title(ticker_symbol) if (panel == 'stock') else index_chart_title(ticker_symbol)
+        try:
+            with stage_seconds.time(panel, 'fetch'):
+                price_data = get_stock_ticker_data_if_ready(ticker_symbol)
+                fx_data = get_stock_ticker_data_if_ready(fx_symbol) if fx_symbol is not None else None
+        except Exception as error:
+            return LoadingChart(title, error)
+        if price_data is None or (fx_symbol is not None and fx_data is None):
+            return LoadingChart(title, None)
+    else:
+        with stage_seconds.time(panel, 'fetch'):
+            price_data = get_stock_ticker_data(ticker_symbol)
+            fx_data = get_stock_ticker_data(fx_symbol) if fx_symbol is not None else None
+    fx_data_version = None if fx_data is None else data_version(fx_data)
+    forecast_version, forecast = get_forecast(ticker_symbol) if show_forecast else (None, None)
+    # the chart is built from the frames the key was computed from, so a refresh landing in
+    # between cannot store new data under the old version
+    key = (panel, ticker_symbol, plot_type, begin_date, end_date, moving_average_settings, indicator_settings, forecast_version,
+           downsample, currency, data_version(price_data), fx_data_version)
+    with stage_seconds.time(panel, 'chart'):
+        return price_chart_cache.get_or_load(key, lambda key: build_price_chart(panel, ticker_symbol, plot_type, begin_date, end_date, moving_average_settings,
+                                                                                indicator_settings, forecast, downsample, currency, price_data, fx_data))
+
+def build_price_chart(panel, ticker_symbol, plot_type, begin_date, end_date, moving_average_settings, indicator_settings, forecast,
+                      downsample, currency, ticker_data, fx_data):
+    # ticker_data / fx_data are the histories of the ticker and of fx_ticker(ticker_symbol, currency)
+    # (None if not needed), forecast the stored forecast to show (None for no forecast)
+    title = stock_chart_title(ticker_symbol) if (panel == 'stock') else index_chart_title(ticker_symbol)
+    y_label = price_y_label(currency)
+    with stage_seconds.time(panel, 'currency'):
+        price_data = display_price_data(ticker_symbol, ticker_data, currency, fx_data)
+    with stage_seconds.time(panel, 'window'):
+        window_start, window_stop = date_window_positions(price_data, begin_date, end_date)
+        window_data = price_data.iloc[window_start:window_stop]
+    with stage_seconds.time(panel, 'indicators'):
+        line_values = moving_average_lines(ticker_symbol, currency, price_data, window_start, window_stop, moving_average_settings)
+        indicator = None if indicator_settings is None else indicator_settings[0]
+        indicator_lines = []
+        if indicator_settings is not None:
+            version = (data_version(ticker_data), None if fx_data is None else data_version(fx_data))
+            indicator_lines = technical_indicator_lines(ticker_symbol, currency, price_data, version, window_start, window_stop, indicator_settings)
+        # the forecast is shown when the window reaches the last bar
+        forecast_data = None
+        if forecast is not None and window_stop == len(price_data) and len(price_data) > 0:
+            forecast_data = display_forecast(forecast, ticker_data, price_data)
+    with stage_seconds.time(panel, 'summary_table'):
+        # get maxima and minima values (and the dates they occurred on)
+        # Relax volume > 0 restriction on extrema, since Python yfinance package can download current day's data (volume may be 0)
+        extrema = price_extrema(window_data)
+        if (panel == 'stock'):
+            tickformat = '.2f' if (extrema['max_high'][0] - extrema['min_low'][0] < 5) else None
         else:
-            min_low_data_vector = pd.DataFrame(data = {' ':'',
-                                                       'Date':summary_data_min_low.loc[min_low,'Date'].date().strftime("%m-%d-%Y"),
-                                                       y_label:summary_data_min_low.loc[min_low,'Low']},
-                                               index = [min_low])
-            min_low_data = pd.concat([min_low_data, min_low_data_vector], ignore_index = True)
-    plot_data_summary = pd.concat([max_high_data, max_close_data, min_close_data, min_low_data], ignore_index = True)
-    # combine all dataframes for maxima and minima together into one
-    return plot_data_summary
+            tickformat = '000' if (extrema['max_high'][0] > 10000) else None
+        summary_title = html.Label([f'{title}'+' summary table'])
+        columns = summary_table_columns(y_label)
+        # the summary table always uses the full resolution data
+        records = summary_table_records(window_data, extrema, y_label)
+    with stage_seconds.time(panel, 'downsample'):
+        plot_data = window_data
+        if downsample:
+            plot_data, sample_positions = downsample_plot_data(window_data, plot_type)
+            line_values = [line[sample_positions] for line in line_values]
+            indicator_lines = [line[sample_positions] for line in indicator_lines]
+    with stage_seconds.time(panel, 'figure'):
+        figure = price_chart_figure(plot_data, plot_type, line_values, title, y_label, tickformat, indicator, indicator_lines, forecast_data)
+    return PriceChart(figure, plot_data, line_values, indicator, indicator_lines, forecast_data, tickformat, summary_title, columns, records)
+
+def summary_table_columns(y_label):
+    return [{'name':' ', 'id':' '},
+            {'name':'Date','id':'Date'},
+            {'name':y_label,'id':y_label,'type':'numeric','format':Format(precision=2, scheme = Scheme.fixed)}]
+
+def moving_average_lines(ticker_symbol, currency, price_data, window_start, window_stop, moving_average_settings):
+    # Moving average (followed by the Bollinger bands, if selected) for the rows [window_start, window_stop)
+    if moving_average_settings is None:
+        return []
+    moving_average_type, moving_average_days = moving_average_settings
+    ticker_statistics = rolling_statistics_cache.get((ticker_symbol, currency))
+    if ticker_statistics is None:
+        ticker_statistics = RollingStatistics(price_data)
+        cached_bytes = None
+    else:
+        cached_bytes = ticker_statistics.nbytes()
+        ticker_statistics.update(price_data)
+    lines = ticker_statistics.moving_average_lines(window_start, window_stop, moving_average_type, moving_average_days)
+    if ticker_statistics.nbytes() != cached_bytes:
+        # new entry, or bars / an average added to the entry: stored again to account for its size
+        rolling_statistics_cache.put((ticker_symbol, currency), ticker_statistics)
+    return lines
+
+def loading_chart_figure(chart):
+    # Empty chart with a message while the price data is being downloaded (or if that failed)
+    if chart.error is None:
+        message = 'Loading price data...'
+    else:
+        message = 'Price data could not be loaded, please try again later'
+    fig = go.Figure(layout = PRICE_CHART_LAYOUT)
+    fig.update_layout(title = f'<b>{chart.title}</b>')
+    fig.add_annotation(text = message, showarrow = False, font_size = 16,
+                       xref = 'paper', yref = 'paper', x = 0.5, y = 0.5)
+    return fig
+
+def price_chart_outputs(chart, plot_type, changed_inputs, chart_loaded, moving_average_inputs, indicator_inputs, forecast_inputs, date_inputs):
+    # Callback outputs (figure, summary table title, columns, data, fetch poll disabled, chart loaded).
+    # Inputs that only change part of the figure are sent to the page as partial updates, as long as
+    # the page already shows a chart (chart_loaded) and not the loading state.
+    if isinstance(chart, LoadingChart):
+        # poll for the data until it has arrived (or the download failed)
+        return (loading_chart_figure(chart), html.Label([f'{chart.title}'+' summary table']), [], [],
+                chart.error is not None, False)
+    if chart_loaded and changed_inputs and changed_inputs <= moving_average_inputs:
+        # the candles and the summary table stay as they are
+        if (plot_type != 'candle'):
+            return no_update, no_update, no_update, no_update, no_update, no_update
+        fig = Patch()
+        patch_line_traces(fig, chart.plot_data, chart.line_values)
+        return fig, no_update, no_update, no_update, no_update, no_update
+    if chart_loaded and changed_inputs and changed_inputs <= indicator_inputs | forecast_inputs:
+        # indicator / forecast only: the prices and the summary table stay as they are
+        fig = Patch()
+        if changed_inputs & indicator_inputs:
+            patch_indicator_traces(fig, chart.plot_data, plot_type, chart.indicator, chart.indicator_lines)
+        if changed_inputs & forecast_inputs:
+            patch_forecast_traces(fig, plot_type, chart.forecast_data)
+        return fig, no_update, no_update, no_update, no_update, no_update
+    if chart_loaded and changed_inputs and changed_inputs <= date_inputs:
+        fig = Patch()
+        patch_price_traces(fig, chart.plot_data, plot_type, chart.line_values, chart.tickformat, chart.indicator, chart.indicator_lines, chart.forecast_data)
+    else:
+        fig = chart.figure
+    return fig, chart.summary_title, chart.columns, chart.records, True, True
+
+# Intraday mode (1 minute / 5 minute / 1 hour bars): the last INTRADAY_BARS bars of a ticker are kept in
+# a ring buffer shared by all sessions. The page polls every INTRADAY_POLL_INTERVAL ms and only the bars
+# that arrived since its last update are sent, as a partial figure update. Intraday prices are shown in
+# the currency of the exchange.
+INTRADAY_BARS = 1000
+INTRADAY_POLL_INTERVAL = 15000
+# a page that missed more bars than this (e.g. a sleeping browser tab) gets a new figure instead
+INTRADAY_MAX_PATCH_BARS = 100
+INTRADAY_DATE_FORMAT = '%m-%d-%Y %H:%M'
+INTRADAY_INTERVAL_LABELS = {'1m':'1 minute', '5m':'5 minute', '1h':'1 hour'}
+intraday_feed = IntradayFeed(capacity = INTRADAY_BARS)
+intraday_fetch_queue = FetchQueue(lambda stream_key: intraday_feed.refresh(*stream_key), max_workers = FETCH_MAX_WORKERS)
+
+def intraday_stream_view(ticker_symbol, interval, start, moving_average_settings):
+    # View of the intraday bars from bar number start on (see IntradayStream.view), None while the
+    # first download is running. Refreshes that are due run on the background job queue (or within
+    # the callback if ASYNC_FETCH_ENABLED is off); raises the exception of a failed first download.
+    if ASYNC_FETCH_ENABLED:
+        stream = intraday_feed.stream(ticker_symbol, interval)
+        error = intraday_fetch_queue.take_error((ticker_symbol, interval))
+        if error is not None and stream.last_fetch is None:
+            raise error
+        if intraday_feed.is_due(ticker_symbol, interval):
+            intraday_fetch_queue.submit((ticker_symbol, interval))
+        if stream.last_fetch is None:
+            return None
+    else:
+        stream = intraday_feed.refresh(ticker_symbol, interval)
+    return stream.view(start, moving_average_settings)
+
+def intraday_plot_lists(plot_data, line_values):
+    # Dates, prices and moving average lines of an intraday chart as plain lists, for the full figures
+    # and the partial updates alike: plotly sends NumPy arrays as binary typed arrays, which a partial
+    # update cannot remove items from or extend
+    columns = {'Date':plot_data['Date'].dt.strftime('%Y-%m-%dT%H:%M:%S').tolist()}
+    columns.update({column:plot_data[column].tolist() for column in ['Open', 'High', 'Low', 'Close']})
+    return columns, [line.tolist() for line in line_values]
+
+def patch_intraday_traces(fig, plot_data, plot_type, line_values, evicted_bars):
+    # Partial figure update with the bars since the last update of the page: the last bar on the
+    # page (possibly a partial bar then) is replaced, the new bars are appended and the bars that
+    # dropped out of the ring buffer are removed from the start
+    columns, lines = intraday_plot_lists(plot_data, line_values)
+    if (plot_type == 'candle'):
+        arrays = [(0, 'x', columns['Date'])] + [(0, column.lower(), columns[column]) for column in ['Open', 'High', 'Low', 'Close']]
+        for slot, line in enumerate(lines):
+            arrays += [(slot + 1, 'x', columns['Date']), (slot + 1, 'y', line)]
+    else:
+        arrays = [(0, 'x', columns['Date']), (0, 'y', columns['Close'])]
+    for trace, key, values in arrays:
+        del fig['data'][trace][key][-1]
+        for _ in range(evicted_bars):
+            del fig['data'][trace][key][0]
+        fig['data'][trace][key].extend(values)
+
+def intraday_chart_outputs(panel, ticker_symbol, interval, plot_type, moving_average_settings, changed_inputs, chart_loaded, intraday_state, poll_input):
+    # Callback outputs of a chart in intraday mode: those of price_chart_outputs followed by the
+    # intraday poll disabled flag and the intraday state of the page (what its figure shows). Polls
+    # of a page already showing the same view are answered with the new bars only.
+    title = stock_chart_title(ticker_symbol) if (panel == 'stock') else index_chart_title(ticker_symbol)
+    view_settings = {'ticker':ticker_symbol, 'interval':interval, 'plot_type':plot_type,
+                     'moving_average':None if moving_average_settings is None else list(moving_average_settings)}
+    same_view = (chart_loaded and intraday_state is not None and changed_inputs == {poll_input}
+                 and all(intraday_state.get(key) == value for key, value in view_settings.items()))
+    try:
+        with stage_seconds.time(panel, 'fetch'):
+            view = intraday_stream_view(ticker_symbol, interval, intraday_state['count'] - 1 if same_view else None, moving_average_settings)
+    except Exception as error:
+        return price_chart_outputs(LoadingChart(title, error), plot_type, changed_inputs, chart_loaded, set(), set(), set(), set()) + (True, None)
+    if view is None:
+        return price_chart_outputs(LoadingChart(title, None), plot_type, changed_inputs, chart_loaded, set(), set(), set(), set()) + (True, None)
+    if same_view and view.version == intraday_state['version']:
+        return no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update
+    patch = (same_view and view.count - intraday_state['count'] <= INTRADAY_MAX_PATCH_BARS
+             and view.first - intraday_state['first'] <= INTRADAY_MAX_PATCH_BARS and intraday_state['count'] - 1 >= view.first)
+    if same_view and not patch:
+        # too far behind, a new figure with all the bars held is sent
+        view = intraday_feed.stream(ticker_symbol, interval).view(None, moving_average_settings)
+    with stage_seconds.time(panel, 'chart'):
+        currency, minor_units = quote_currency(ticker_symbol)
+        y_label = price_y_label(currency)
+        plot_data = view.bars if (minor_units == 1) else convert_prices(view.bars, 1 / minor_units)
+        line_values = [line / minor_units for line in view.line_values]
+        extrema = {extremum_key:(extremum / minor_units, positions) for extremum_key, (extremum, positions) in view.extrema.items()}
+        records = summary_table_records(pd.DataFrame({'Date':view.dates}), extrema, y_label, INTRADAY_DATE_FORMAT)
+        state = dict(view_settings, version = view.version, first = view.first, count = view.count)
+        if patch:
+            fig = Patch()
+            patch_intraday_traces(fig, plot_data, plot_type, line_values, view.first - intraday_state['first'])
+            return fig, no_update, no_update, records, True, True, False, state
+        columns, lines = intraday_plot_lists(plot_data, line_values)
+        fig = price_chart_figure(columns, plot_type, lines, f'{title} ({INTRADAY_INTERVAL_LABELS[interval]} bars)', y_label, None)
+        # no empty space for the weekends
+        fig.update_xaxes(rangebreaks = [dict(bounds = ['sat', 'mon'])])
+        return fig, html.Label([f'{title}'+' summary table']), summary_table_columns(y_label), records, True, True, False, state
+
+# Comparison panel: several stocks / indices on a shared calendar, rebased to 100 (or as % return)
+# at the start of the window, with the correlation of their daily returns
+COMPARISON_MAX_TICKERS = 25
+COMPARISON_DEFAULT_TICKERS = ['^GSPC', '^DJI', '^IXIC']
+comparison_dropdown_list = stock_dropdown_list + index_dropdown_list
+
+ComparisonChart = namedtuple('ComparisonChart', ['figure', 'columns', 'records'])
+
+def comparison_chart_size(chart):
+    # Approximate memory of a memoized comparison chart in bytes: the values of every trace and
+    # their dates (short strings of about 64 bytes each)
+    return sum(np.asarray(trace.y).nbytes + 64 * len(trace.x) for trace in chart.figure.data)
+
+# Comparison charts are memoized like the price charts, by tickers, settings and data versions
+COMPARISON_CACHE_MAX_BYTES = 32 * 1024 * 1024
+comparison_chart_cache = LRUCache(COMPARISON_CACHE_MAX_BYTES, TICKER_CACHE_TTL, sizeof = comparison_chart_size)
+
+def comparison_chart(ticker_symbols, begin_date, normalization, base_currency):
+    # Returns a ComparisonChart, or a LoadingChart while some of the tickers are being downloaded
+    # (tickers that could not be downloaded are left out). With a base currency (not 'local'), the
+    # prices are converted to it first, so the returns are those of an investor in that currency.
+    ticker_symbols = list(dict.fromkeys(ticker_symbols))[:COMPARISON_MAX_TICKERS]
+    fx_symbols = {}
+    if (base_currency != 'local'):
+        fx_symbols = {ticker_symbol:fx_ticker(ticker_symbol, base_currency) for ticker_symbol in ticker_symbols}
+    required_symbols = ticker_symbols + sorted(set(fx_symbols.values()) - {None})
+    if ASYNC_FETCH_ENABLED:
+        price_data_dict = {}
+        pending = False
+        for ticker_symbol in required_symbols:
+            try:
+                price_data = get_stock_ticker_data_if_ready(ticker_symbol)
+            except Exception:
+                continue
+            if price_data is None:
+                pending = True
+            else:
+                price_data_dict[ticker_symbol] = price_data
+        if pending:
+            return LoadingChart('Comparison', None)
+    else:
+        price_data_dict = load_ticker_data_batch(required_symbols)
+    available_symbols = []
+    price_data_list = []
+    fx_data_list = []
+    for ticker_symbol in ticker_symbols:
+        fx_symbol = fx_symbols.get(ticker_symbol)
+        if ticker_symbol not in price_data_dict or (fx_symbol is not None and fx_symbol not in price_data_dict):
+            continue
+        available_symbols.append(ticker_symbol)
+        price_data_list.append(price_data_dict[ticker_symbol])
+        fx_data_list.append(None if fx_symbol is None else price_data_dict[fx_symbol])
+    # the chart is built from the same frames its data versions are taken from
+    data_versions = tuple((data_version(price_data), None if fx_data is None else data_version(fx_data))
+                          for price_data, fx_data in zip(price_data_list, fx_data_list))
+    key = (tuple(available_symbols), begin_date, normalization, base_currency, data_versions)
+    return comparison_chart_cache.get_or_load(key, lambda key: build_comparison_chart(available_symbols, begin_date, normalization, base_currency,
+                                                                                    price_data_list, fx_data_list))
+
+def build_comparison_chart(ticker_symbols, begin_date, normalization, base_currency, price_data_list, fx_data_list):
+    # All the tickers are aligned into one (days x tickers) matrix of closing prices. fx_data_list
+    # holds the FX history converting each ticker to base_currency (None if not needed).
+    if (base_currency != 'local'):
+        price_data_list = [display_price_data(ticker_symbol, price_data, base_currency, fx_data)
+                           for ticker_symbol, price_data, fx_data in zip(ticker_symbols, price_data_list, fx_data_list)]
+    calendar, closing_prices = align_closing_prices(price_data_list, begin_date)
+    values = rebase(closing_prices)
+    if (normalization == 'percent'):
+        values = values - 100
+    correlation = return_correlation(closing_prices)
+    plot_positions = np.arange(len(calendar))
+    if len(calendar) > DOWNSAMPLE_TARGET_POINTS:
+        # last trading day of every week / month / ...
+        plot_positions = np.append(period_starts(calendar, DOWNSAMPLE_TARGET_POINTS)[1:], len(calendar)) - 1
+    labels = [stock_dict.get(ticker_symbol, index_dict.get(ticker_symbol, ticker_symbol)) for ticker_symbol in ticker_symbols]
+    # all the traces share the dates (sent as plain dates) and 0.01 is below the resolution of the chart
+    plot_dates = calendar[plot_positions].strftime('%Y-%m-%d')
+    plot_values = np.round(values[plot_positions], 2)
+    traces = [go.Scattergl(x = plot_dates,
+                           y = plot_values[:, column],
+                           mode = 'lines',
+                           name = label) for column, label in enumerate(labels)]
+    fig = go.Figure(data = traces, layout = PRICE_CHART_LAYOUT)
+    currency_label = '' if (base_currency == 'local') else f' in {base_currency}'
+    fig.update_layout(title = '<b>Comparison</b>',
+                      yaxis_title = f'<b>Return{currency_label} (%)</b>' if (normalization == 'percent') else f'<b>Rebased price{currency_label} (start = 100)</b>',
+                      showlegend = True)
+    columns = [{'name':' ', 'id':' '}] + [{'name':ticker_symbol,'id':ticker_symbol,'type':'numeric','format':Format(precision=2, scheme = Scheme.fixed)}
+                                          for ticker_symbol in ticker_symbols]
+    records = [dict({' ':ticker_symbol}, **{other_symbol:(None if np.isnan(correlation[row, column]) else float(correlation[row, column]))
+                                            for column, other_symbol in enumerate(ticker_symbols)})
+               for row, ticker_symbol in enumerate(ticker_symbols)]
+    return ComparisonChart(fig, columns, records)
 
 app = dash.Dash(__name__)
 server = app.server
 
+@server.route('/ready')
+def ready():
+    # Readiness probe: 200 once the warm-up has imported the deferred modules, 503 until then
+    # (JSON body with the warm-up status and the import times)
+    return warm_up.status(), 200 if warm_up.is_ready() else 503
+
+def prefetch_status():
+    # Per ticker prefetch status (last refresh time, failures) as JSON
+    return prefetch_scheduler.status()
+
+def forecast_status():
+    # Last forecast batch (time, duration, tickers trained / skipped / failed, error) and next run as JSON
+    return forecast_scheduler.status()
+
+def cache_status():
+    # Ticker cache statistics (entries, bytes, hits, misses, evictions, coalesced loads) as JSON
+    return ticker_cache.stats()
+
+def metrics():
+    # Latency histograms, response sizes and cache statistics in the Prometheus text format
+    return flask.Response(metrics_registry.render(), mimetype = 'text/plain; version=0.0.4')
+
+if STATUS_ROUTES_ENABLED:
+    for status_route in [prefetch_status, forecast_status, cache_status, metrics]:
+        server.route(f'/{status_route.__name__}')(status_route)
+
+@server.before_request
+def start_request_instrumentation():
+    flask.g.request_start = time.perf_counter()
+    if PROFILING_ENABLED and flask.request.headers.get('X-Profile') == '1':
+        flask.g.profile = request_profiler.start()
+
+@server.after_request
+def finish_request_instrumentation(response):
+    if 'request_start' not in flask.g:
+        return response
+    elapsed = time.perf_counter() - flask.g.request_start
+    if 'profile' in flask.g:
+        request_profiler.stop(flask.g.pop('profile'), f'{flask.request.method} {flask.request.path}')
+    if flask.request.path == '/_dash-update-component' and not response.direct_passthrough:
+        # callbacks are labelled by their first output ('stock_plot.figure', ...)
+        output = (flask.request.get_json(silent = True) or {}).get('output', '').lstrip('.').split('...')[0]
+        request_seconds.observe(elapsed, output)
+        response_bytes.observe(len(response.get_data()), output)
+        if 'callback_seconds' in flask.g:
+            # the rest of the request is spent serializing the outputs (and in Dash / Flask)
+            stage_seconds.observe(elapsed - flask.g.callback_seconds, flask.g.callback_panel, 'serialize')
+    return response
+
+if PREFETCH_ENABLED:
+    prefetch_scheduler.start()
+if FORECASTS_ENABLED:
+    forecast_scheduler.start()
+
+def warm_up_charts():
+    # Build and serialize a figure with every trace type used by the charts, which loads the
+    # plotly modules the first chart would otherwise load
+    go.Figure([go.Candlestick(), go.Scatter(), go.Scattergl()], layout = PRICE_CHART_LAYOUT).to_json()
+
+# The modules deferred at startup are imported in the background once the app module has loaded.
+# Requests with responses serialized by plotly wait for the warm-up to finish (plotly looks pandas
+# up in sys.modules and would use it half imported), the page itself and the scripts do not.
+warm_up = WarmUp(['pandas', 'plotly.graph_objects'], tasks = [warm_up_charts])
+warm_up.start()
+WARM_UP_REQUESTS = ('_dash-layout', '_dash-dependencies', '_dash-update-component')
+
+@server.before_request
+def wait_for_warm_up():
+    if flask.request.path.endswith(WARM_UP_REQUESTS):
+        warm_up.wait()
+
+metrics_registry.collected('dashboard_import_seconds', 'Time spent importing the modules loaded at startup or on first use in seconds', 'gauge',
+                           lambda: {(name,):seconds for name, seconds in warm_up.status()['import_seconds'].items()}, ['module'])
+
 app.layout = html.Div(children=[html.H1('Stock/Index Price Dashboard',
                                         style = {'textAlign':'center','font-size':30}),
+                                html.Div(children=[html.Label(['Show prices in:'],
+                                                              style = {'font-weight':'bold',
+                                                                       'font-size':18,
+                                                                       'margin-right':'10px'}),
+                                                   dcc.Dropdown(id='base_currency',
+                                                                options = [{'label':'Currency of the exchange','value':'local'}] +
+                                                                          [{'label':f'{currency} ({CURRENCY_SYMBOLS[currency]})','value':currency} for currency in BASE_CURRENCIES],
+                                                                value = 'local',
+                                                                clearable = False,
+                                                                style = {'font-size':16,
+                                                                         'width':'260px'})],
+                                         style = {'display':'flex',
+                                                  'justify-content':'center',
+                                                  'align-items':'center',
+                                                  'margin-bottom':'10px'}),
                                 html.Div(children=[
                                     html.Div(children = [html.Label(['Select plot type:'],
                                                                     style = {'font-weight':'bold',
@@ -155,40 +1029,110 @@ app.layout = html.Div(children=[html.H1('Stock/Index Price Dashboard',
                                                                       style={'font-size':16,
                                                                              'margin-top':'6px',
                                                                              'margin-bottom':'13px'}),
-                                                         html.Label(['Specify date entry type:'],
+                                                         html.Label(['Bar interval:'],
                                                                     style = {'font-weight':'bold',
                                                                              'font-size':18}),
-                                                         dcc.RadioItems(id='stock_plot_date_select',options=[{'label':'Date range','value':'stock_date_range'},
-                                                                                                             {'label':'Days back from now','value':'stock_days_back'}],
-                                                                        value = 'stock_date_range',
+                                                         dcc.RadioItems(id = 'stock_interval',
+                                                                        options = [{'label':'Daily','value':'1d'},
+                                                                                   {'label':'1 hour','value':'1h'},
+                                                                                   {'label':'5 minutes','value':'5m'},
+                                                                                   {'label':'1 minute','value':'1m'}],
+                                                                        value = '1d',
                                                                         inline = True,
                                                                         inputStyle = {'margin-right':'4px',
                                                                                       'margin-left':'10px'},
-                                                                        style ={'font-size':16,
-                                                                                'margin-top':'5px',
-                                                                                'margin-bottom':'8px'}),
-                                                         html.Div(children=[html.Label(['# of days to display back from today (min 2):'],
-                                                                                       id = 'stock_tail_days_label',
-                                                                                       style = {}),
-                                                                            dcc.Input(id = 'stock_tail_days',
-                                                                                      type='number',
-                                                                                      min=2,
-                                                                                      step=1,
-                                                                                      value = 30,
-                                                                                      debounce = True,
-                                                                                      style={}),
-                                                                            html.Label(['Date range to display:'],
-                                                                                       id = 'stock_date_range_label',
-                                                                                       style = {}),
-                                                                            dcc.DatePickerRange(id = 'stock_date_range',
-                                                                                                start_date = date.today() - timedelta(days = 30),
-                                                                                                end_date = date.today(),
-                                                                                                max_date_allowed = date.today(),
-                                                                                                style = {}),
-                                                                            html.Button('Reset to default dates',
-                                                                                        id = 'stock_date_reset_button',
-                                                                                        n_clicks = 0,
-                                                                                        style = {})]),
+                                                                        style = {'font-size':16,
+                                                                                 'margin-top':'5px',
+                                                                                 'margin-bottom':'8px'}),
+                                                         html.Div(id = 'stock_daily_options',
+                                                                  children = [html.Label(['Specify date entry type:'],
+                                                                                         style = {'font-weight':'bold',
+                                                                                                  'font-size':18}),
+                                                                              dcc.RadioItems(id='stock_plot_date_select',options=[{'label':'Date range','value':'stock_date_range'},
+                                                                                                                                  {'label':'Days back from now','value':'stock_days_back'}],
+                                                                                             value = 'stock_date_range',
+                                                                                             inline = True,
+                                                                                             inputStyle = {'margin-right':'4px',
+                                                                                                           'margin-left':'10px'},
+                                                                                             style ={'font-size':16,
+                                                                                                     'margin-top':'5px',
+                                                                                                     'margin-bottom':'8px'}),
+                                                                              html.Div(children=[html.Label(['# of days to display back from today (min 2):'],
+                                                                                                            id = 'stock_tail_days_label',
+                                                                                                            style = {}),
+                                                                                                 dcc.Input(id = 'stock_tail_days',
+                                                                                                           type='number',
+                                                                                                           min=2,
+                                                                                                           step=1,
+                                                                                                           value = 30,
+                                                                                                           debounce = True,
+                                                                                                           style={}),
+                                                                                                 html.Label(['Date range to display:'],
+                                                                                                            id = 'stock_date_range_label',
+                                                                                                            style = {}),
+                                                                                                 dcc.DatePickerRange(id = 'stock_date_range',
+                                                                                                                     start_date = date.today() - timedelta(days = 30),
+                                                                                                                     end_date = date.today(),
+                                                                                                                     max_date_allowed = date.today(),
+                                                                                                                     style = {}),
+                                                                                                 html.Button('Reset to default dates',
+                                                                                                             id = 'stock_date_reset_button',
+                                                                                                             n_clicks = 0,
+                                                                                                             style = {})]),
+                                                                              html.Label(['Downsample long date ranges?'],
+                                                                                         style = {'font-weight':'bold',
+                                                                                                  'font-size':18,
+                                                                                                  'margin-top':'13px',
+                                                                                                  'display':'block'}),
+                                                                              dcc.RadioItems(id = 'stock_downsample',
+                                                                                             options = [{'label':'Yes','value':'downsample'},
+                                                                                                        {'label':'No','value':'do_not_downsample'}],
+                                                                                             value = 'downsample',
+                                                                                             inline = True,
+                                                                                             inputStyle = {'margin-right':'4px',
+                                                                                                           'margin-left':'15px'},
+                                                                                             style = {'font-size':16,
+                                                                                                      'margin-top':'6px'}),
+                                                                              html.Label(['Technical indicator:'],
+                                                                                         style = {'font-weight':'bold',
+                                                                                                  'font-size':18,
+                                                                                                  'margin-top':'13px',
+                                                                                                  'display':'block'}),
+                                                                              dcc.Dropdown(id = 'stock_indicator',
+                                                                                           options = [{'label':'None','value':'none'},
+                                                                                                      {'label':'RSI (relative strength index)','value':'RSI'},
+                                                                                                      {'label':'MACD (12, 26, 9)','value':'MACD'},
+                                                                                                      {'label':'ATR (average true range)','value':'ATR'},
+                                                                                                      {'label':'VWAP (volume weighted average price)','value':'VWAP'},
+                                                                                                      {'label':'Drawdown from peak','value':'drawdown'}],
+                                                                                           value = 'none',
+                                                                                           clearable = False,
+                                                                                           style = {'font-size':16,
+                                                                                                    'margin-top':'6px'}),
+                                                                              html.Label(['# of days to use for the indicator (min 2):'],
+                                                                                         id = 'stock_indicator_days_label',
+                                                                                         style = {}),
+                                                                              dcc.Input(id = 'stock_indicator_days',
+                                                                                        type = 'number',
+                                                                                        min = 2,
+                                                                                        step = 1,
+                                                                                        value = 14,
+                                                                                        debounce = True,
+                                                                                        style = {}),
+                                                                              html.Label(['Show price forecast?'],
+                                                                                         style = {'font-weight':'bold',
+                                                                                                  'font-size':18,
+                                                                                                  'margin-top':'13px',
+                                                                                                  'display':'block'}),
+                                                                              dcc.RadioItems(id = 'stock_forecast',
+                                                                                             options = [{'label':'Yes','value':'show_forecast'},
+                                                                                                        {'label':'No','value':'do_not_show_forecast'}],
+                                                                                             value = 'do_not_show_forecast',
+                                                                                             inline = True,
+                                                                                             inputStyle = {'margin-right':'4px',
+                                                                                                           'margin-left':'15px'},
+                                                                                             style = {'font-size':16,
+                                                                                                      'margin-top':'6px'})]),
                                                          html.Div(children=[html.Label(['Display closing price moving average?'],
                                                                                        id = 'moving_average_option_label'),
                                                                             dcc.RadioItems(id = 'moving_average_option',
@@ -208,13 +1152,29 @@ app.layout = html.Div(children=[html.H1('Stock/Index Price Dashboard',
                                                                                       min = 2,
                                                                                       step = 1,
                                                                                       value = 7,
-                                                                                      debounce = True)],
+                                                                                      debounce = True),
+                                                                            html.Label(['Moving average type:'],
+                                                                                       id = 'moving_average_type_label'),
+                                                                            dcc.RadioItems(id = 'moving_average_type',
+                                                                                           options = [{'label':'Simple','value':'SMA'},
+                                                                                                      {'label':'Exponential','value':'EMA'},
+                                                                                                      {'label':'Simple with Bollinger bands','value':'bollinger'}],
+                                                                                           value = 'SMA',
+                                                                                           inline = True,
+                                                                                           inputStyle = {'margin-right':'4px',
+                                                                                                         'margin-left':'15px'})],
                                                                   style = {})],
                                              style={'width':'24%',
                                                     'display':'inline-block',
                                                     'verticalAlign':'top',
                                                     'margin-top':'15px'}),
-                                    html.Div(children = dcc.Graph(id = 'stock_plot'),
+                                    html.Div(children = [dcc.Graph(id = 'stock_plot'),
+                                                         # polls for the price data while it is being downloaded
+                                                         dcc.Interval(id = 'stock_fetch_poll', interval = FETCH_POLL_INTERVAL, disabled = True),
+                                                         dcc.Store(id = 'stock_chart_loaded', data = False),
+                                                         # polls for new bars in intraday mode
+                                                         dcc.Interval(id = 'stock_intraday_poll', interval = INTRADAY_POLL_INTERVAL, disabled = True),
+                                                         dcc.Store(id = 'stock_intraday_state', data = None)],
                                              style={'width':'49%',
                                                     'display':'inline-block',
                                                     'margin-left':'10px'}),
@@ -255,45 +1215,119 @@ app.layout = html.Div(children=[html.H1('Stock/Index Price Dashboard',
                                                                     style = {'font-size':16,
                                                                              'margin-top':'6px',
                                                                              'margin-bottom':'13px'}),
-                                                       html.Label(['Specify date entry type:'],
+                                                       html.Label(['Bar interval:'],
                                                                   style = {'font-weight':'bold',
                                                                            'font-size':18}),
-                                                       dcc.RadioItems(id='index_plot_date_select',options=[{'label':'Date range','value':'index_date_range'},
-                                                                                                           {'label':'Days back from now','value':'index_days_back'}],
-                                                                      value = 'index_date_range',
+                                                       dcc.RadioItems(id = 'index_interval',
+                                                                      options = [{'label':'Daily','value':'1d'},
+                                                                                 {'label':'1 hour','value':'1h'},
+                                                                                 {'label':'5 minutes','value':'5m'},
+                                                                                 {'label':'1 minute','value':'1m'}],
+                                                                      value = '1d',
                                                                       inline = True,
                                                                       inputStyle = {'margin-right':'4px',
                                                                                     'margin-left':'15px'},
-                                                                      style ={'font-size':16,
-                                                                              'margin-top':'5px',
-                                                                              'margin-bottom':'8px'}),
-                                                       html.Div(children=[html.Label(['# of days to display back from today (min 2):'],
-                                                                                     id = 'index_tail_days_label',
-                                                                                     style = {}),
-                                                                          dcc.Input(id = 'index_tail_days',
-                                                                                    type = 'number',
-                                                                                    min = 2,
-                                                                                    step = 1,
-                                                                                    value = 30,
-                                                                                    debounce = True,
-                                                                                    style = {}),
-                                                                          html.Label(['Date range to display:'],
-                                                                                     id = 'index_date_range_label',
-                                                                                     style = {}),
-                                                                          dcc.DatePickerRange(id = 'index_date_range',
-                                                                                              start_date = date.today() - timedelta(days = 30),
-                                                                                              end_date = date.today(),
-                                                                                              max_date_allowed = date.today(),
-                                                                                              style = {}),
-                                                                          html.Button('Reset to default dates',
-                                                                                      id = 'index_date_reset_button',
-                                                                                      n_clicks = 0,
-                                                                                      style = {})])],
+                                                                      style = {'font-size':16,
+                                                                               'margin-top':'5px',
+                                                                               'margin-bottom':'8px'}),
+                                                       html.Div(id = 'index_daily_options',
+                                                                children = [html.Label(['Specify date entry type:'],
+                                                                                       style = {'font-weight':'bold',
+                                                                                                'font-size':18}),
+                                                                            dcc.RadioItems(id='index_plot_date_select',options=[{'label':'Date range','value':'index_date_range'},
+                                                                                                                                {'label':'Days back from now','value':'index_days_back'}],
+                                                                                           value = 'index_date_range',
+                                                                                           inline = True,
+                                                                                           inputStyle = {'margin-right':'4px',
+                                                                                                         'margin-left':'15px'},
+                                                                                           style ={'font-size':16,
+                                                                                                   'margin-top':'5px',
+                                                                                                   'margin-bottom':'8px'}),
+                                                                            html.Div(children=[html.Label(['# of days to display back from today (min 2):'],
+                                                                                                          id = 'index_tail_days_label',
+                                                                                                          style = {}),
+                                                                                               dcc.Input(id = 'index_tail_days',
+                                                                                                         type = 'number',
+                                                                                                         min = 2,
+                                                                                                         step = 1,
+                                                                                                         value = 30,
+                                                                                                         debounce = True,
+                                                                                                         style = {}),
+                                                                                               html.Label(['Date range to display:'],
+                                                                                                          id = 'index_date_range_label',
+                                                                                                          style = {}),
+                                                                                               dcc.DatePickerRange(id = 'index_date_range',
+                                                                                                                   start_date = date.today() - timedelta(days = 30),
+                                                                                                                   end_date = date.today(),
+                                                                                                                   max_date_allowed = date.today(),
+                                                                                                                   style = {}),
+                                                                                               html.Button('Reset to default dates',
+                                                                                                           id = 'index_date_reset_button',
+                                                                                                           n_clicks = 0,
+                                                                                                           style = {})]),
+                                                                            html.Label(['Downsample long date ranges?'],
+                                                                                       style = {'font-weight':'bold',
+                                                                                                'font-size':18,
+                                                                                                'margin-top':'13px',
+                                                                                                'display':'block'}),
+                                                                            dcc.RadioItems(id = 'index_downsample',
+                                                                                           options = [{'label':'Yes','value':'downsample'},
+                                                                                                      {'label':'No','value':'do_not_downsample'}],
+                                                                                           value = 'downsample',
+                                                                                           inline = True,
+                                                                                           inputStyle = {'margin-right':'4px',
+                                                                                                         'margin-left':'15px'},
+                                                                                           style = {'font-size':16,
+                                                                                                    'margin-top':'6px'}),
+                                                                            html.Label(['Technical indicator:'],
+                                                                                       style = {'font-weight':'bold',
+                                                                                                'font-size':18,
+                                                                                                'margin-top':'13px',
+                                                                                                'display':'block'}),
+                                                                            dcc.Dropdown(id = 'index_indicator',
+                                                                                         options = [{'label':'None','value':'none'},
+                                                                                                    {'label':'RSI (relative strength index)','value':'RSI'},
+                                                                                                    {'label':'MACD (12, 26, 9)','value':'MACD'},
+                                                                                                    {'label':'ATR (average true range)','value':'ATR'},
+                                                                                                    {'label':'VWAP (volume weighted average price)','value':'VWAP'},
+                                                                                                    {'label':'Drawdown from peak','value':'drawdown'}],
+                                                                                         value = 'none',
+                                                                                         clearable = False,
+                                                                                         style = {'font-size':16,
+                                                                                                  'margin-top':'6px'}),
+                                                                            html.Label(['# of days to use for the indicator (min 2):'],
+                                                                                       id = 'index_indicator_days_label',
+                                                                                       style = {}),
+                                                                            dcc.Input(id = 'index_indicator_days',
+                                                                                      type = 'number',
+                                                                                      min = 2,
+                                                                                      step = 1,
+                                                                                      value = 14,
+                                                                                      debounce = True,
+                                                                                      style = {}),
+                                                                            html.Label(['Show price forecast?'],
+                                                                                       style = {'font-weight':'bold',
+                                                                                                'font-size':18,
+                                                                                                'margin-top':'13px',
+                                                                                                'display':'block'}),
+                                                                            dcc.RadioItems(id = 'index_forecast',
+                                                                                           options = [{'label':'Yes','value':'show_forecast'},
+                                                                                                      {'label':'No','value':'do_not_show_forecast'}],
+                                                                                           value = 'do_not_show_forecast',
+                                                                                           inline = True,
+                                                                                           inputStyle = {'margin-right':'4px',
+                                                                                                         'margin-left':'15px'},
+                                                                                           style = {'font-size':16,
+                                                                                                    'margin-top':'6px'})])],
                                              style = {'width':'24%',
                                                       'display':'inline-block',
                                                       'vertical-align':'top',
                                                       'margin-top':'55px'}),
-                                    html.Div(children = dcc.Graph(id = 'index_plot'),
+                                    html.Div(children = [dcc.Graph(id = 'index_plot'),
+                                                         dcc.Interval(id = 'index_fetch_poll', interval = FETCH_POLL_INTERVAL, disabled = True),
+                                                         dcc.Store(id = 'index_chart_loaded', data = False),
+                                                         dcc.Interval(id = 'index_intraday_poll', interval = INTRADAY_POLL_INTERVAL, disabled = True),
+                                                         dcc.Store(id = 'index_intraday_state', data = None)],
                                              style = {'width':'49%',
                                                       'display':'inline-block',
                                                       'margin-top':'25px',
@@ -307,81 +1341,182 @@ app.layout = html.Div(children=[html.H1('Stock/Index Price Dashboard',
                                                                                         {'name':'Column 2','id':'column2'},
                                                                                         {'name':'Column 3','id':'column3'}],
                                                                              data=[])],
+                                             style={'width':'24%',
+                                                    'display':'inline-block',
+                                                    'verticalAlign':'top',
+                                                    'font-size':15})]),
+                                html.Div(children=[
+                                    html.Div(children=[html.Label(['Select stocks & indices to compare:'],
+                                                                  style = {'font-weight':'bold',
+                                                                           'font-size':18}),
+                                                       dcc.Dropdown(id='comparison_tickers',
+                                                                    options = comparison_dropdown_list,
+                                                                    placeholder = 'Select stocks / indices',
+                                                                    value = COMPARISON_DEFAULT_TICKERS,
+                                                                    multi = True,
+                                                                    searchable = True,
+                                                                    style = {'font-size':16,
+                                                                             'margin-top':'6px',
+                                                                             'margin-bottom':'13px'}),
+                                                       html.Label(['Show prices as:'],
+                                                                  style = {'font-weight':'bold',
+                                                                           'font-size':18}),
+                                                       dcc.RadioItems(id='comparison_normalization',options=[{'label':'Rebased to 100','value':'rebased'},
+                                                                                                             {'label':'Return (%)','value':'percent'}],
+                                                                      value = 'rebased',
+                                                                      inline = True,
+                                                                      inputStyle = {'margin-right':'4px',
+                                                                                    'margin-left':'15px'},
+                                                                      style ={'font-size':16,
+                                                                              'margin-top':'6px',
+                                                                              'margin-bottom':'10px'}),
+                                                       html.Label(['# of days to compare back from today (min 2):'],
+                                                                  style = {'font-weight':'bold',
+                                                                           'font-size':18}),
+                                                       dcc.Input(id = 'comparison_tail_days',
+                                                                 type = 'number',
+                                                                 min = 2,
+                                                                 step = 1,
+                                                                 value = 365,
+                                                                 debounce = True,
+                                                                 style = {'font-size':15,'margin-top':'6px','display':'block'})],
+                                             style = {'width':'24%',
+                                                      'display':'inline-block',
+                                                      'vertical-align':'top',
+                                                      'margin-top':'55px'}),
+                                    html.Div(children = [dcc.Graph(id = 'comparison_plot'),
+                                                         dcc.Interval(id = 'comparison_fetch_poll', interval = FETCH_POLL_INTERVAL, disabled = True)],
+                                             style = {'width':'49%',
+                                                      'display':'inline-block',
+                                                      'margin-top':'25px',
+                                                      'margin-left':'10px'}),
+                                    html.Div(children = [html.Div(['Correlation of daily returns'],
+                                                                  style={'font-size':20,
+                                                                         'margin-top':'30px',
+                                                                         'margin-bottom':'10px'}),
+                                                         dash_table.DataTable(id = 'comparison_correlation_table',
+                                                                             columns = [],
+                                                                             data=[],
+                                                                             style_table = {'overflowX':'auto'})],
                                              style={'width':'24%',
                                                     'display':'inline-block',
                                                     'verticalAlign':'top',
                                                     'font-size':15})])])
                                 
-@app.callback(Output(component_id='moving_average_option_label',component_property='style'),
-              Output(component_id='moving_average_option',component_property='style'),
-              Input(component_id='stock_plot_type',component_property='value'))
-
-def show_moving_average_option(stock_plot_type):
-    if stock_plot_type == 'candle':
-        return ({'font-size':18,'font-weight':'bold','margin-top':'13px','display':'block'},
-                {'font-size':16,'margin-top':'6px','display':'block'})
-    if stock_plot_type == 'closing':
-        return ({'display':'none'},
-                {'display':'none'})
-    
-@app.callback(Output(component_id='moving_average_days_label',component_property='style'),
-              Output(component_id='moving_average_days',component_property='style'),
-              Input(component_id='moving_average_option',component_property='value'))
-
-def show_moving_average(moving_average_option):
-    if moving_average_option == 'display_MA':
-        return ({'font-size':18,'font-weight':'bold','margin-top':'8px','display':'block'},
-                {'font-size':16,'margin-top':'6px','display':'block'})
-    if moving_average_option == 'do_not_display_MA':
-        return ({'display':'none'},
-                {'display':'none'})
-    
-@app.callback(Output(component_id='stock_tail_days_label',component_property='style'),
-              Output(component_id='stock_tail_days',component_property='style'),
-              Output(component_id='stock_date_range_label',component_property='style'),
-              Output(component_id='stock_date_range',component_property='style'),
-              Output(component_id='stock_date_reset_button',component_property='style'),
-              Input(component_id='stock_plot_date_select',component_property='value'))
-
-def select_stock_date_input(stock_plot_date_select):
-    if stock_plot_date_select == 'stock_days_back':
-        return ({'font-size':18,'font-weight':'bold','display':'block'},
-                {'font-size':15,'margin-top':'6px','display':'block'},
-                {'display':'none'},
-                {'display':'none'},
-                {'display':'none'})
-    if stock_plot_date_select == 'stock_date_range':
-        return ({'display':'none'},
-                {'display':'none'},
-                {'font-size':18,'font-weight':'bold','display':'inline-block'},
-                {'font-size':15,'margin-left':'13px','display':'inline-block'},
-                {'font-size':16,'margin-top':'6px','margin-left':'13px','display':'block'})
-
-@app.callback(Output(component_id='index_tail_days_label',component_property='style'),
-              Output(component_id='index_tail_days',component_property='style'),
-              Output(component_id='index_date_range_label',component_property='style'),
-              Output(component_id='index_date_range',component_property='style'),
-              Output(component_id='index_date_reset_button',component_property='style'),
-              Input(component_id='index_plot_date_select',component_property='value'))
-
-def select_index_date_input(index_plot_date_select):
-    if index_plot_date_select == 'index_days_back':
-        return ({'font-size':18,'font-weight':'bold','display':'block'},
-                {'font-size':15,'margin-top':'6px','display':'block'},
-                {'display':'none'},
-                {'display':'none'},
-                {'display':'none'})
-    if index_plot_date_select == 'index_date_range':
-        return ({'display':'none'},
-                {'display':'none'},
-                {'font-size':18,'font-weight':'bold','display':'inline-block'},
-                {'font-size':15,'margin-left':'13px','display':'inline-block'},
-                {'font-size':16,'margin-top':'6px','margin-left':'13px','display':'block'})
-                                
+def visibility_callback(outputs, visibility_input, styles_by_value):
+    # Show / hide components with a clientside callback: runs in the browser, without a request
+    # to the server. styles_by_value maps every value of visibility_input to the list of output styles.
+    # outputs is passed as a list, so the callback is a multi-output one (returning a list) even
+    # with a single output.
+    for value, styles in styles_by_value.items():
+        if len(styles) != len(outputs):
+            raise ValueError(f'{len(styles)} styles given for {value!r}, {len(outputs)} outputs to set')
+    app.clientside_callback('function(value) {return (' + json.dumps(styles_by_value) + ')[value] || window.dash_clientside.no_update;}',
+                            list(outputs),
+                            visibility_input)
+
+def date_reset_callback(start_date_output, end_date_output, reset_button_input):
+    # Reset a date range to the last 30 days (clientside, using the date of the browser)
+    app.clientside_callback("""function(n_clicks) {
+                                   const format = (day) => day.getFullYear() + '-' + String(day.getMonth() + 1).padStart(2, '0') + '-' + String(day.getDate()).padStart(2, '0');
+                                   const end_date = new Date();
+                                   const start_date = new Date(end_date.getFullYear(), end_date.getMonth(), end_date.getDate() - 30);
+                                   return [format(start_date), format(end_date)];
+                               }""",
+                            start_date_output,
+                            end_date_output,
+                            reset_button_input)
+
+visibility_callback([Output(component_id='moving_average_option_label',component_property='style'),
+                     Output(component_id='moving_average_option',component_property='style')],
+                    Input(component_id='stock_plot_type',component_property='value'),
+                    {'candle':[{'font-size':18,'font-weight':'bold','margin-top':'13px','display':'block'},
+                               {'font-size':16,'margin-top':'6px','display':'block'}],
+                     'closing':[{'display':'none'},
+                                {'display':'none'}]})
+
+visibility_callback([Output(component_id='moving_average_days_label',component_property='style'),
+                     Output(component_id='moving_average_days',component_property='style'),
+                     Output(component_id='moving_average_type_label',component_property='style'),
+                     Output(component_id='moving_average_type',component_property='style')],
+                    Input(component_id='moving_average_option',component_property='value'),
+                    {'display_MA':[{'font-size':18,'font-weight':'bold','margin-top':'8px','display':'block'},
+                                   {'font-size':16,'margin-top':'6px','display':'block'},
+                                   {'font-size':18,'font-weight':'bold','margin-top':'8px','display':'block'},
+                                   {'font-size':16,'margin-top':'6px','display':'block'}],
+                     'do_not_display_MA':[{'display':'none'},
+                                          {'display':'none'},
+                                          {'display':'none'},
+                                          {'display':'none'}]})
+
+visibility_callback([Output(component_id='stock_tail_days_label',component_property='style'),
+                     Output(component_id='stock_tail_days',component_property='style'),
+                     Output(component_id='stock_date_range_label',component_property='style'),
+                     Output(component_id='stock_date_range',component_property='style'),
+                     Output(component_id='stock_date_reset_button',component_property='style')],
+                    Input(component_id='stock_plot_date_select',component_property='value'),
+                    {'stock_days_back':[{'font-size':18,'font-weight':'bold','display':'block'},
+                                        {'font-size':15,'margin-top':'6px','display':'block'},
+                                        {'display':'none'},
+                                        {'display':'none'},
+                                        {'display':'none'}],
+                     'stock_date_range':[{'display':'none'},
+                                         {'display':'none'},
+                                         {'font-size':18,'font-weight':'bold','display':'inline-block'},
+                                         {'font-size':15,'margin-left':'13px','display':'inline-block'},
+                                         {'font-size':16,'margin-top':'6px','margin-left':'13px','display':'block'}]})
+
+visibility_callback([Output(component_id='index_tail_days_label',component_property='style'),
+                     Output(component_id='index_tail_days',component_property='style'),
+                     Output(component_id='index_date_range_label',component_property='style'),
+                     Output(component_id='index_date_range',component_property='style'),
+                     Output(component_id='index_date_reset_button',component_property='style')],
+                    Input(component_id='index_plot_date_select',component_property='value'),
+                    {'index_days_back':[{'font-size':18,'font-weight':'bold','display':'block'},
+                                        {'font-size':15,'margin-top':'6px','display':'block'},
+                                        {'display':'none'},
+                                        {'display':'none'},
+                                        {'display':'none'}],
+                     'index_date_range':[{'display':'none'},
+                                         {'display':'none'},
+                                         {'font-size':18,'font-weight':'bold','display':'inline-block'},
+                                         {'font-size':15,'margin-left':'13px','display':'inline-block'},
+                                         {'font-size':16,'margin-top':'6px','margin-left':'13px','display':'block'}]})
+
+# The date window and downsampling options only apply to daily bars
+for panel in ['stock', 'index']:
+    visibility_callback([Output(component_id=f'{panel}_daily_options',component_property='style')],
+                        Input(component_id=f'{panel}_interval',component_property='value'),
+                        {'1d':[{'display':'block'}],
+                         '1h':[{'display':'none'}],
+                         '5m':[{'display':'none'}],
+                         '1m':[{'display':'none'}]})
+
+# The indicator period only applies to RSI, ATR and VWAP
+for panel in ['stock', 'index']:
+    visibility_callback([Output(component_id=f'{panel}_indicator_days_label',component_property='style'),
+                         Output(component_id=f'{panel}_indicator_days',component_property='style')],
+                        Input(component_id=f'{panel}_indicator',component_property='value'),
+                        {indicator:[{'font-size':18,'font-weight':'bold','margin-top':'8px','display':'block'},
+                                    {'font-size':16,'margin-top':'6px','display':'block'}] if (indicator in INDICATOR_PERIODS) and INDICATOR_PERIODS[indicator]
+                                   else [{'display':'none'},
+                                         {'display':'none'}]
+                         for indicator in ['none'] + list(INDICATOR_PERIODS)})
+
+# Stock inputs handled with partial figure updates (moving average only / indicator or forecast only / date window only)
+STOCK_MOVING_AVERAGE_INPUTS = {'moving_average_option.value', 'moving_average_days.value', 'moving_average_type.value'}
+STOCK_INDICATOR_INPUTS = {'stock_indicator.value', 'stock_indicator_days.value'}
+STOCK_FORECAST_INPUTS = {'stock_forecast.value'}
+STOCK_DATE_INPUTS = {'stock_plot_date_select.value', 'stock_tail_days.value', 'stock_date_range.start_date', 'stock_date_range.end_date'}
+
 @app.callback(Output(component_id='stock_plot',component_property='figure'),
               Output(component_id='stock_summary_table_title',component_property='children'),
               Output(component_id='stock_summary_table',component_property='columns'),
               Output(component_id='stock_summary_table',component_property='data'),
+              Output(component_id='stock_fetch_poll',component_property='disabled'),
+              Output(component_id='stock_chart_loaded',component_property='data'),
+              Output(component_id='stock_intraday_poll',component_property='disabled'),
+              Output(component_id='stock_intraday_state',component_property='data'),
               Input(component_id='stock_plot_type',component_property='value'),
               Input(component_id='stock_ticker',component_property='value'),
               Input(component_id='stock_plot_date_select',component_property='value'),
@@ -389,190 +1524,102 @@ def select_index_date_input(index_plot_date_select):
               Input(component_id='stock_date_range',component_property='start_date'),
               Input(component_id='stock_date_range',component_property='end_date'),
               Input(component_id='moving_average_option',component_property='value'),
-              Input(component_id='moving_average_days',component_property='value'))
-
-def stock_plot(stock_plot_type,stock_ticker,stock_plot_date_select,stock_tail_days,start_date,end_date,moving_average_option,moving_average_days):
-    stock_data = get_stock_ticker_data(stock_ticker)
-    if stock_plot_date_select == 'stock_days_back':
-        today = date.today()
-        begin_date = today - timedelta(days = stock_tail_days)
-        # stock_data 'Date' column is (pandas) datetime64[ns] where datetime objects are either (usually) datetime or date
-        # convert datetime objects to pandas datetime objects to allow for comparison:
-        stock_data_date_masked = stock_data.loc[stock_data['Date'] >= pd.Timestamp(begin_date)]
-    if stock_plot_date_select == 'stock_date_range':
-        stock_data_date_masked = stock_data.loc[((stock_data['Date'] >= pd.Timestamp(start_date)) & (stock_data['Date'] <= pd.Timestamp(end_date)))]
-    y_label = stock_chart_y_label(stock_ticker)
-    if (y_label == 'Price (£)'):
-        # Stock prices on London Stock Exchange are reported in pence (£0.01), not pounds.
-        # Need to divide by 100 to convert to pounds.
-        pound_mask = ['Open', 'High','Low','Close']
-        stock_plot_data = stock_data_date_masked.copy()
-        stock_plot_data.loc[:,pound_mask] = stock_data_date_masked.loc[:,pound_mask] / 100
-        stock_summary_data = stock_plot_data
-    else:
-        stock_plot_data = stock_data_date_masked
-        stock_summary_data = stock_plot_data
-    if (stock_plot_type == 'candle'):
-        if (moving_average_option == 'display_MA'):
-            MA_stock_data = stock_data.tail(len(stock_plot_data) + moving_average_days)
-            moving_average = MA_stock_data['Close'].rolling(moving_average_days).mean()
-            fig = go.Figure(data=[go.Candlestick(x=stock_plot_data['Date'],
-                                                 open=stock_plot_data['Open'],
-                                                 high=stock_plot_data['High'],
-                                                 low=stock_plot_data['Low'],
-                                                 close=stock_plot_data['Close'],
-                                                 increasing_line_color = 'darkseagreen',
-                                                 decreasing_line_color = 'red'),
-                                  go.Scatter(x=stock_plot_data['Date'],
-                                             y=moving_average[-len(stock_plot_data):],
-                                             mode = 'lines',
-                                             line_color = 'orange',
-                                             line_width = 2)])
-        else:
-            fig = go.Figure(data=[go.Candlestick(x=stock_plot_data['Date'],
-                                                 open=stock_plot_data['Open'],
-                                                 high=stock_plot_data['High'],
-                                                 low=stock_plot_data['Low'],
-                                                 close=stock_plot_data['Close'],
-                                                 increasing_line_color = 'darkseagreen',
-                                                 decreasing_line_color = 'red')])
+              Input(component_id='moving_average_days',component_property='value'),
+              Input(component_id='moving_average_type',component_property='value'),
+              Input(component_id='stock_downsample',component_property='value'),
+              Input(component_id='stock_indicator',component_property='value'),
+              Input(component_id='stock_indicator_days',component_property='value'),
+              Input(component_id='stock_forecast',component_property='value'),
+              Input(component_id='base_currency',component_property='value'),
+              Input(component_id='stock_interval',component_property='value'),
+              Input(component_id='stock_fetch_poll',component_property='n_intervals'),
+              Input(component_id='stock_intraday_poll',component_property='n_intervals'),
+              State(component_id='stock_chart_loaded',component_property='data'),
+              State(component_id='stock_intraday_state',component_property='data'))
+
+def stock_plot(stock_plot_type,stock_ticker,stock_plot_date_select,stock_tail_days,start_date,end_date,moving_average_option,moving_average_days,moving_average_type,stock_downsample,stock_indicator,stock_indicator_days,stock_forecast,base_currency,stock_interval,stock_fetch_poll,stock_intraday_poll,stock_chart_loaded,stock_intraday_state):
+    if (stock_plot_type == 'candle') and (moving_average_option == 'display_MA'):
+        moving_average_settings = (moving_average_type, moving_average_days)
     else:
-        fig = go.Figure(data=go.Scatter(x=stock_plot_data['Date'],
-                               y=stock_plot_data['Close'],
-                               mode = 'lines',
-                               line_color = 'black',
-                               line_width = 2))
-    fig.update_layout(title = f'<b>{stock_chart_title(stock_ticker)}</b>',
-                      title_font_size = 20,
-                      title_x=0.5,
-                      xaxis_title = '<b>Date</b>',
-                      yaxis_title = f'<b>{y_label}</b>',
-                      xaxis_rangeslider_visible=False,
-                      height = 430,
-                      margin = dict(
-                          b = 10,
-                          l = 80,
-                          r = 80,
-                          t = 40),
-                      showlegend = False,
-                      plot_bgcolor = 'white')
-    fig.update_xaxes(title_font_size = 15,
-                     tickfont_size = 12,
-                     showline = True, # plot area border line
-                     linecolor = 'black', # plot area border line color
-                     # use mirror = True to mirror make a rectangle around complet plot area
-                     gridcolor = 'lightgray')
-    fig.update_yaxes(title_font_size = 15,
-                     tickfont_size = 12,
-                     showline = True, # plot area border line
-                     linecolor = 'black', # plot area border line color
-                     gridcolor = 'lightgray')
-    if (max(stock_summary_data['High']) - min(stock_summary_data['Low']) < 5):
-        fig.update_yaxes(tickformat = '.2f')
-    summary_title = html.Label([f'{stock_chart_title(stock_ticker)}'+' summary table'])
-    stock_summary_data_max_high = stock_summary_data.loc[(stock_summary_data['High'] == max(stock_summary_data['High']))].reset_index(drop = True)
-    stock_summary_data_max_close = stock_summary_data.loc[(stock_summary_data['Close'] == max(stock_summary_data['Close']))].reset_index(drop = True)
-    stock_summary_data_min_close = stock_summary_data.loc[(stock_summary_data['Close'] == min(stock_summary_data['Close']))].reset_index(drop = True)
-    stock_summary_data_min_low = stock_summary_data.loc[(stock_summary_data['Low'] == min(stock_summary_data['Low']))].reset_index(drop = True)
-    # get rows corresponding to maxima and minima stock values
-    stock_plot_data_summary = construct_data_table(stock_summary_data_max_high,stock_summary_data_max_close,stock_summary_data_min_close,stock_summary_data_min_low,y_label)
-    columns = [{'name':' ', 'id':' '},
-               {'name':'Date','id':'Date'},
-               {'name':y_label,'id':y_label,'type':'numeric','format':Format(precision=2, scheme = Scheme.fixed)}]
-    data = stock_plot_data_summary.to_dict(orient = 'records')
-    return fig, summary_title, columns, data
-
-@app.callback(Output(component_id='stock_date_range',component_property='start_date'),
-              Output(component_id='stock_date_range',component_property='end_date'),
-              Input(component_id='stock_date_reset_button',component_property='n_clicks'))
-
-def stock_date_reset(n_clicks):
-    start_date = date.today() - timedelta(days = 30)
-    end_date = date.today()
-    return start_date,end_date
+        moving_average_settings = None
+    with timed_callback('stock'):
+        if (stock_interval != '1d'):
+            return intraday_chart_outputs('stock', stock_ticker, stock_interval, stock_plot_type, moving_average_settings, triggered_inputs(),
+                                          stock_chart_loaded, stock_intraday_state, 'stock_intraday_poll.n_intervals')
+        begin_date, end_date = chart_window(stock_plot_date_select == 'stock_days_back', stock_tail_days, start_date, end_date)
+        chart = price_chart('stock', stock_ticker, stock_plot_type, begin_date, end_date, moving_average_settings,
+                            chart_indicator_settings(stock_indicator, stock_indicator_days), stock_forecast == 'show_forecast',
+                            stock_downsample == 'downsample', display_currency(stock_ticker, base_currency))
+        return price_chart_outputs(chart, stock_plot_type, triggered_inputs(), stock_chart_loaded, STOCK_MOVING_AVERAGE_INPUTS, STOCK_INDICATOR_INPUTS, STOCK_FORECAST_INPUTS,
+                                   STOCK_DATE_INPUTS) + (True, None)
+
+date_reset_callback(Output(component_id='stock_date_range',component_property='start_date'),
+                    Output(component_id='stock_date_range',component_property='end_date'),
+                    Input(component_id='stock_date_reset_button',component_property='n_clicks'))
+
+# Index inputs handled with partial figure updates (indicator or forecast only / date window only)
+INDEX_INDICATOR_INPUTS = {'index_indicator.value', 'index_indicator_days.value'}
+INDEX_FORECAST_INPUTS = {'index_forecast.value'}
+INDEX_DATE_INPUTS = {'index_plot_date_select.value', 'index_tail_days.value', 'index_date_range.start_date', 'index_date_range.end_date'}
 
 @app.callback(Output(component_id='index_plot',component_property='figure'),
               Output(component_id='index_summary_table_title',component_property='children'),
               Output(component_id='index_summary_table',component_property='columns'),
               Output(component_id='index_summary_table',component_property='data'),
+              Output(component_id='index_fetch_poll',component_property='disabled'),
+              Output(component_id='index_chart_loaded',component_property='data'),
+              Output(component_id='index_intraday_poll',component_property='disabled'),
+              Output(component_id='index_intraday_state',component_property='data'),
               Input(component_id='index_plot_type',component_property='value'),
               Input(component_id='index_ticker',component_property='value'),
               Input(component_id='index_plot_date_select',component_property='value'),
               Input(component_id='index_tail_days',component_property='value'),
               Input(component_id='index_date_range',component_property='start_date'),
-              Input(component_id='index_date_range',component_property='end_date'))
-
-def index_plot(index_plot_type,index_ticker,index_plot_date_select,index_tail_days,start_date,end_date):
-    index_data = get_stock_ticker_data(index_ticker)
-    if index_plot_date_select == 'index_days_back':
-        today = date.today()
-        begin_date = today - timedelta(days = index_tail_days)
-        index_data_date_masked = index_data.loc[index_data['Date'] >= pd.Timestamp(begin_date)]
-    if index_plot_date_select == 'index_date_range':
-        index_data_date_masked = index_data.loc[((index_data['Date'] >= pd.Timestamp(start_date)) & (index_data['Date'] <= pd.Timestamp(end_date)))]
-    y_label = index_chart_y_label(index_ticker)
-    index_plot_data = index_data_date_masked
-    if (index_plot_type == 'candle'):
-        fig = go.Figure(data=[go.Candlestick(x=index_plot_data['Date'],
-                                             open=index_plot_data['Open'],
-                                             high=index_plot_data['High'],
-                                             low=index_plot_data['Low'],
-                                             close=index_plot_data['Close'],
-                                             increasing_line_color = 'darkseagreen',
-                                             decreasing_line_color = 'red')])
-    else:
-       fig = go.Figure(data=go.Scatter(x=index_plot_data['Date'],
-                                       y=index_plot_data['Close'],
-                                       mode = 'lines',
-                                       line_color = 'black',
-                                       line_width = 2)) 
-    fig.update_layout(title = f'<b>{index_chart_title(index_ticker)}</b>',
-                      title_font_size = 20,
-                      title_x=0.5,
-                      xaxis_title = '<b>Date</b>',
-                      yaxis_title = f'<b>{y_label}</b>',
-                      xaxis_rangeslider_visible=False,
-                      height = 430,
-                      margin = dict(
-                          b = 10,
-                          l = 80,
-                          r = 80,
-                          t = 40),
-                      plot_bgcolor = 'white')
-    fig.update_xaxes(title_font_size = 15,
-                     tickfont_size = 12,
-                     showline = True, # plot area border line
-                     linecolor = 'black', # plot area border line color
-                     gridcolor = 'lightgray')
-    fig.update_yaxes(title_font_size = 15,
-                     tickfont_size = 12,
-                     showline = True, # plot area border line
-                     linecolor = 'black', # plot area border line color
-                     gridcolor = 'lightgray')
-    if max(index_plot_data['High'] > 10000):
-        fig.update_yaxes(tickformat = '000')
-    summary_title = html.Label([f'{index_chart_title(index_ticker)}'+' summary table'])
-    # Relax volume > 0 restriction on extrema, since Python yfinance package can download current day's data (volume may be 0)
-    index_summary_data_max_high = index_plot_data.loc[(index_plot_data['High'] == max(index_plot_data['High']))].reset_index(drop = True)
-    index_summary_data_max_close = index_plot_data.loc[(index_plot_data['Close'] == max(index_plot_data['Close']))].reset_index(drop = True)
-    index_summary_data_min_close = index_plot_data.loc[(index_plot_data['Close'] == min(index_plot_data['Close']))].reset_index(drop = True)
-    index_summary_data_min_low = index_plot_data.loc[(index_plot_data['Low'] == min(index_plot_data['Low']))].reset_index(drop = True)
-    # get rows corresponding to maxima and minima index values
-    index_plot_data_summary = construct_data_table(index_summary_data_max_high,index_summary_data_max_close,index_summary_data_min_close,index_summary_data_min_low,y_label)
-    columns = [{'name':' ', 'id':' '},
-               {'name':'Date','id':'Date'},
-               {'name':y_label,'id':y_label,'type':'numeric','format':Format(precision=2, scheme = Scheme.fixed)}]
-    data = index_plot_data_summary.to_dict(orient = 'records')
-    return fig, summary_title, columns, data
-
-@app.callback(Output(component_id='index_date_range',component_property='start_date'),
-              Output(component_id='index_date_range',component_property='end_date'),
-              Input(component_id='index_date_reset_button',component_property='n_clicks'))
-
-def index_date_reset(n_clicks):
-    start_date = date.today() - timedelta(days = 30)
-    end_date = date.today()
-    return start_date,end_date
+              Input(component_id='index_date_range',component_property='end_date'),
+              Input(component_id='index_downsample',component_property='value'),
+              Input(component_id='index_indicator',component_property='value'),
+              Input(component_id='index_indicator_days',component_property='value'),
+              Input(component_id='index_forecast',component_property='value'),
+              Input(component_id='base_currency',component_property='value'),
+              Input(component_id='index_interval',component_property='value'),
+              Input(component_id='index_fetch_poll',component_property='n_intervals'),
+              Input(component_id='index_intraday_poll',component_property='n_intervals'),
+              State(component_id='index_chart_loaded',component_property='data'),
+              State(component_id='index_intraday_state',component_property='data'))
+
+def index_plot(index_plot_type,index_ticker,index_plot_date_select,index_tail_days,start_date,end_date,index_downsample,index_indicator,index_indicator_days,index_forecast,base_currency,index_interval,index_fetch_poll,index_intraday_poll,index_chart_loaded,index_intraday_state):
+    with timed_callback('index'):
+        if (index_interval != '1d'):
+            return intraday_chart_outputs('index', index_ticker, index_interval, index_plot_type, None, triggered_inputs(),
+                                          index_chart_loaded, index_intraday_state, 'index_intraday_poll.n_intervals')
+        begin_date, end_date = chart_window(index_plot_date_select == 'index_days_back', index_tail_days, start_date, end_date)
+        chart = price_chart('index', index_ticker, index_plot_type, begin_date, end_date, None,
+                            chart_indicator_settings(index_indicator, index_indicator_days), index_forecast == 'show_forecast',
+                            index_downsample == 'downsample', display_currency(index_ticker, base_currency))
+        return price_chart_outputs(chart, index_plot_type, triggered_inputs(), index_chart_loaded, set(), INDEX_INDICATOR_INPUTS, INDEX_FORECAST_INPUTS,
+                                   INDEX_DATE_INPUTS) + (True, None)
+
+date_reset_callback(Output(component_id='index_date_range',component_property='start_date'),
+                    Output(component_id='index_date_range',component_property='end_date'),
+                    Input(component_id='index_date_reset_button',component_property='n_clicks'))
+
+@app.callback(Output(component_id='comparison_plot',component_property='figure'),
+              Output(component_id='comparison_correlation_table',component_property='columns'),
+              Output(component_id='comparison_correlation_table',component_property='data'),
+              Output(component_id='comparison_fetch_poll',component_property='disabled'),
+              Input(component_id='comparison_tickers',component_property='value'),
+              Input(component_id='comparison_normalization',component_property='value'),
+              Input(component_id='comparison_tail_days',component_property='value'),
+              Input(component_id='base_currency',component_property='value'),
+              Input(component_id='comparison_fetch_poll',component_property='n_intervals'))
+
+def comparison_plot(comparison_tickers,comparison_normalization,comparison_tail_days,base_currency,comparison_fetch_poll):
+    begin_date, end_date = chart_window(True, comparison_tail_days, None, None)
+    with timed_callback('comparison'):
+        chart = comparison_chart(comparison_tickers or [], begin_date, comparison_normalization, base_currency)
+        if isinstance(chart, LoadingChart):
+            return loading_chart_figure(chart), [], [], False
+        return chart.figure, chart.columns, chart.records, True
 
 if __name__ == '__main__':
     app.run_server()
\ No newline at end of file
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Cold start of the app module, with lazy imports (the default) and with every
+module imported when the app loads (DASHBOARD_LAZY_IMPORTS=0). Every run is a
+new Python process that imports Dash_stock_dashboard and reports:
+
+- import: time to import the app module
+- first byte: time until the first page has been served
+- ready: time until /ready returns 200 (the warm-up has finished)
+- layout: time until the layout request (the browser's next request) is served
+- first chart: time until the first stock chart has been served (synthetic prices)
+
+all counted from the start of the import (medians of the runs), followed by an
+import time report per mode (from python -X importtime): the modules imported
+with the app module and the packages imported afterwards (deferred, or used by
+the benchmark), by cumulative import time.
+
+Run from the Python folder:  python benchmarks/benchmark_cold_start.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.dirname(BENCHMARKS_DIR)
+RUNS = 5
+REPORTED_MODULES = 12
+MODES = [('lazy imports', '1'), ('eager imports', '0')]
+MILESTONES = ['import', 'first byte', 'ready', 'layout', 'first chart']
+
+def child():
+    # One cold start, timings printed as JSON on stdout (nothing but the app is imported before the first page)
+    os.environ['DASHBOARD_PREFETCH'] = '0'
+    os.environ['DASHBOARD_FORECASTS'] = '0'
+    os.chdir(PYTHON_DIR)
+    sys.path.insert(0, PYTHON_DIR)
+    start = time.perf_counter()
+    import Dash_stock_dashboard as dashboard
+    timings = {'import':time.perf_counter() - start}
+    client = dashboard.server.test_client()
+    client.get('/')
+    timings['first byte'] = time.perf_counter() - start
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.001)
+    timings['ready'] = time.perf_counter() - start
+    client.get('/_dash-layout')
+    timings['layout'] = time.perf_counter() - start
+    from fixtures import import_dashboard
+    from dash_requests import post_callback
+    from benchmark_figure_payload import STOCK_INPUTS
+    import_dashboard()
+    dashboard.ASYNC_FETCH_ENABLED = False
+    status, body = post_callback(client, dashboard.app, 'stock_plot.figure', dict(STOCK_INPUTS), ['stock_ticker.value'])
+    assert status == 200, body
+    timings['first chart'] = time.perf_counter() - start
+    print(json.dumps(timings))
+
+def run_child(lazy_imports, import_time = False):
+    # (timings, stderr) of one cold start
+    environment = dict(os.environ, DASHBOARD_LAZY_IMPORTS = lazy_imports)
+    command = [sys.executable] + (['-X', 'importtime'] if import_time else []) + [os.path.abspath(__file__), '--child']
+    process = subprocess.run(command, env = environment, capture_output = True, text = True, check = True)
+    return json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+def import_time_report(stderr):
+    # (modules imported with the app module, packages imported afterwards) as [(cumulative seconds, name)]
+    # lists, parsed from the python -X importtime output (nested imports are listed before the
+    # module importing them, indented by two spaces per level)
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((level, name.strip(), int(cumulative) / 1e6))
+    app_position = next(position for position, (level, name, cumulative) in enumerate(entries) if name == 'Dash_stock_dashboard')
+    app_imports = []
+    for level, name, cumulative in reversed(entries[:app_position]):
+        if level == 0:
+            break
+        if level == 1:
+            app_imports.append((cumulative, name))
+    # the warm-up imports in another thread, which mixes up the levels: packages imported afterwards
+    # are reported by their top-level package instead
+    deferred_imports = {}
+    for level, name, cumulative in entries[app_position + 1:]:
+        package = name.split('.')[0]
+        deferred_imports[package] = max(deferred_imports.get(package, 0), cumulative)
+    return sorted(app_imports, reverse = True), sorted(((cumulative, package) for package, cumulative in deferred_imports.items()), reverse = True)
+
+def main(runs):
+    print(f'{"":16s}' + ''.join(f'{milestone:>13s}' for milestone in MILESTONES))
+    reports = {}
+    for mode, lazy_imports in MODES:
+        timings = [run_child(lazy_imports)[0] for _ in range(runs)]
+        print(f'{mode:16s}' + ''.join(f'{statistics.median(run[milestone] for run in timings) * 1e3:10.0f} ms' for milestone in MILESTONES))
+        reports[mode] = import_time_report(run_child(lazy_imports, import_time = True)[1])
+    for mode, (app_imports, deferred_imports) in reports.items():
+        print(f'\n{mode}: imported with the app module (cumulative, -X importtime)')
+        for cumulative, name in app_imports[:REPORTED_MODULES]:
+            print(f'  {name:40s} {cumulative * 1e3:8.1f} ms')
+        print(f'{mode}: imported after the app module (by package)')
+        for cumulative, name in deferred_imports[:REPORTED_MODULES]:
+            print(f'  {name:40s} {cumulative * 1e3:8.1f} ms')
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--child']:
+        sys.path.insert(0, BENCHMARKS_DIR)
+        child()
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else RUNS)
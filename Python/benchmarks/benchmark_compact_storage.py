@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Memory of one cached ticker history: the frame as returned by yfinance vs. the
+compact store format (pruned columns, day number dates, float64 or float32
+prices), and the rounding error float32 prices introduce in the summary table.
+
+Run from the Python folder:  python benchmarks/benchmark_compact_storage.py
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import SyntheticFetcher
+from price_store import PriceStore, PRICE_COLUMNS
+from price_analytics import price_extrema, SUMMARY_TABLE_ROWS
+
+YEARS = 50
+# price levels of the dashboard tickers, from a penny stock in pounds up to the Nikkei 225
+PRICE_LEVELS = [0.5, 40, 400, 4000, 40000]
+
+class YFinanceLikeFetcher(SyntheticFetcher):
+    # Synthetic bars with a timezone aware 'Date' column, like yfinance returns them
+    def fetch(self, ticker_symbol, start = None):
+        ticker_data = super().fetch(ticker_symbol, start = start)
+        ticker_data['Date'] = ticker_data['Date'].dt.tz_localize('America/New_York')
+        return ticker_data
+
+def frame_bytes(ticker_data):
+    return int(ticker_data.memory_usage(index = True, deep = True).sum())
+
+def main():
+    fetcher = YFinanceLikeFetcher(years = YEARS)
+    raw_data = fetcher.fetch('AAPL')
+    raw_data.index = pd.DatetimeIndex(raw_data['Date'].dt.tz_localize(None).values)
+    print(f'{len(raw_data):,} daily bars ({YEARS} years)')
+    print(f'{"yfinance frame (all columns, float64)":45s} {frame_bytes(raw_data):>12,} bytes')
+    stores = {}
+    for price_dtype in [np.float64, np.float32]:
+        store = PriceStore(tempfile.mkdtemp(prefix = 'price_store_'), fetcher = fetcher, price_dtype = price_dtype)
+        ticker_data = store.get('AAPL')
+        stores[np.dtype(price_dtype).name] = store
+        snapshot_bytes = os.path.getsize(store._snapshot_path('AAPL'))
+        # the prices are mapped from the snapshot (shared between processes), the dates are per process
+        per_process_bytes = ticker_data['Date'].nbytes + ticker_data.index.nbytes
+        print(f'{"compact, " + np.dtype(price_dtype).name + " prices: snapshot file":45s} {snapshot_bytes:>12,} bytes')
+        print(f'{"compact, " + np.dtype(price_dtype).name + " prices: frame":45s} {frame_bytes(ticker_data):>12,} bytes'
+              f'  ({per_process_bytes:,} not shared)')
+
+    print()
+    print('float32 rounding error of the summary table values (bound: price * 2**-24)')
+    full_data = stores['float64'].get('AAPL')
+    for price_level in PRICE_LEVELS:
+        scaled_data = full_data[PRICE_COLUMNS] * (price_level / full_data['Close'].iloc[-1])
+        exact = price_extrema(scaled_data)
+        rounded = price_extrema(scaled_data.astype(np.float32))
+        errors = [abs(float(rounded[extremum_key][0]) - exact[extremum_key][0]) for _, extremum_key in SUMMARY_TABLE_ROWS]
+        displayed_changes = sum(f'{float(rounded[extremum_key][0]):.2f}' != f'{exact[extremum_key][0]:.2f}' for _, extremum_key in SUMMARY_TABLE_ROWS)
+        bound = max(exact[extremum_key][0] for _, extremum_key in SUMMARY_TABLE_ROWS) * 2.0 ** -24
+        print(f'price level {price_level:>8,}: max error {max(errors):.2e} (bound {bound:.2e}), '
+              f'{displayed_changes} of {len(SUMMARY_TABLE_ROWS)} displayed values changed')
+
+if __name__ == '__main__':
+    main()
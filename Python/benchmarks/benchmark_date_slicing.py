@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: boolean mask vs binary search (searchsorted) date slicing
+on 50+ years of daily bars.
+
+Run from the Python folder:  python benchmarks/benchmark_date_slicing.py
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_analytics import date_window_positions
+
+def synthetic_history(start = '1970-01-01', end = '2026-01-01'):
+    dates = pd.bdate_range(start, end)
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, len(dates))))
+    price_data = pd.DataFrame({'Date':dates, 'Open':close, 'High':close * 1.01, 'Low':close * 0.99, 'Close':close})
+    price_data.index = pd.DatetimeIndex(price_data['Date'].values)
+    return price_data
+
+def mask_days_back(price_data, begin_date):
+    return price_data.loc[price_data['Date'] >= pd.Timestamp(begin_date)]
+
+def mask_date_range(price_data, start_date, end_date):
+    return price_data.loc[((price_data['Date'] >= pd.Timestamp(start_date)) & (price_data['Date'] <= pd.Timestamp(end_date)))]
+
+def search_days_back(price_data, begin_date):
+    start, stop = date_window_positions(price_data, begin_date)
+    return price_data.iloc[start:stop]
+
+def search_date_range(price_data, start_date, end_date):
+    start, stop = date_window_positions(price_data, start_date, end_date)
+    return price_data.iloc[start:stop]
+
+if __name__ == '__main__':
+    price_data = synthetic_history()
+    print(f'{len(price_data)} daily bars ({price_data.index[0].date()} to {price_data.index[-1].date()})')
+    cases = [('days back (30 days)', mask_days_back, search_days_back, ('2025-12-02',)),
+             ('date range (1 year, 1987)', mask_date_range, search_date_range, ('1987-01-01', '1987-12-31'))]
+    for name, mask_function, search_function, arguments in cases:
+        assert mask_function(price_data, *arguments).equals(search_function(price_data, *arguments))
+        repeats = 2000
+        mask_time = min(timeit.repeat(lambda: mask_function(price_data, *arguments), number = repeats, repeat = 5)) / repeats
+        search_time = min(timeit.repeat(lambda: search_function(price_data, *arguments), number = repeats, repeat = 5)) / repeats
+        print(f'{name:28s} mask: {mask_time * 1e6:8.1f} us   searchsorted: {search_time * 1e6:8.1f} us   speed-up: {mask_time / search_time:5.1f}x')
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Bytes sent back to the browser per interaction with the stock and index panels
+(response body of the Dash callback request), using offline synthetic data
+(date ranges ending on FIXTURE_END_DATE, the last day of the synthetic bars).
+
+Run from the Python folder:  python benchmarks/benchmark_figure_payload.py
+"""
+
+import time
+from datetime import timedelta
+
+from fixtures import FIXTURE_END_DATE, import_dashboard
+from dash_requests import post_callback, apply_response
+
+STOCK_INPUTS = {'stock_plot_type.value':'candle',
+                'stock_ticker.value':'AAPL',
+                'stock_plot_date_select.value':'stock_date_range',
+                'stock_tail_days.value':30,
+                'stock_date_range.start_date':str(FIXTURE_END_DATE.date() - timedelta(days = 30)),
+                'stock_date_range.end_date':str(FIXTURE_END_DATE.date()),
+                'moving_average_option.value':'display_MA',
+                'moving_average_days.value':7,
+                'moving_average_type.value':'SMA',
+                'stock_downsample.value':'downsample',
+                'stock_indicator.value':'none',
+                'stock_indicator_days.value':14,
+                'stock_forecast.value':'do_not_show_forecast',
+                'base_currency.value':'local',
+                'stock_interval.value':'1d',
+                'stock_fetch_poll.n_intervals':None,
+                'stock_intraday_poll.n_intervals':None,
+                'stock_chart_loaded.data':False,
+                'stock_intraday_state.data':None}
+
+INDEX_INPUTS = {'index_plot_type.value':'candle',
+                'index_ticker.value':'^GSPC',
+                'index_plot_date_select.value':'index_date_range',
+                'index_tail_days.value':30,
+                'index_date_range.start_date':str(FIXTURE_END_DATE.date() - timedelta(days = 30)),
+                'index_date_range.end_date':str(FIXTURE_END_DATE.date()),
+                'index_downsample.value':'downsample',
+                'index_indicator.value':'none',
+                'index_indicator_days.value':14,
+                'index_forecast.value':'do_not_show_forecast',
+                'base_currency.value':'local',
+                'index_interval.value':'1d',
+                'index_fetch_poll.n_intervals':None,
+                'index_intraday_poll.n_intervals':None,
+                'index_chart_loaded.data':False,
+                'index_intraday_state.data':None}
+
+# (description, output, changed inputs) - applied one after another like a user session
+INTERACTIONS = [('stock: initial load', 'stock_plot.figure', STOCK_INPUTS, {}),
+                ('stock: moving average period 7 -> 20', 'stock_plot.figure', STOCK_INPUTS, {'moving_average_days.value':20}),
+                ('stock: moving average type -> EMA', 'stock_plot.figure', STOCK_INPUTS, {'moving_average_type.value':'EMA'}),
+                ('stock: date range -> 1 year', 'stock_plot.figure', STOCK_INPUTS, {'stock_date_range.start_date':str(FIXTURE_END_DATE.date() - timedelta(days = 365))}),
+                ('stock: date range -> 10 years', 'stock_plot.figure', STOCK_INPUTS, {'stock_date_range.start_date':str(FIXTURE_END_DATE.date() - timedelta(days = 3650))}),
+                ('stock: indicator -> RSI', 'stock_plot.figure', STOCK_INPUTS, {'stock_indicator.value':'RSI'}),
+                ('stock: RSI period 14 -> 30', 'stock_plot.figure', STOCK_INPUTS, {'stock_indicator_days.value':30}),
+                ('stock: indicator -> MACD', 'stock_plot.figure', STOCK_INPUTS, {'stock_indicator.value':'MACD'}),
+                ('stock: forecast -> shown', 'stock_plot.figure', STOCK_INPUTS, {'stock_forecast.value':'show_forecast'}),
+                ('index: initial load', 'index_plot.figure', INDEX_INPUTS, {}),
+                ('index: date range -> 1 year', 'index_plot.figure', INDEX_INPUTS, {'index_date_range.start_date':str(FIXTURE_END_DATE.date() - timedelta(days = 365))}),
+                ('index: indicator -> drawdown', 'index_plot.figure', INDEX_INPUTS, {'index_indicator.value':'drawdown'}),
+                ('index: forecast -> shown', 'index_plot.figure', INDEX_INPUTS, {'index_forecast.value':'show_forecast'})]
+
+if __name__ == '__main__':
+    dashboard = import_dashboard()
+    from forecasting import retrain
+    # download the histories up front, so the initial loads are not answered with the loading state
+    ticker_symbols = [STOCK_INPUTS['stock_ticker.value'], INDEX_INPUTS['index_ticker.value']]
+    for ticker_symbol in ticker_symbols:
+        dashboard.load_ticker_data(ticker_symbol)
+    # and store their forecasts, as the forecast batch would
+    retrain(dashboard.price_store.store_dir, ticker_symbols, max_workers = 1, price_dtype = dashboard.price_store.price_dtype.name)
+    client = dashboard.server.test_client()
+    stock_inputs = dict(STOCK_INPUTS)
+    index_inputs = dict(INDEX_INPUTS)
+    total_bytes = 0
+    for description, output, defaults, changes in INTERACTIONS:
+        input_values = stock_inputs if defaults is STOCK_INPUTS else index_inputs
+        input_values.update(changes)
+        changed_inputs = list(changes)
+        start = time.perf_counter()
+        status, body = post_callback(client, dashboard.app, output, input_values, changed_inputs)
+        elapsed = time.perf_counter() - start
+        apply_response(input_values, body)
+        total_bytes += len(body)
+        print(f'{description:40s} {status}  {len(body):9,d} bytes  {elapsed * 1e3:7.1f} ms')
+    print(f'{"total":40s}      {total_bytes:9,d} bytes')
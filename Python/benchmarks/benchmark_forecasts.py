@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark and check of the forecast batch (forecasting.py), on the
+recorded fixtures (with --synthetic, synthetic bars for the tickers that were
+not recorded):
+
+- retrain: wall time to forecast every dashboard ticker from a filled price
+  store, on a process pool of 1 and of N workers, then the time of the next
+  scheduled run (nothing new to fit, every ticker skipped)
+- holdout: every ticker fitted without its last FORECAST_HORIZON bars, the
+  forecast compared to those bars: share of the bars inside the confidence
+  band and mean absolute error of the log prices, of the selected model and of
+  every model on its own (the random walk being the baseline to beat)
+- the stored forecasts read back by the price store, as the charts do
+
+Run from the Python folder:  python benchmarks/benchmark_forecasts.py [--synthetic] [workers (default: # of CPUs)]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import RecordedFetcher, dashboard_tickers
+from forecasting import retrain, forecast_prices, FORECAST_MODELS, FORECAST_HORIZON, FORECAST_TRAINING_DAYS
+from price_store import PriceStore
+
+def holdout_errors(price_data, horizon = FORECAST_HORIZON):
+    # (share of the held out closes inside the band, {model: mean absolute log error}) of a forecast
+    # made without the last horizon bars
+    training_data = price_data.iloc[:-horizon]
+    actual = np.log(price_data['Close'].to_numpy(dtype = np.float64)[-horizon:])
+    forecast = forecast_prices(training_data, horizon)[0]
+    coverage = np.mean((np.log(forecast['Lower'].to_numpy()) <= actual) & (actual <= np.log(forecast['Upper'].to_numpy())))
+    log_prices = np.log(training_data['Close'].to_numpy(dtype = np.float64)[-FORECAST_TRAINING_DAYS:])
+    errors = {name:float(np.mean(np.abs(model(log_prices, horizon)[0] - actual))) for name, model in FORECAST_MODELS.items()}
+    errors['selected'] = float(np.mean(np.abs(np.log(forecast['Forecast'].to_numpy()) - actual)))
+    return coverage, errors
+
+def main(workers, allow_synthetic = False):
+    stock_tickers, index_tickers = dashboard_tickers()
+    ticker_symbols = stock_tickers + index_tickers
+    fetcher = RecordedFetcher(allow_synthetic = allow_synthetic)
+    store = PriceStore(tempfile.mkdtemp(prefix = 'price_store_'), fetcher = fetcher)
+    for ticker_symbol in ticker_symbols:
+        store.get(ticker_symbol)
+    print(f'{len(ticker_symbols)} tickers ({len(fetcher.recorded)} recorded, {len(ticker_symbols) - len(fetcher.recorded)} synthetic)')
+    for max_workers in sorted({1, workers}):
+        results = retrain(store.store_dir, ticker_symbols, max_workers = max_workers, force = True)
+        fit_seconds = sum(details['seconds'] for details in results['trained'].values())
+        print(f'full retrain, {max_workers} worker(s): {results["seconds"]:7.2f} s wall, {fit_seconds:6.2f} s in the workers '
+              f'({len(results["trained"])} trained, {len(results["errors"])} failed)')
+        for ticker_symbol, error in results['errors'].items():
+            print(f'  {ticker_symbol}: {error}')
+    results = retrain(store.store_dir, ticker_symbols, max_workers = workers)
+    print(f'scheduled rerun, no new bars: {results["seconds"]:7.2f} s wall ({len(results["skipped"])} skipped)')
+    models = {}
+    for details in retrain(store.store_dir, ticker_symbols, max_workers = workers, force = True)['trained'].values():
+        models[details['model']] = models.get(details['model'], 0) + 1
+    print('selected models: ' + ', '.join(f'{model} {count}' for model, count in sorted(models.items())))
+
+    coverages = []
+    errors = {}
+    beats_random_walk = 0
+    for ticker_symbol in ticker_symbols:
+        coverage, ticker_errors = holdout_errors(store.load(ticker_symbol))
+        coverages.append(coverage)
+        for name, error in ticker_errors.items():
+            errors.setdefault(name, []).append(error)
+        beats_random_walk += ticker_errors['selected'] <= ticker_errors['random walk']
+    print(f'\nholdout of the last {FORECAST_HORIZON} bars: {np.mean(coverages) * 100:.1f}% of the closes inside the 95% band')
+    for name, model_errors in errors.items():
+        print(f'  {name:15s} mean absolute log error {np.mean(model_errors):.4f}')
+    print(f'  selected model at least as good as the random walk for {beats_random_walk} of {len(ticker_symbols)} tickers')
+
+    stored = [store.load_forecast(ticker_symbol) for ticker_symbol in ticker_symbols]
+    print(f'\nstored forecasts read back: {sum(forecast is not None and len(forecast[1]) == FORECAST_HORIZON for forecast in stored)} of {len(ticker_symbols)}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Forecast batch benchmark')
+    parser.add_argument('workers', nargs = '?', type = int, default = os.cpu_count())
+    parser.add_argument('--synthetic', action = 'store_true', help = 'use synthetic bars for the tickers that have not been recorded')
+    arguments = parser.parse_args()
+    main(arguments.workers, arguments.synthetic)
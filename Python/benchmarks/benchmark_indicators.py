@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark and regression check of the technical indicators (indicators.py):
+the vectorized indicators against straightforward reference implementations
+(Python loops for Wilder's smoothing, pandas rolling / ewm for the others) on
+a synthetic 50 year daily history, then the time to compute every indicator
+over the full history against the time to serve a date window from the
+precomputed arrays (what the chart callbacks do once a ticker's indicators
+are cached).
+
+Run from the Python folder:  python benchmarks/benchmark_indicators.py
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from fixtures import SyntheticFetcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from indicators import TechnicalIndicators, INDICATOR_PERIODS, MACD_SPANS
+from price_store import normalize_ticker_data
+
+TICKER = 'AAPL'
+HISTORY_YEARS = 50
+PERIODS = [5, 14, 50]
+# date windows served from the precomputed arrays: last 30 days, last year, last 10 years
+WINDOW_DAYS = [30, 261, 2610]
+REPEATS = 20
+
+def reference_wilder_average(values, period):
+    # Mean of the first period values, then average = average + (value - average) / period
+    averages = np.full(len(values), np.nan)
+    if len(values) < period:
+        return averages
+    average = np.mean(values[:period])
+    averages[period - 1] = average
+    for position in range(period, len(values)):
+        average += (values[position] - average) / period
+        averages[position] = average
+    return averages
+
+def reference_lines(price_data, indicator, period):
+    high, low, close = price_data['High'], price_data['Low'], price_data['Close']
+    if (indicator == 'RSI'):
+        changes = close.diff().to_numpy()[1:]
+        gains = reference_wilder_average(np.where(changes > 0, changes, 0.0), period)
+        losses = reference_wilder_average(np.where(changes < 0, -changes, 0.0), period)
+        return [np.concatenate([[np.nan], 100 * gains / (gains + losses)])]
+    if (indicator == 'MACD'):
+        fast_span, slow_span, signal_span = MACD_SPANS
+        macd_line = close.ewm(span = fast_span, adjust = False).mean() - close.ewm(span = slow_span, adjust = False).mean()
+        signal_line = macd_line.ewm(span = signal_span, adjust = False).mean()
+        return [macd_line.to_numpy(), signal_line.to_numpy(), (macd_line - signal_line).to_numpy()]
+    if (indicator == 'ATR'):
+        previous_close = close.shift(1)
+        true_range = pd.concat([high - low, (high - previous_close).abs(), (low - previous_close).abs()], axis = 1).max(axis = 1)
+        return [reference_wilder_average(true_range.to_numpy(), period)]
+    if (indicator == 'VWAP'):
+        typical_price = (high + low + close) / 3
+        volume = price_data['Volume']
+        return [((typical_price * volume).rolling(period).sum() / volume.rolling(period).sum()).to_numpy()]
+    return [((close / close.cummax() - 1) * 100).to_numpy()]
+
+def main():
+    price_data = normalize_ticker_data(SyntheticFetcher(years = HISTORY_YEARS).history(TICKER))
+    indicator_settings = [(indicator, period) for indicator, has_period in INDICATOR_PERIODS.items()
+                          for period in (PERIODS if has_period else [None])]
+    print(f'{TICKER}: {len(price_data):,} daily bars (synthetic)')
+    ticker_indicators = TechnicalIndicators(price_data)
+    for indicator, period in indicator_settings:
+        lines = ticker_indicators.lines(indicator, period, 0, len(price_data))
+        reference = reference_lines(price_data, indicator, period)
+        error = max(float(np.nanmax(np.abs(line - reference_line))) for line, reference_line in zip(lines, reference))
+        same_missing = all((np.isnan(line) == np.isnan(reference_line)).all() for line, reference_line in zip(lines, reference))
+        label = indicator if period is None else f'{indicator} {period}'
+        print(f'{label:12s} max abs difference to the reference {error:.2e}, same missing values: {same_missing}')
+    def compute_all():
+        full_history_indicators = TechnicalIndicators(price_data)
+        for indicator, period in indicator_settings:
+            full_history_indicators.lines(indicator, period, 0, len(price_data))
+    compute_seconds = min(timeit.repeat(compute_all, number = 1, repeat = REPEATS))
+    print(f'\nall {len(indicator_settings)} indicators over the full history: {compute_seconds * 1e3:8.2f} ms '
+          f'({ticker_indicators.nbytes() / 1e6:.1f} MB cached)')
+    for window_days in WINDOW_DAYS:
+        def serve_windows():
+            for indicator, period in indicator_settings:
+                ticker_indicators.lines(indicator, period, len(price_data) - window_days, len(price_data))
+        serve_seconds = min(timeit.repeat(serve_windows, number = 1, repeat = REPEATS))
+        print(f'all {len(indicator_settings)} indicators, {window_days:5d} day window from the cache: {serve_seconds * 1e3:8.3f} ms')
+
+if __name__ == '__main__':
+    main()
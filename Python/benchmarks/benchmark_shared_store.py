@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-process benchmark of the shared price store: several worker processes
+(as under gunicorn) load the same tickers from one store directory. Reports how
+many downloads were made per ticker and the private memory every worker needs
+for the price data, memory-mapped snapshots vs. per-worker copies read from
+SQLite (Linux only, read from /proc/self/smaps_rollup).
+
+Run from the Python folder:  python benchmarks/benchmark_shared_store.py [workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import multiprocessing
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import SyntheticFetcher
+from price_store import PriceStore
+
+TICKERS = ['AAPL', 'MSFT', 'BP.L', 'BAS.DE', '^GSPC', '^N225', '^FTSE', '0386.HK']
+
+class SlowCountingFetcher(SyntheticFetcher):
+    # Synthetic data with a network-like delay; every download is logged to a file shared by the workers
+    def __init__(self, log_path, delay = 0.5):
+        super().__init__(years = 50)
+        self.log_path = log_path
+        self.delay = delay
+
+    def fetch(self, ticker_symbol, start = None):
+        time.sleep(self.delay)
+        with open(self.log_path, 'a') as log_file:
+            log_file.write(ticker_symbol + '\n')
+        return super().fetch(ticker_symbol, start = start)
+
+def memory_kilobytes():
+    # (resident, private) memory of this process in kB
+    values = {}
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            fields = line.split()
+            if len(fields) >= 2 and fields[1].isdigit():
+                values[fields[0].rstrip(':')] = int(fields[1])
+    return values['Rss'], values['Private_Clean'] + values['Private_Dirty']
+
+def load_sqlite_copy(store, ticker_symbol):
+    # How every worker held the prices before: its own copy read from SQLite
+    connection = store._connect(ticker_symbol)
+    ticker_data = pd.read_sql('SELECT * FROM prices ORDER BY Date', connection, parse_dates = ['Date'])
+    connection.close()
+    return ticker_data
+
+def private_memory_growth(loader):
+    # Private memory (MB) added by loading every ticker and touching every price, as the chart callbacks would
+    resident_before, private_before = memory_kilobytes()
+    frames = [loader(ticker_symbol) for ticker_symbol in TICKERS]
+    checksum = sum(float(frame[column].to_numpy().sum()) for frame in frames for column in ['Open', 'High', 'Low', 'Close'])
+    resident_after, private_after = memory_kilobytes()
+    return (private_after - private_before) / 1024, frames, checksum
+
+def worker(store_dir, log_path, results):
+    store = PriceStore(store_dir, fetcher = SlowCountingFetcher(log_path), backoff = 0)
+    # first pass: download (once per host) and warm up the code paths
+    for ticker_symbol in TICKERS:
+        store.get(ticker_symbol)
+    snapshot_growth, snapshot_frames, snapshot_checksum = private_memory_growth(store.load)
+    sqlite_growth, sqlite_frames, sqlite_checksum = private_memory_growth(lambda ticker_symbol: load_sqlite_copy(store, ticker_symbol))
+    results.put((os.getpid(), snapshot_growth, sqlite_growth, snapshot_checksum == sqlite_checksum))
+
+def main(workers):
+    store_dir = tempfile.mkdtemp(prefix = 'price_store_')
+    log_path = os.path.join(store_dir, 'downloads.log')
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target = worker, args = (store_dir, log_path, results)) for _ in range(workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    with open(log_path) as log_file:
+        downloads = log_file.read().split()
+    print(f'{workers} workers, {len(TICKERS)} tickers, {elapsed:.1f} s')
+    print(f'downloads: {len(downloads)} ({len(downloads) / len(TICKERS):.1f} per ticker)')
+    print('private memory per worker for the price data:')
+    for pid, snapshot_growth, sqlite_growth, same_prices in sorted(results.get() for _ in processes):
+        print(f'worker {pid}: memory-mapped snapshots {snapshot_growth:6.1f} MB, '
+              f'SQLite copies {sqlite_growth:6.1f} MB, same prices: {same_prices}')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark and regression check of the summary table extrema: the original
+construct_data_table (one DataFrame + pd.concat per tied row) against the
+NumPy based price_extrema / summary_table_records.
+
+Run from the Python folder:  python benchmarks/benchmark_summary_table.py
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_analytics import price_extrema, summary_table_records
+
+# Original implementation, kept as the reference output
+def construct_data_table(summary_data_max_high,summary_data_max_close,summary_data_min_close,summary_data_min_low,y_label):
+    for max_high in range(0,len(summary_data_max_high)):
+        # iterate through high price maxima
+        if max_high == 0:
+            # if only one maxima / first maxima
+            max_high_data = pd.DataFrame(data = {' ':'Maximum Price',
+                                                  'Date':summary_data_max_high.loc[max_high,'Date'].date().strftime("%m-%d-%Y"),
+                                                  y_label:summary_data_max_high.loc[max_high,'High']},
+                                         index = [max_high])
+        else:
+            # additional local maxima
+            max_high_data_vector = pd.DataFrame(data = {' ':'',
+                                                        'Date':summary_data_max_high.loc[max_high,'Date'].date().strftime("%m-%d-%Y"),
+                                                        y_label:summary_data_max_high.loc[max_high,'High']},
+                                                index = [max_high])
+            max_high_data = pd.concat([max_high_data, max_high_data_vector], ignore_index = True)
+    for max_close in range(0,len(summary_data_max_close)):
+        if max_close == 0:
+            max_close_data = pd.DataFrame(data = {' ':'Maximum Closing Price',
+                                                  'Date':summary_data_max_close.loc[max_close,'Date'].date().strftime("%m-%d-%Y"),
+                                                  y_label:summary_data_max_close.loc[max_close,'Close']},
+                                          index = [max_close])
+        else:
+            max_close_data_vector = pd.DataFrame(data = {' ':'',
+                                                         'Date':summary_data_max_close.loc[max_close,'Date'].date().strftime("%m-%d-%Y"),
+                                                         y_label:summary_data_max_close.loc[max_close,'Close']},
+                                                 index = [max_close])
+            max_close_data = pd.concat([max_close_data, max_close_data_vector], ignore_index = True)
+    for min_close in range(0,len(summary_data_min_close)):
+        if min_close == 0:
+            min_close_data = pd.DataFrame(data = {' ':'Minimum Closing Price',
+                                                  'Date':summary_data_min_close.loc[min_close,'Date'].date().strftime("%m-%d-%Y"),
+                                                  y_label:summary_data_min_close.loc[min_close,'Close']},
+                                          index = [min_close])
+        else:
+            min_close_data_vector = pd.DataFrame(data = {' ':'',
+                                                         'Date':summary_data_min_close.loc[min_close,'Date'].date().strftime("%m-%d-%Y"),
+                                                         y_label:summary_data_min_close.loc[min_close,'Close']},
+                                                 index = [min_close])
+            min_close_data = pd.concat([min_close_data, min_close_data_vector], ignore_index = True)
+    for min_low in range(0,len(summary_data_min_low)):
+        if min_low == 0:
+            min_low_data = pd.DataFrame(data = {' ':'Minimum Price',
+                                                  'Date':summary_data_min_low.loc[min_low,'Date'].date().strftime("%m-%d-%Y"),
+                                                  y_label:summary_data_min_low.loc[min_low,'Low']},
+                                        index = [min_low])
+        else:
+            min_low_data_vector = pd.DataFrame(data = {' ':'',
+                                                       'Date':summary_data_min_low.loc[min_low,'Date'].date().strftime("%m-%d-%Y"),
+                                                       y_label:summary_data_min_low.loc[min_low,'Low']},
+                                               index = [min_low])
+            min_low_data = pd.concat([min_low_data, min_low_data_vector], ignore_index = True)
+    plot_data_summary = pd.concat([max_high_data, max_close_data, min_close_data, min_low_data], ignore_index = True)
+    # combine all dataframes for maxima and minima together into one
+    return plot_data_summary
+
+def reference_records(price_data, y_label):
+    max_high = price_data.loc[(price_data['High'] == max(price_data['High']))].reset_index(drop = True)
+    max_close = price_data.loc[(price_data['Close'] == max(price_data['Close']))].reset_index(drop = True)
+    min_close = price_data.loc[(price_data['Close'] == min(price_data['Close']))].reset_index(drop = True)
+    min_low = price_data.loc[(price_data['Low'] == min(price_data['Low']))].reset_index(drop = True)
+    return construct_data_table(max_high, max_close, min_close, min_low, y_label).to_dict(orient = 'records')
+
+def vectorized_records(price_data, y_label):
+    return summary_table_records(price_data, price_extrema(price_data), y_label)
+
+def synthetic_window(length, seed):
+    # Prices rounded to whole cents so that tied extrema occur
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 0.5, length)).clip(-50, 50), 0)
+    dates = pd.bdate_range('1990-01-01', periods = length)
+    return pd.DataFrame({'Date':dates, 'Open':close, 'High':close + 1, 'Low':close - 1, 'Close':close},
+                        index = pd.DatetimeIndex(dates))
+
+if __name__ == '__main__':
+    y_label = 'Price ($)'
+    for length in [30, 1000, 10000]:
+        for seed in range(20):
+            price_data = synthetic_window(length, seed)
+            assert reference_records(price_data, y_label) == vectorized_records(price_data, y_label)
+        price_data = synthetic_window(length, 0)
+        tied_rows = len(vectorized_records(price_data, y_label))
+        repeats = 20
+        reference_time = min(timeit.repeat(lambda: reference_records(price_data, y_label), number = repeats, repeat = 3)) / repeats
+        vectorized_time = min(timeit.repeat(lambda: vectorized_records(price_data, y_label), number = repeats, repeat = 3)) / repeats
+        print(f'{length:6d} bars, {tied_rows:4d} table rows   construct_data_table: {reference_time * 1e3:8.2f} ms   '
+              f'vectorized: {vectorized_time * 1e3:6.2f} ms   speed-up: {reference_time / vectorized_time:6.1f}x')
+    print('Output identical to construct_data_table')
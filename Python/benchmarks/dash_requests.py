@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers to send Dash callback requests to the Flask server the same way the
+browser does (POST /_dash-update-component) and to apply the responses
+(partial updates included) like the browser, used to measure response sizes
+and request volume.
+"""
+
+import json
+
+from dash._utils import split_callback_id
+
+def callback_key(app, output):
+    # Key of the callback in app.callback_map that updates output ('component_id.property')
+    for key in app.callback_map:
+        if f'..{output}..' in key or key == output:
+            return key
+    raise KeyError(output)
+
+def callback_request_body(app, output, input_values, changed_inputs):
+    # input_values: {'component_id.property': value} for every input (and state) of the callback,
+    # changed_inputs: the inputs that triggered the request
+    key = callback_key(app, output)
+    def values(dependencies):
+        return [{'id':dependency['id'],
+                 'property':dependency['property'],
+                 'value':input_values[f"{dependency['id']}.{dependency['property']}"]} for dependency in dependencies]
+    return {'output':key,
+            'outputs':split_callback_id(key),
+            'inputs':values(app.callback_map[key]['inputs']),
+            'changedPropIds':list(changed_inputs),
+            'state':values(app.callback_map[key]['state'])}
+
+def post_callback(client, app, output, input_values, changed_inputs):
+    # Returns (status code, response body bytes)
+    response = client.post('/_dash-update-component',
+                           data = json.dumps(callback_request_body(app, output, input_values, changed_inputs)),
+                           content_type = 'application/json')
+    return response.status_code, response.get_data()
+
+def apply_response(input_values, body):
+    # Copy the outputs of a callback response that are inputs / states of the callback as well
+    # (e.g. the chart loaded flag) into input_values, as the browser would
+    for component_id, properties in json.loads(body)['response'].items():
+        for component_property, value in properties.items():
+            if f'{component_id}.{component_property}' in input_values:
+                input_values[f'{component_id}.{component_property}'] = value
+
+def apply_patch(value, patch):
+    # Apply a partial update (the JSON of a dash.Patch output) to a property value, as the
+    # browser does (the Assign, Delete and Extend operations, negative indices count from the end)
+    for operation in patch['operations']:
+        *parents, key = operation['location']
+        target = value
+        for location in parents:
+            target = target[location]
+        if (operation['operation'] == 'Assign'):
+            target[key] = operation['params']['value']
+        elif (operation['operation'] == 'Delete'):
+            del target[key]
+        elif (operation['operation'] == 'Extend'):
+            target[key].extend(operation['params']['value'])
+        else:
+            raise ValueError(f"Unsupported patch operation {operation['operation']}")
+    return value
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Offline price data for the benchmarks: a fetcher that serves synthetic daily
+bars in the format returned by yfinance, a fetcher that serves bars recorded
+with record_fixtures.py, an intraday feed replaying recorded intraday bars as
+if they were arriving live, and a helper to import the dashboard module with
+its price store pointed at a temporary directory.
+
+A ticker that has not been recorded is an error, unless the fetcher is made
+with allow_synthetic = True (the --synthetic option of the benchmarks): it
+then gets synthetic bars, with a warning.
+
+The synthetic bars end on FIXTURE_END_DATE rather than today, and the imported
+dashboard takes that date as today, so the results do not drift from day to
+day or between machines.
+"""
+
+import os
+import sys
+import tempfile
+import warnings
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recorded')
+# Last day of the synthetic bars, and 'today' for the 'days back' windows of the imported dashboard
+FIXTURE_END_DATE = pd.Timestamp('2025-12-31')
+
+class SyntheticFetcher:
+    # Deterministic random walk per ticker (same data on every run), ending on FIXTURE_END_DATE
+    def __init__(self, years = 30):
+        self.years = years
+        self.calls = 0
+
+    def history(self, ticker_symbol):
+        rng = np.random.default_rng(zlib.crc32(ticker_symbol.encode()))
+        dates = pd.bdate_range(end = FIXTURE_END_DATE, periods = 261 * self.years)
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.015, len(dates))))
+        open_price = close * np.exp(rng.normal(0, 0.005, len(dates)))
+        high = np.maximum(open_price, close) * np.exp(np.abs(rng.normal(0, 0.006, len(dates))))
+        low = np.minimum(open_price, close) * np.exp(-np.abs(rng.normal(0, 0.006, len(dates))))
+        return pd.DataFrame({'Date':dates,
+                             'Open':open_price,
+                             'High':high,
+                             'Low':low,
+                             'Close':close,
+                             'Volume':rng.integers(100000, 10000000, len(dates)),
+                             'Dividends':0.0,
+                             'Stock Splits':0.0})
+
+    def fetch(self, ticker_symbol, start = None):
+        self.calls += 1
+        ticker_data = self.history(ticker_symbol)
+        if start is not None:
+            ticker_data = ticker_data.loc[ticker_data['Date'] >= pd.Timestamp(start)]
+        return ticker_data.reset_index(drop = True)
+
+def recorded_path(ticker_symbol, recorded_dir = RECORDED_DIR, interval = '1d'):
+    file_name = ticker_symbol.replace('^', '_').replace('/', '_')
+    if (interval != '1d'):
+        file_name += f'_{interval}'
+    return os.path.join(recorded_dir, f'{file_name}.csv')
+
+def check_not_recorded(path, allow_synthetic):
+    # Warns that synthetic bars are served instead of the missing recording at path, or raises
+    # FileNotFoundError if synthetic bars are not allowed
+    message = f'No recorded fixture {os.path.relpath(path)} (record it with benchmarks/record_fixtures.py'
+    if not allow_synthetic:
+        raise FileNotFoundError(f'{message}, or run with --synthetic to use synthetic bars)')
+    warnings.warn(f'{message}), serving synthetic bars instead', stacklevel = 3)
+
+class RecordedFetcher(SyntheticFetcher):
+    # Serves the bars recorded with record_fixtures.py. With allow_synthetic, tickers that have not
+    # been recorded get synthetic bars instead, with a warning (recorded lists which tickers came
+    # from a recording); otherwise they raise FileNotFoundError.
+    def __init__(self, recorded_dir = RECORDED_DIR, years = 30, allow_synthetic = False):
+        super().__init__(years = years)
+        self.recorded_dir = recorded_dir
+        self.allow_synthetic = allow_synthetic
+        self.recorded = set()
+
+    def history(self, ticker_symbol):
+        path = recorded_path(ticker_symbol, self.recorded_dir)
+        if not os.path.exists(path):
+            check_not_recorded(path, self.allow_synthetic)
+            return super().history(ticker_symbol)
+        self.recorded.add(ticker_symbol)
+        return pd.read_csv(path, parse_dates = ['Date'])
+
+# Intraday bar length and trading session (exchange time) of the synthetic intraday bars
+INTRADAY_BAR_MINUTES = {'1m':1, '5m':5, '1h':60}
+SESSION_OPEN, SESSION_CLOSE = pd.Timedelta(hours = 9, minutes = 30), pd.Timedelta(hours = 16)
+
+def synthetic_intraday_history(ticker_symbol, interval, bars):
+    # Deterministic random walk of bars intraday bars during the trading sessions of the last business days
+    rng = np.random.default_rng(zlib.crc32(f'{ticker_symbol} {interval}'.encode()))
+    bar_length = pd.Timedelta(minutes = INTRADAY_BAR_MINUTES[interval])
+    session_offsets = pd.timedelta_range(SESSION_OPEN, SESSION_CLOSE - bar_length, freq = bar_length)
+    days = pd.bdate_range(end = FIXTURE_END_DATE, periods = bars // len(session_offsets) + 1)
+    dates = (days.values[:, np.newaxis] + session_offsets.values[np.newaxis, :]).ravel()[-bars:]
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001 * np.sqrt(INTRADAY_BAR_MINUTES[interval]), bars)))
+    open_price = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0005, bars))
+    return pd.DataFrame({'Date':dates,
+                         'Open':open_price,
+                         'High':np.maximum(open_price, close) * (1 + spread),
+                         'Low':np.minimum(open_price, close) * (1 - spread),
+                         'Close':close,
+                         'Volume':rng.integers(1000, 100000, bars)})
+
+class ReplayFetcher:
+    # Intraday feed (see intraday.py) replaying bars as if they were arriving live: recorded bars
+    # (record_fixtures.py --interval), or with allow_synthetic synthetic ones (with a warning) for tickers that have
+    # not been recorded. The first history_bars bars are there from the start and advance() releases the following ones.
+    # The latest bar released is served as a partial bar (half of its move, the High / Low so far),
+    # the complete bar is served once the next bar has been released.
+    def __init__(self, history_bars = 1000, replay_bars = 1000, recorded_dir = RECORDED_DIR, allow_synthetic = False):
+        self.history_bars = history_bars
+        self.replay_bars = replay_bars
+        self.recorded_dir = recorded_dir
+        self.allow_synthetic = allow_synthetic
+        self.released = 0
+        self.calls = 0
+        self._histories = {}
+
+    def history(self, ticker_symbol, interval):
+        if (ticker_symbol, interval) not in self._histories:
+            path = recorded_path(ticker_symbol, self.recorded_dir, interval)
+            if os.path.exists(path):
+                history = pd.read_csv(path, parse_dates = ['Date'])
+            else:
+                check_not_recorded(path, self.allow_synthetic)
+                history = synthetic_intraday_history(ticker_symbol, interval, self.history_bars + self.replay_bars)
+            self._histories[(ticker_symbol, interval)] = history
+        return self._histories[(ticker_symbol, interval)]
+
+    def advance(self, bars = 1):
+        self.released += bars
+
+    def served_bars(self, ticker_symbol, interval):
+        # Bars released so far, as complete bars
+        history = self.history(ticker_symbol, interval)
+        return history.iloc[:min(self.history_bars + self.released, len(history))]
+
+    def fetch(self, ticker_symbol, interval, start = None):
+        self.calls += 1
+        ticker_data = self.served_bars(ticker_symbol, interval).copy()
+        last = ticker_data.index[-1]
+        partial_close = (ticker_data.at[last, 'Open'] + ticker_data.at[last, 'Close']) / 2
+        ticker_data.at[last, 'Close'] = partial_close
+        ticker_data.at[last, 'High'] = max(ticker_data.at[last, 'Open'], partial_close)
+        ticker_data.at[last, 'Low'] = min(ticker_data.at[last, 'Open'], partial_close)
+        if start is not None:
+            # like yfinance, from the start of the day of start on
+            ticker_data = ticker_data.loc[ticker_data['Date'] >= pd.Timestamp(start).normalize()]
+        return ticker_data.reset_index(drop = True)
+
+def dashboard_tickers():
+    # Every stock and index listed in Stock_list.csv / Index_list.csv
+    return [pd.read_csv(os.path.join(PYTHON_DIR, file_name), header = None)[0].tolist()
+            for file_name in ['Stock_list.csv', 'Index_list.csv']]
+
+class FixtureDate(date):
+    # date whose today() is FIXTURE_END_DATE
+    @classmethod
+    def today(cls):
+        return FIXTURE_END_DATE.date()
+
+def import_dashboard(fetcher = None):
+    # Import Dash_stock_dashboard offline: no background prefetching or forecast batches, price
+    # store in a temporary directory filled by the given fetcher (SyntheticFetcher by default) and
+    # 'days back' windows counted back from FIXTURE_END_DATE
+    os.environ['DASHBOARD_PREFETCH'] = '0'
+    os.environ['DASHBOARD_FORECASTS'] = '0'
+    os.chdir(PYTHON_DIR)
+    if PYTHON_DIR not in sys.path:
+        sys.path.insert(0, PYTHON_DIR)
+    import Dash_stock_dashboard as dashboard
+    dashboard.price_store.store_dir = tempfile.mkdtemp(prefix = 'price_store_')
+    dashboard.price_store.fetcher = fetcher if fetcher is not None else SyntheticFetcher()
+    dashboard.date = FixtureDate
+    return dashboard
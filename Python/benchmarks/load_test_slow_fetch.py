@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Load test of the stock chart callback with a deliberately slow data source,
+with downloads in the callbacks (synchronous) vs. on the background job queue.
+
+A fixed pool of server workers (like synchronous gunicorn workers) serves two
+kinds of users: users viewing a ticker that is already stored, and users
+opening tickers that have to be downloaded first from a stub fetcher that
+takes FETCH_DELAY seconds. Browsers wait for the loading state outside of the
+server workers, polling like the dashboard page does.
+
+Run from the Python folder:  python benchmarks/load_test_slow_fetch.py
+"""
+
+import json
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from fixtures import SyntheticFetcher, import_dashboard
+from dash_requests import post_callback, apply_response
+from benchmark_figure_payload import STOCK_INPUTS
+
+SERVER_WORKERS = 4
+FETCH_DELAY = 3.0
+STORED_TICKER = 'AAPL'
+VIEWING_USERS = 12
+REQUESTS_PER_VIEWING_USER = 25
+OPENING_USERS = 8
+
+class SlowStubFetcher(SyntheticFetcher):
+    # Synthetic bars served after FETCH_DELAY seconds, like a slow upstream
+    def fetch(self, ticker_symbol, start = None):
+        time.sleep(FETCH_DELAY)
+        return super().fetch(ticker_symbol, start = start)
+
+class ServerWorkers:
+    # At most SERVER_WORKERS requests are processed at the same time
+    def __init__(self, dashboard):
+        self.dashboard = dashboard
+        self.workers = threading.Semaphore(SERVER_WORKERS)
+        self.local = threading.local()
+
+    def post(self, input_values, changed_inputs):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.dashboard.server.test_client()
+        with self.workers:
+            status, body = post_callback(self.local.client, self.dashboard.app, 'stock_plot.figure', input_values, changed_inputs)
+        assert status == 200, body
+        return body
+
+def viewing_user(server, user, latencies, finish_times):
+    # Changes the 'days back' window of the stored ticker over and over
+    input_values = dict(STOCK_INPUTS, **{'stock_ticker.value':STORED_TICKER,
+                                         'stock_plot_date_select.value':'stock_days_back'})
+    for request in range(REQUESTS_PER_VIEWING_USER):
+        input_values['stock_tail_days.value'] = 30 + 30 * ((user + request) % 24)
+        start = time.perf_counter()
+        apply_response(input_values, server.post(input_values, ['stock_tail_days.value']))
+        latencies.append(time.perf_counter() - start)
+    finish_times.append(time.perf_counter())
+
+def opening_user(server, ticker_symbol, times_to_chart, poll_interval):
+    # Opens a ticker that has not been downloaded yet and waits until its chart is shown
+    input_values = dict(STOCK_INPUTS, **{'stock_ticker.value':ticker_symbol})
+    start = time.perf_counter()
+    apply_response(input_values, server.post(input_values, ['stock_ticker.value']))
+    polls = 0
+    while not input_values['stock_chart_loaded.data']:
+        time.sleep(poll_interval)
+        polls += 1
+        input_values['stock_fetch_poll.n_intervals'] = polls
+        apply_response(input_values, server.post(input_values, ['stock_fetch_poll.n_intervals']))
+    times_to_chart.append(time.perf_counter() - start)
+
+def run(dashboard, async_fetch):
+    dashboard.ASYNC_FETCH_ENABLED = async_fetch
+    dashboard.price_store.store_dir = tempfile.mkdtemp(prefix = 'price_store_')
+    dashboard.price_store.fetcher = SyntheticFetcher()
+    dashboard.ticker_cache.invalidate(STORED_TICKER)
+    dashboard.load_ticker_data(STORED_TICKER)
+    dashboard.price_store.fetcher = SlowStubFetcher()
+    opening_tickers = [ticker_symbol for ticker_symbol in dashboard.stock_dict if ticker_symbol != STORED_TICKER][:OPENING_USERS]
+    for ticker_symbol in opening_tickers:
+        dashboard.ticker_cache.invalidate(ticker_symbol)
+    server = ServerWorkers(dashboard)
+    latencies = []
+    times_to_chart = []
+    finish_times = []
+    threads = [threading.Thread(target = opening_user, args = (server, ticker_symbol, times_to_chart, dashboard.FETCH_POLL_INTERVAL / 1000))
+               for ticker_symbol in opening_tickers]
+    threads += [threading.Thread(target = viewing_user, args = (server, user, latencies, finish_times)) for user in range(VIEWING_USERS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    viewing_elapsed = max(finish_times) - start
+    latencies = np.array(latencies)
+    mode = 'background job queue' if async_fetch else 'download in callback'
+    return {'mode':mode,
+            'elapsed_seconds':round(elapsed, 2),
+            'viewing_seconds':round(viewing_elapsed, 2),
+            'viewing_requests_per_second':round(len(latencies) / viewing_elapsed, 1),
+            'viewing_latency_p50_ms':round(float(np.percentile(latencies, 50)) * 1e3, 1),
+            'viewing_latency_p95_ms':round(float(np.percentile(latencies, 95)) * 1e3, 1),
+            'viewing_latency_max_ms':round(float(latencies.max()) * 1e3, 1),
+            'opening_time_to_chart_mean_s':round(float(np.mean(times_to_chart)), 2)}
+
+if __name__ == '__main__':
+    dashboard = import_dashboard()
+    print(f'{SERVER_WORKERS} server workers, {VIEWING_USERS} users viewing a stored ticker, '
+          f'{OPENING_USERS} users opening tickers that take {FETCH_DELAY:.0f} s to download')
+    for async_fetch in [False, True]:
+        print(json.dumps(run(dashboard, async_fetch), indent = 1))
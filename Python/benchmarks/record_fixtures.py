@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Record the daily bars of every ticker in Stock_list.csv / Index_list.csv from
+yfinance (needs network access) into benchmarks/recorded/, so the benchmarks
+can be run offline on real price histories (see RecordedFetcher). Only the
+last --years years are recorded (5 by default, 0 for the full history), which
+keeps the fixture set small enough to commit. With --interval, the intraday
+bars of that interval are recorded instead (replayed by ReplayFetcher).
+
+Run from the Python folder:  python benchmarks/record_fixtures.py [--years 5] [--interval 1m|5m|1h]
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fixtures import RECORDED_DIR, recorded_path, dashboard_tickers
+from price_store import YFinanceFetcher
+from intraday import YFinanceIntradayFetcher, INTRADAY_INTERVALS
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Record price data for the offline benchmarks')
+    parser.add_argument('--interval', default = '1d', choices = ['1d'] + list(INTRADAY_INTERVALS))
+    parser.add_argument('--years', type = int, default = 5, help = 'years of daily bars to record (0: the full history)')
+    arguments = parser.parse_args()
+    os.makedirs(RECORDED_DIR, exist_ok = True)
+    if (arguments.interval == '1d'):
+        start = date.today() - timedelta(days = 365 * arguments.years) if arguments.years else None
+        fetch = lambda ticker_symbol: YFinanceFetcher().fetch(ticker_symbol, start = start)
+    else:
+        intraday_fetcher = YFinanceIntradayFetcher()
+        fetch = lambda ticker_symbol: intraday_fetcher.fetch(ticker_symbol, arguments.interval)
+    stock_tickers, index_tickers = dashboard_tickers()
+    for ticker_symbol in stock_tickers + index_tickers:
+        try:
+            ticker_data = fetch(ticker_symbol)
+        except Exception as error:
+            print(f'{ticker_symbol}: failed ({error!r})')
+            continue
+        # all the columns returned are recorded, with timezone naive dates
+        ticker_data['Date'] = ticker_data['Date'].dt.tz_localize(None)
+        ticker_data.to_csv(recorded_path(ticker_symbol, interval = arguments.interval), index = False)
+        print(f'{ticker_symbol}: {len(ticker_data):,} bars')
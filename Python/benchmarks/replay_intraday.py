@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Intraday mode on a replayed feed: a browser session shows a ticker in 1 minute
+bars while ReplayFetcher releases one new bar (and the partial bar after it)
+per poll. Reports the bytes sent per poll with the streaming updates against
+reloading the whole chart (the results of the streaming updates are checked by
+tests/test_intraday.py).
+
+Run from the Python folder:  python benchmarks/replay_intraday.py [--synthetic]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from fixtures import ReplayFetcher, import_dashboard
+from dash_requests import post_callback, apply_response
+from benchmark_figure_payload import STOCK_INPUTS
+
+TICKER = 'AAPL'
+INTERVAL = '1m'
+POLLS = 200
+MOVING_AVERAGE_BARS = 20
+
+def main(allow_synthetic = False):
+    dashboard = import_dashboard()
+    dashboard.ASYNC_FETCH_ENABLED = False
+    fetcher = ReplayFetcher(history_bars = 2 * dashboard.INTRADAY_BARS, replay_bars = POLLS, allow_synthetic = allow_synthetic)
+    dashboard.intraday_feed.fetcher = fetcher
+    # every poll downloads the bars released since the previous one
+    dashboard.intraday_feed.refresh_intervals = {interval:refresh_interval * 0 for interval, refresh_interval in dashboard.intraday_feed.refresh_intervals.items()}
+    client = dashboard.server.test_client()
+    input_values = dict(STOCK_INPUTS, **{'stock_ticker.value':TICKER,
+                                         'stock_interval.value':INTERVAL,
+                                         'moving_average_days.value':MOVING_AVERAGE_BARS})
+    status, body = post_callback(client, dashboard.app, 'stock_plot.figure', input_values, ['stock_interval.value'])
+    assert status == 200, body
+    apply_response(input_values, body)
+    streaming_sizes, streaming_times, reload_sizes = [], [], []
+    for poll in range(1, POLLS + 1):
+        fetcher.advance()
+        input_values['stock_intraday_poll.n_intervals'] = poll
+        start = time.perf_counter()
+        status, body = post_callback(client, dashboard.app, 'stock_plot.figure', input_values, ['stock_intraday_poll.n_intervals'])
+        streaming_times.append(time.perf_counter() - start)
+        assert status == 200, body
+        streaming_sizes.append(len(body))
+        apply_response(input_values, body)
+        # the same chart reloaded in full (as every poll would without the streaming updates)
+        status, reload_body = post_callback(client, dashboard.app, 'stock_plot.figure', input_values, ['stock_ticker.value'])
+        reload_sizes.append(len(reload_body))
+    print(f'{TICKER} {INTERVAL} bars, ring buffer of {dashboard.INTRADAY_BARS} bars, {POLLS} polls with one new bar each')
+    print(f'streaming update: {np.mean(streaming_sizes):9,.0f} bytes per poll, median {np.median(streaming_times) * 1e3:.1f} ms')
+    print(f'full reload:      {np.mean(reload_sizes):9,.0f} bytes per poll')
+    print(f'downloads (streaming polls and full reloads): {fetcher.calls}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Intraday streaming updates on a replayed feed')
+    parser.add_argument('--synthetic', action = 'store_true', help = 'use synthetic bars if the ticker has not been recorded')
+    main(parser.parse_args().synthetic)
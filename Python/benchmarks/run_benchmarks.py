@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the dashboard callbacks, run offline on recorded price
+histories (see record_fixtures.py; with --synthetic, synthetic bars for the
+tickers that have not been recorded).
+
+- chart scenarios: stock_plot / index_plot called directly for short and long
+  windows, candlestick and closing price views, moving average on and off, a
+  London ticker (pence to pounds conversion) and a Swiss ticker shown in US
+  dollars (FX conversion), and comparison_plot with many tickers in their own
+  currencies and in US dollars; the latency of the chart pipeline (result caches cleared), of a
+  memoized call and the payload size
+- load scenario: several users sending callback requests at the same time to
+  app.server, served over local HTTP
+
+The results are saved as JSON (benchmarks/results/<commit>.json by default) so
+that two commits can be compared:
+
+Run from the Python folder:  python benchmarks/run_benchmarks.py [--synthetic]
+                             python benchmarks/run_benchmarks.py --compare results/OLD.json results/NEW.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from fixtures import FIXTURE_END_DATE, RecordedFetcher, import_dashboard
+from dash_requests import callback_request_body
+from benchmark_figure_payload import STOCK_INPUTS
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+HISTORY_YEARS = 50
+REPEATS = 15
+LOAD_USERS = 8
+LOAD_REQUESTS_PER_USER = 25
+# relative change reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+# (window name, date select suffix, days back, start date, end date)
+WINDOWS = [('short', 'days_back', 30, None, None),
+           ('long', 'date_range', 30, '1970-01-01', str(FIXTURE_END_DATE.date()))]
+# stock views: (view name, plot type, moving average option)
+STOCK_VIEWS = [('candle', 'candle', 'do_not_display_MA'),
+               ('candle+MA', 'candle', 'display_MA'),
+               ('line', 'closing', 'do_not_display_MA')]
+# (ticker, description, base currency): a US stock, a London stock (prices converted from pence to
+# pounds) and a Swiss stock converted to US dollars
+STOCK_TICKERS = [('AAPL', 'dollar', 'local'), ('BP.L', 'pound', 'local'), ('NESN.SW', 'franc in dollars', 'USD')]
+INDEX_VIEWS = [('candle', 'candle'), ('line', 'closing')]
+INDEX_TICKER = '^GSPC'
+COMPARISON_TICKERS = 25
+
+def chart_scenarios(dashboard):
+    # (scenario name, callback function, arguments)
+    scenarios = []
+    for window_name, date_select, tail_days, start_date, end_date in WINDOWS:
+        for ticker_symbol, currency, base_currency in STOCK_TICKERS:
+            for view_name, plot_type, moving_average_option in STOCK_VIEWS:
+                scenarios.append((f'stock {currency} {window_name} {view_name}', dashboard.stock_plot,
+                                  (plot_type, ticker_symbol, f'stock_{date_select}', tail_days, start_date, end_date,
+                                   moving_average_option, 20, 'SMA', 'downsample', 'none', 14, 'do_not_show_forecast', base_currency, '1d', None, None, False, None)))
+        for view_name, plot_type in INDEX_VIEWS:
+            scenarios.append((f'index {window_name} {view_name}', dashboard.index_plot,
+                              (plot_type, INDEX_TICKER, f'index_{date_select}', tail_days, start_date, end_date,
+                               'downsample', 'none', 14, 'do_not_show_forecast', 'local', '1d', None, None, False, None)))
+    comparison_tickers = (list(dashboard.stock_dict) + list(dashboard.index_dict))[:COMPARISON_TICKERS]
+    scenarios.append((f'comparison {COMPARISON_TICKERS} tickers 10 years', dashboard.comparison_plot,
+                      (comparison_tickers, 'rebased', 3650, 'local', None)))
+    scenarios.append((f'comparison {COMPARISON_TICKERS} tickers 10 years USD', dashboard.comparison_plot,
+                      (comparison_tickers, 'rebased', 3650, 'USD', None)))
+    return scenarios
+
+def payload_bytes(outputs):
+    # Size of the outputs as Dash sends them to the browser
+    return len(json.dumps(outputs, cls = plotly.utils.PlotlyJSONEncoder))
+
+def milliseconds(values):
+    return {'median_ms':round(float(np.median(values)) * 1e3, 3),
+            'p95_ms':round(float(np.percentile(values, 95)) * 1e3, 3)}
+
+def run_chart_scenarios(dashboard, repeats):
+    results = {}
+    for name, callback, arguments in chart_scenarios(dashboard):
+        outputs = callback(*arguments)
+        pipeline_times = []
+        memoized_times = []
+        for _ in range(repeats):
+            dashboard.price_chart_cache.clear()
+            dashboard.comparison_chart_cache.clear()
+            start = time.perf_counter()
+            callback(*arguments)
+            pipeline_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            callback(*arguments)
+            memoized_times.append(time.perf_counter() - start)
+        results[name] = {'pipeline':milliseconds(pipeline_times),
+                         'memoized':milliseconds(memoized_times),
+                         'payload_bytes':payload_bytes(outputs)}
+        print(f'{name:40s} pipeline {results[name]["pipeline"]["median_ms"]:8.2f} ms   '
+              f'memoized {results[name]["memoized"]["median_ms"]:7.3f} ms   {results[name]["payload_bytes"]:9,d} bytes')
+    return results
+
+def load_user(url, dashboard, user, latencies, sizes):
+    # One browser session: switches between tickers and 'days back' windows
+    rng = random.Random(user)
+    stock_tickers = list(dashboard.stock_dict)
+    input_values = dict(STOCK_INPUTS, **{'stock_plot_date_select.value':'stock_days_back',
+                                         'stock_chart_loaded.data':True})
+    for _ in range(LOAD_REQUESTS_PER_USER):
+        if rng.random() < 0.3:
+            input_values['stock_ticker.value'] = rng.choice(stock_tickers)
+            changed_input = 'stock_ticker.value'
+        else:
+            input_values['stock_tail_days.value'] = rng.choice([30, 90, 365, 1825, 3650, 10000])
+            changed_input = 'stock_tail_days.value'
+        body = json.dumps(callback_request_body(dashboard.app, 'stock_plot.figure', input_values, [changed_input])).encode()
+        request = urllib.request.Request(url, data = body, headers = {'Content-Type':'application/json'})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            size = len(response.read())
+        latencies.append(time.perf_counter() - start)
+        sizes.append(size)
+
+def run_load_scenario(dashboard):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+    http_server = make_server('127.0.0.1', 0, dashboard.server, threaded = True, request_handler = QuietRequestHandler)
+    server_thread = threading.Thread(target = http_server.serve_forever, daemon = True)
+    server_thread.start()
+    url = f'http://127.0.0.1:{http_server.server_port}/_dash-update-component'
+    latencies = []
+    sizes = []
+    users = [threading.Thread(target = load_user, args = (url, dashboard, user, latencies, sizes)) for user in range(LOAD_USERS)]
+    start = time.perf_counter()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    elapsed = time.perf_counter() - start
+    http_server.shutdown()
+    results = {'users':LOAD_USERS,
+               'requests':len(latencies),
+               'requests_per_second':round(len(latencies) / elapsed, 1),
+               'latency':milliseconds(latencies),
+               'mean_payload_bytes':int(np.mean(sizes))}
+    print(f'load: {LOAD_USERS} users, {results["requests_per_second"]} requests/s, '
+          f'median {results["latency"]["median_ms"]:.1f} ms, p95 {results["latency"]["p95_ms"]:.1f} ms, '
+          f'{results["mean_payload_bytes"]:,} bytes per response')
+    return results
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+        changes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if changes else '')
+
+def flatten(results, prefix = ''):
+    # {'a': {'b': 1}} -> {'a / b': 1} for the numeric values
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{prefix}{key} / '))
+        elif isinstance(value, (int, float)):
+            values[f'{prefix}{key}'] = value
+    return values
+
+def compare(base_path, new_path):
+    # Print every latency / size metric of both runs; increases above REGRESSION_THRESHOLD are flagged
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f'{base["commit"]} -> {new["commit"]}')
+    base_values = flatten({'charts':base['charts'], 'load':base['load']})
+    new_values = flatten({'charts':new['charts'], 'load':new['load']})
+    for key in [key for key in base_values if key in new_values]:
+        base_value, new_value = base_values[key], new_values[key]
+        if base_value == 0:
+            continue
+        change = new_value / base_value - 1
+        # higher is better for throughput, lower is better for everything else
+        regression = -change if key.endswith('requests_per_second') else change
+        flag = '  REGRESSION' if regression > REGRESSION_THRESHOLD else ''
+        print(f'{key:60s} {base_value:12,.3f} {new_value:12,.3f} {change:+8.1%}{flag}')
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Dashboard callback benchmarks')
+    parser.add_argument('--repeats', type = int, default = REPEATS)
+    parser.add_argument('--output', help = 'results file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--skip-load', action = 'store_true', help = 'skip the multi-user load scenario')
+    parser.add_argument('--synthetic', action = 'store_true', help = 'use synthetic bars for the tickers that have not been recorded')
+    parser.add_argument('--compare', nargs = 2, metavar = ('BASE', 'NEW'), help = 'compare two results files')
+    arguments = parser.parse_args()
+    if arguments.compare:
+        compare(*arguments.compare)
+        return
+    fetcher = RecordedFetcher(years = HISTORY_YEARS, allow_synthetic = arguments.synthetic)
+    dashboard = import_dashboard(fetcher)
+    # load every ticker (and the FX rates to US dollars) up front, the callbacks are timed on cached data
+    ticker_symbols = list(dashboard.stock_dict) + list(dashboard.index_dict)
+    fx_symbols = sorted({dashboard.fx_ticker(ticker_symbol, 'USD') for ticker_symbol in ticker_symbols} - {None})
+    for ticker_symbol in ticker_symbols + fx_symbols:
+        dashboard.load_ticker_data(ticker_symbol)
+    commit = git_commit()
+    results = {'commit':commit,
+               'time':datetime.now().isoformat(timespec = 'seconds'),
+               'python':platform.python_version(),
+               'pandas':pd.__version__,
+               'recorded_tickers':sorted(fetcher.recorded),
+               'charts':run_chart_scenarios(dashboard, arguments.repeats),
+               'load':{} if arguments.skip_load else run_load_scenario(dashboard)}
+    output = arguments.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent = 1)
+    print(f'results saved to {output}')
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+In-process caching helpers for the stock/index dashboard.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+def dataframe_size(data):
+    # Memory footprint of a cached DataFrame in bytes
+    return int(data.memory_usage(index = True, deep = True).sum())
+
+class SingleFlight:
+    # Concurrent calls of do() with the same key share a single call of the function: the first
+    # caller runs it, the others wait for its result (or its exception). coalesced counts the
+    # calls that were served by another caller's call.
+    def __init__(self):
+        self._calls = {} # key -> Future of the call in flight
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+        try:
+            result = function()
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+        call.set_result(result)
+        return result
+
+class LRUCache:
+    # Thread-safe least recently used cache with a memory budget (max_bytes) and a
+    # time to live (ttl, seconds). Entries are evicted oldest-use first once the total
+    # size exceeds the budget, and are dropped on access once they are older than ttl.
+    def __init__(self, max_bytes, ttl, sizeof = dataframe_size):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._entries = OrderedDict() # key -> (value, size, time stored)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loads = SingleFlight()
+
+    def get(self, key, default = None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            self._store(key, value, size)
+
+    def setdefault(self, key, value):
+        # Store value unless the key already has a live entry (e.g. a fresher value stored by another
+        # thread in the meantime). Returns the cached value.
+        size = self.sizeof(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] <= self.ttl:
+                return entry[0]
+            self._store(key, value, size)
+            return value
+
+    def get_or_load(self, key, loader):
+        # Concurrent misses of the same key wait for one call of loader(key) and share its value
+        value = self.get(key)
+        if value is None:
+            value = self._loads.do(key, lambda: self._load(key, loader))
+        return value
+
+    def _load(self, key, loader):
+        value = loader(key)
+        self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _store(self, key, value, size):
+        # caller must hold the lock
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            # never cache a single entry larger than the whole budget
+            return
+        self._entries[key] = (value, size, time.monotonic())
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        # caller must hold the lock
+        value, size, stored = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {'entries':len(self._entries),
+                    'bytes':self.current_bytes,
+                    'hits':self.hits,
+                    'misses':self.misses,
+                    'evictions':self.evictions,
+                    'coalesced':self._loads.coalesced}
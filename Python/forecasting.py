@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Batch price forecasts of the dashboard tickers, made off the request path.
+
+Every ticker with a cached history gets three simple models fitted to the log
+closing prices of its last FORECAST_TRAINING_DAYS days: a random walk (the
+baseline), Holt's linear exponential smoothing and an autoregressive model of
+the daily log returns. Each model is scored on its forecasts of the last few
+FORECAST_HORIZON day periods (fitted on the days before each period), the best
+one is refitted on all the days and its forecast of the next FORECAST_HORIZON
+business days, with a confidence band, is written to the price store next to
+the history. The charts only look the stored forecasts up.
+
+The tickers are fitted on a process pool, in a separate batch process started
+on a schedule by ForecastScheduler (after the daily refresh of the histories),
+so the web workers never wait on a model. The batch can also be run by hand:
+
+    python forecasting.py [--store-dir price_store] [--workers 4] [--force] [TICKER ...]
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from startup import lazy_import
+from price_store import PriceStore, file_lock
+from prefetch import next_refresh_time
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+FORECAST_HORIZON = 20 # business days
+FORECAST_TRAINING_DAYS = 5 * 261
+# Two-sided normal quantile of the confidence band (95 %)
+CONFIDENCE_Z = 1.96
+AUTOREGRESSIVE_LAGS = 5
+# The models are scored on the last FORECAST_BACKTESTS periods of FORECAST_HORIZON days
+FORECAST_BACKTESTS = 3
+# Holt's smoothing parameters tried (level alpha, trend beta with beta <= alpha)
+HOLT_ALPHAS = [alpha / 10 for alpha in range(1, 11)]
+HOLT_BETAS = [0.0, 0.001, 0.01, 0.05]
+# Stored with every forecast, so forecasts of an older version are made again
+FORECAST_MODEL_VERSION = 1
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TICKER_LISTS = ['Stock_list.csv', 'Index_list.csv']
+
+def random_walk_forecast(log_prices, horizon):
+    # Last log price for every step, variance growing by the variance of the daily returns per step
+    returns = np.diff(log_prices)
+    return np.full(horizon, log_prices[-1]), np.var(returns) * np.arange(1, horizon + 1)
+
+def holt_forecast(log_prices, horizon):
+    # Holt's linear trend method (error correction form: level += trend + alpha * error,
+    # trend += beta * error), every (alpha, beta) pair run at once over the prices. The pair with
+    # the smallest one-step squared error is kept; the h-step variance is
+    # sigma^2 * (1 + sum_{j < h} (alpha + j * beta)^2).
+    alphas, betas = np.meshgrid(HOLT_ALPHAS, HOLT_BETAS)
+    alphas, betas = alphas.ravel(), betas.ravel()
+    valid = betas <= alphas
+    alphas, betas = alphas[valid], betas[valid]
+    levels = np.full(len(alphas), log_prices[0])
+    trends = np.full(len(alphas), log_prices[1] - log_prices[0])
+    squared_errors = np.zeros(len(alphas))
+    for log_price in log_prices[1:]:
+        errors = log_price - (levels + trends)
+        squared_errors += errors ** 2
+        levels = levels + trends + alphas * errors
+        trends = trends + betas * errors
+    best = np.argmin(squared_errors)
+    steps = np.arange(1, horizon + 1)
+    sigma_squared = squared_errors[best] / (len(log_prices) - 1)
+    multipliers = 1 + np.concatenate([[0.0], np.cumsum((alphas[best] + betas[best] * steps[:-1]) ** 2)])
+    return levels[best] + trends[best] * steps, sigma_squared * multipliers
+
+def autoregressive_forecast(log_prices, horizon, lags = AUTOREGRESSIVE_LAGS):
+    # AR(lags) model of the daily log returns with an intercept, fitted by least squares. The
+    # returns are forecast recursively and summed up; the variance of the log price h steps ahead
+    # is sigma^2 * sum_{i < h} Psi_i^2, Psi_i being the cumulative sums of the MA(inf) weights.
+    returns = np.diff(log_prices)
+    lagged_returns = np.column_stack([returns[lags - lag:len(returns) - lag] for lag in range(1, lags + 1)])
+    design = np.column_stack([np.ones(len(lagged_returns)), lagged_returns])
+    coefficients = np.linalg.lstsq(design, returns[lags:], rcond = None)[0]
+    residuals = returns[lags:] - design @ coefficients
+    sigma_squared = residuals @ residuals / max(len(residuals) - len(coefficients), 1)
+    history = list(returns[-lags:])
+    forecast_returns = []
+    weights = [1.0]
+    for step in range(horizon):
+        forecast_return = coefficients[0] + sum(coefficients[lag] * history[-lag] for lag in range(1, lags + 1))
+        history.append(forecast_return)
+        forecast_returns.append(forecast_return)
+        if step > 0:
+            weights.append(sum(coefficients[lag] * weights[-lag] for lag in range(1, min(lags, step) + 1)))
+    cumulative_weights = np.cumsum(weights)
+    return log_prices[-1] + np.cumsum(forecast_returns), sigma_squared * np.cumsum(cumulative_weights ** 2)
+
+# Model name -> function(log prices, horizon) returning (log price forecasts, their variances)
+FORECAST_MODELS = {'random walk':random_walk_forecast,
+                   'Holt':holt_forecast,
+                   'autoregressive':autoregressive_forecast}
+
+def score_models(log_prices, horizon, backtests = FORECAST_BACKTESTS):
+    # {model: mean absolute error (in log price, ~ relative error) of its forecasts of the last
+    # backtests periods of horizon prices, each fitted on the prices before the period}
+    errors = {name:[] for name in FORECAST_MODELS}
+    for backtest in range(1, backtests + 1):
+        end = len(log_prices) - (backtest - 1) * horizon
+        training, actual = log_prices[:end - horizon], log_prices[end - horizon:end]
+        for name, model in FORECAST_MODELS.items():
+            errors[name].append(np.mean(np.abs(model(training, horizon)[0] - actual)))
+    return {name:float(np.mean(model_errors)) for name, model_errors in errors.items()}
+
+def forecast_prices(price_data, horizon = FORECAST_HORIZON, training_days = FORECAST_TRAINING_DAYS):
+    # (forecast frame, details) of a daily history: the forecast and the lower / upper bounds of the
+    # confidence band for the next horizon business days, made with the model that scored best
+    closing_prices = price_data['Close'].to_numpy(dtype = np.float64)
+    dates = price_data['Date'].to_numpy()
+    finite = np.isfinite(closing_prices) & (closing_prices > 0)
+    log_prices = np.log(closing_prices[finite][-training_days:])
+    if len(log_prices) < (FORECAST_BACKTESTS + 2) * horizon + AUTOREGRESSIVE_LAGS:
+        raise ValueError(f'Not enough price data for a forecast ({len(log_prices)} days)')
+    scores = score_models(log_prices, horizon)
+    model = min(scores, key = scores.get)
+    log_forecasts, variances = FORECAST_MODELS[model](log_prices, horizon)
+    deviations = CONFIDENCE_Z * np.sqrt(variances)
+    last_date = pd.Timestamp(dates[finite][-1])
+    forecast = pd.DataFrame({'Date':pd.bdate_range(last_date + pd.Timedelta(days = 1), periods = horizon),
+                             'Forecast':np.exp(log_forecasts),
+                             'Lower':np.exp(log_forecasts - deviations),
+                             'Upper':np.exp(log_forecasts + deviations)})
+    details = {'model':model,
+               'scores':scores,
+               'last_bar':last_date.isoformat(),
+               'last_close':float(closing_prices[finite][-1]),
+               'training_days':len(log_prices),
+               'model_version':FORECAST_MODEL_VERSION,
+               'created':datetime.now().isoformat()}
+    return forecast, details
+
+def forecast_ticker(store_dir, ticker_symbol, price_dtype = 'float64', force = False):
+    # Worker process job: forecast a ticker from its cached history and store the forecast. Returns
+    # the details of the forecast, or None if the ticker is not cached or its stored forecast is
+    # already up to date (made from the same last bar, unless force is set).
+    start = time.perf_counter()
+    store = PriceStore(store_dir, price_dtype = price_dtype)
+    price_data = store.load(ticker_symbol)
+    if price_data is None:
+        return None
+    if not force:
+        stored = store.load_forecast(ticker_symbol)
+        if (stored is not None and stored[0].get('model_version') == FORECAST_MODEL_VERSION
+            and stored[0]['last_bar'] == pd.Timestamp(price_data['Date'].iloc[-1]).isoformat()
+            and np.isclose(stored[0]['last_close'], price_data['Close'].iloc[-1], rtol = 1e-6)):
+            return None
+    forecast, details = forecast_prices(price_data)
+    details['seconds'] = round(time.perf_counter() - start, 4)
+    store.save_forecast(ticker_symbol, forecast, details)
+    return details
+
+def dashboard_tickers():
+    # Every stock and index listed in the ticker list .csv files
+    ticker_symbols = []
+    for file_name in TICKER_LISTS:
+        with open(os.path.join(APP_DIR, file_name), newline = '') as ticker_file:
+            ticker_symbols += [row[0] for row in csv.reader(ticker_file) if row]
+    return ticker_symbols
+
+def retrain(store_dir, ticker_symbols, max_workers = 4, price_dtype = 'float64', force = False):
+    # Forecast the tickers on a process pool. Returns {'trained': {ticker: details}, 'skipped':
+    # [tickers not cached or up to date], 'errors': {ticker: error}, 'seconds': wall time}.
+    start = time.perf_counter()
+    results = {'trained':{}, 'skipped':[], 'errors':{}}
+    # the workers are spawned (not forked), so they do not inherit the threads of the parent
+    with ProcessPoolExecutor(max_workers = max_workers, mp_context = multiprocessing.get_context('spawn')) as executor:
+        jobs = {ticker_symbol:executor.submit(forecast_ticker, store_dir, ticker_symbol, price_dtype, force) for ticker_symbol in ticker_symbols}
+        for ticker_symbol, job in jobs.items():
+            try:
+                details = job.result()
+            except Exception as error:
+                results['errors'][ticker_symbol] = repr(error)
+                continue
+            if details is None:
+                results['skipped'].append(ticker_symbol)
+            else:
+                results['trained'][ticker_symbol] = details
+    results['seconds'] = round(time.perf_counter() - start, 4)
+    return results
+
+class ForecastScheduler:
+    # Runs the forecast batch (this module as a separate process, see main()) for the tickers of
+    # price_store once start_delay after start() (giving the prefetch time to load the histories),
+    # then every day after the close of the New York exchange, once the scheduled refresh of the
+    # histories is done (refresh_delay). Only tickers with a new bar are fitted again.
+    def __init__(self, price_store, max_workers = 2, start_delay = timedelta(minutes = 5),
+                 refresh_delay = timedelta(hours = 1), timeout = timedelta(hours = 1)):
+        self.price_store = price_store
+        self.max_workers = max_workers
+        self.start_delay = start_delay
+        self.refresh_delay = refresh_delay
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {'last_run':None,
+                        'seconds':None,
+                        'trained':None,
+                        'skipped':None,
+                        'failed':None,
+                        'last_error':None,
+                        'next_run':None}
+
+    def status(self):
+        # Time, duration and ticker counts of the last batch, its error (if any) and the next run time
+        with self._lock:
+            return dict(self._status)
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                self._status['next_run'] = datetime.now(timezone.utc) + self.start_delay
+            self._thread = threading.Thread(target = self._run, name = 'forecast-scheduler', daemon = True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self):
+        # Run the batch and wait for it; the summary it prints last (see main()) is kept in the status
+        command = [sys.executable, os.path.abspath(__file__),
+                   '--store-dir', os.path.abspath(self.price_store.store_dir),
+                   '--workers', str(self.max_workers),
+                   '--price-dtype', self.price_store.price_dtype.name,
+                   '--summary']
+        try:
+            process = subprocess.run(command, capture_output = True, text = True, check = True, timeout = self.timeout.total_seconds())
+            summary = dict(item.split('=') for item in process.stdout.strip().splitlines()[-1].split())
+            error = None
+        except (OSError, ValueError, IndexError, subprocess.SubprocessError) as run_error:
+            summary, error = {}, repr(run_error)
+        with self._lock:
+            self._status.update({'last_run':datetime.now(timezone.utc),
+                                 'seconds':float(summary['seconds']) if 'seconds' in summary else None,
+                                 'trained':int(summary['trained']) if 'trained' in summary else None,
+                                 'skipped':int(summary['skipped']) if 'skipped' in summary else None,
+                                 'failed':int(summary['failed']) if 'failed' in summary else None,
+                                 'last_error':error})
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                next_run = self._status['next_run']
+            wait_seconds = (next_run - datetime.now(timezone.utc)).total_seconds()
+            if wait_seconds > 0:
+                self._stop.wait(wait_seconds)
+                continue
+            self.run_once()
+            with self._lock:
+                self._status['next_run'] = next_refresh_time('', datetime.now(timezone.utc), self.refresh_delay)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Forecast the dashboard tickers from the price store')
+    parser.add_argument('tickers', nargs = '*', help = 'tickers to forecast (default: every ticker of the dashboard)')
+    parser.add_argument('--store-dir', default = os.path.join(APP_DIR, 'price_store'))
+    parser.add_argument('--workers', type = int, default = 4)
+    parser.add_argument('--price-dtype', default = 'float64')
+    parser.add_argument('--force', action = 'store_true', help = 'forecast again even if the stored forecast is up to date')
+    parser.add_argument('--summary', action = 'store_true', help = 'print a one line summary only')
+    arguments = parser.parse_args()
+    os.makedirs(arguments.store_dir, exist_ok = True)
+    # one batch per price store at a time (several dashboard processes may share the store)
+    with file_lock(os.path.join(arguments.store_dir, 'forecasts.lock'), blocking = False) as locked:
+        if not locked:
+            print('seconds=0 trained=0 skipped=0 failed=0')
+            return
+        results = retrain(arguments.store_dir, arguments.tickers or dashboard_tickers(), arguments.workers,
+                          arguments.price_dtype, arguments.force)
+    if not arguments.summary:
+        for ticker_symbol, details in results['trained'].items():
+            print(f'{ticker_symbol:12s} {details["model"]:15s} score {details["scores"][details["model"]]:.4f}  {details["seconds"] * 1e3:7.1f} ms')
+        for ticker_symbol, error in results['errors'].items():
+            print(f'{ticker_symbol:12s} failed: {error}')
+    print(f'seconds={results["seconds"]} trained={len(results["trained"])} skipped={len(results["skipped"])} failed={len(results["errors"])}')
+
+if __name__ == '__main__':
+    main()
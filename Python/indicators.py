@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Technical indicators of the daily price histories: relative strength index
+(RSI), MACD, average true range (ATR), volume weighted average price (VWAP)
+and drawdown from the running peak.
+
+Every indicator is computed on the whole history of a ticker with vectorized
+NumPy / pandas operations, once per (indicator, period) and price history
+version, and kept with the cached history (see TechnicalIndicators), so that
+changing the date window or switching between indicators only slices arrays
+that have already been computed.
+"""
+
+import threading
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Indicator -> True if it takes a period (# of days); MACD uses the standard MACD_SPANS instead
+INDICATOR_PERIODS = {'RSI':True, 'MACD':False, 'ATR':True, 'VWAP':True, 'drawdown':False}
+# (fast EMA span, slow EMA span, signal line span)
+MACD_SPANS = (12, 26, 9)
+
+def wilder_average(values, period):
+    # Wilder's smoothing of values: the mean of the first period values, then an exponential average
+    # with alpha = 1 / period. NaN until period values have been averaged (leading NaN values, e.g.
+    # prices before the first FX rate, are skipped).
+    averages = np.full(len(values), np.nan)
+    finite_positions = np.flatnonzero(np.isfinite(values))
+    if len(finite_positions) == 0 or len(values) - finite_positions[0] < period:
+        return averages
+    seed_position = finite_positions[0] + period - 1
+    seed = np.mean(values[finite_positions[0]:seed_position + 1])
+    smoothed_values = np.concatenate([[seed], values[seed_position + 1:]])
+    averages[seed_position:] = pd.Series(smoothed_values).ewm(alpha = 1 / period, adjust = False).mean().to_numpy()
+    return averages
+
+def exponential_average(values, span):
+    # Same values as Series.ewm(span = span, adjust = False).mean()
+    return pd.Series(values).ewm(span = span, adjust = False).mean().to_numpy()
+
+def relative_strength_index(closing_prices, period):
+    # Wilder's RSI (0 to 100) of the closing prices, NaN for the first period days
+    changes = np.diff(closing_prices)
+    average_gains = wilder_average(np.maximum(changes, 0), period)
+    average_losses = wilder_average(np.maximum(-changes, 0), period)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        rsi = 100 - 100 / (1 + average_gains / average_losses)
+    # no losses over the period: RSI of 100 (the division above gives NaN for 0 / 0)
+    rsi[(average_losses == 0) & (average_gains > 0)] = 100.0
+    return np.concatenate([[np.nan], rsi])
+
+def macd(closing_prices, fast_span = MACD_SPANS[0], slow_span = MACD_SPANS[1], signal_span = MACD_SPANS[2]):
+    # (MACD line, signal line, histogram): difference of the fast and slow EMAs of the closing
+    # prices, its EMA and the difference of the two
+    macd_line = exponential_average(closing_prices, fast_span) - exponential_average(closing_prices, slow_span)
+    signal_line = exponential_average(macd_line, signal_span)
+    return macd_line, signal_line, macd_line - signal_line
+
+def average_true_range(high_prices, low_prices, closing_prices, period):
+    # Wilder's average of the true range (the high to low range extended to the previous close)
+    previous_closes = np.concatenate([[np.nan], closing_prices[:-1]])
+    true_ranges = np.fmax(high_prices - low_prices, np.fmax(np.abs(high_prices - previous_closes), np.abs(low_prices - previous_closes)))
+    return wilder_average(true_ranges, period)
+
+def drawdown(closing_prices):
+    # Decline of the closing price from its running peak, in percent (0 at a new high)
+    running_peaks = np.fmax.accumulate(closing_prices)
+    return (closing_prices / running_peaks - 1) * 100
+
+class TechnicalIndicators:
+    # Indicators of one price history (Date, Open, High, Low, Close, Volume), computed over the full
+    # history on first use and kept per (indicator, period). The volume weighted averages of every
+    # period come from the same cumulative sums, so only one O(n) pass is needed for all periods.
+    def __init__(self, price_data):
+        self._high_prices = price_data['High'].to_numpy(dtype = np.float64)
+        self._low_prices = price_data['Low'].to_numpy(dtype = np.float64)
+        self._closing_prices = price_data['Close'].to_numpy(dtype = np.float64)
+        if 'Volume' in price_data:
+            self._volumes = price_data['Volume'].to_numpy(dtype = np.float64)
+        else:
+            self._volumes = np.full(len(price_data), np.nan)
+        self._cumulative_sums = None # running sums of typical price * volume, volume and missing values
+        self._lines = {} # (indicator, period) -> list of full-history arrays
+        self._lock = threading.Lock()
+
+    def _volume_weighted_average(self, period):
+        # Average of the typical price (high + low + close) / 3 over the last period days, weighted
+        # by volume (NaN for windows with a missing value or no volume at all, e.g. FX rates)
+        if self._cumulative_sums is None:
+            typical_prices = (self._high_prices + self._low_prices + self._closing_prices) / 3
+            missing = ~(np.isfinite(typical_prices) & np.isfinite(self._volumes))
+            increments = np.column_stack([np.where(missing, 0.0, typical_prices * self._volumes),
+                                          np.where(missing, 0.0, self._volumes),
+                                          missing])
+            self._cumulative_sums = np.vstack([np.zeros((1, 3)), np.cumsum(increments, axis = 0)])
+        count = len(self._closing_prices)
+        window_sums = np.full((count, 3), np.nan)
+        # periods longer than the history leave every window incomplete (NaN)
+        first_complete = min(period - 1, count)
+        window_sums[first_complete:] = (self._cumulative_sums[first_complete + 1:count + 1]
+                                        - self._cumulative_sums[first_complete + 1 - period:count + 1 - period])
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            averages = window_sums[:, 0] / window_sums[:, 1]
+        averages[(window_sums[:, 2] > 0) | ~(window_sums[:, 1] > 0)] = np.nan
+        return averages
+
+    def _compute(self, indicator, period):
+        if (indicator == 'RSI'):
+            return [relative_strength_index(self._closing_prices, period)]
+        if (indicator == 'MACD'):
+            return list(macd(self._closing_prices))
+        if (indicator == 'ATR'):
+            return [average_true_range(self._high_prices, self._low_prices, self._closing_prices, period)]
+        if (indicator == 'VWAP'):
+            return [self._volume_weighted_average(period)]
+        if (indicator == 'drawdown'):
+            return [drawdown(self._closing_prices)]
+        raise ValueError(f'Unknown indicator {indicator}')
+
+    def lines(self, indicator, period, start, stop):
+        # Lines of an indicator for the rows [start, stop): one line, or the MACD line, signal line
+        # and histogram for 'MACD' (period is ignored for the indicators without one)
+        key = (indicator, period if INDICATOR_PERIODS[indicator] else None)
+        with self._lock:
+            if key not in self._lines:
+                self._lines[key] = self._compute(indicator, key[1])
+            return [line[start:stop] for line in self._lines[key]]
+
+    def nbytes(self):
+        # Memory used by the price arrays and the indicators computed so far
+        with self._lock:
+            return (self._high_prices.nbytes + self._low_prices.nbytes + self._closing_prices.nbytes + self._volumes.nbytes
+                    + (0 if self._cumulative_sums is None else self._cumulative_sums.nbytes)
+                    + sum(line.nbytes for lines in self._lines.values() for line in lines))
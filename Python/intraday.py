@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Intraday bars (1 minute, 5 minutes, 1 hour) for the stock/index dashboard.
+
+The most recent bars of every ticker shown in intraday mode are kept in memory
+in a fixed-size ring buffer per (ticker, interval). A refresh only downloads
+the bars of the current day and appends the ones newer than the buffer (the
+latest bar held, usually a partial bar, is replaced), and the summary table
+extrema and the moving averages are brought up to date in O(new bars), so the
+charts can be extended with the new bars instead of being reloaded.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from startup import lazy_import
+from price_store import PRICE_COLUMNS, normalize_ticker_data
+from price_analytics import RollingStatistics, SlidingExtrema
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Bar interval -> (history downloaded when a ticker is opened, minimum time between two downloads)
+INTRADAY_INTERVALS = {'1m':('5d', timedelta(seconds = 15)),
+                      '5m':('1mo', timedelta(minutes = 1)),
+                      '1h':('6mo', timedelta(minutes = 5))}
+
+# The rolling statistics of a stream are rebuilt from the ring buffer once they cover this many
+# times its capacity, so their memory stays bounded as bars keep arriving
+STATISTICS_MAX_CAPACITIES = 4
+
+class YFinanceIntradayFetcher:
+    # Default intraday data source. Any object with a fetch(ticker_symbol, interval, start = None)
+    # method returning a DataFrame with a 'Date' column can be used instead (e.g. a replay of
+    # recorded bars): the INTRADAY_INTERVALS history if start is None, otherwise at least the
+    # bars from start on.
+    def fetch(self, ticker_symbol, interval, start = None):
+        import yfinance as yf
+        ticker = yf.Ticker(ticker_symbol)
+        if start is None:
+            ticker_data = ticker.history(period = INTRADAY_INTERVALS[interval][0], interval = interval)
+        else:
+            ticker_data = ticker.history(start = pd.Timestamp(start).strftime('%Y-%m-%d'), interval = interval)
+        ticker_data.reset_index(inplace = True)
+        # intraday bars are indexed by 'Datetime' instead of 'Date'
+        return ticker_data.rename(columns = {'Datetime':'Date'})
+
+class BarRingBuffer:
+    # The last capacity bars of a stream in preallocated arrays that are written in a circle.
+    # Bars are numbered in the order they were added, the latest bar is number count - 1.
+    def __init__(self, capacity, columns = PRICE_COLUMNS):
+        self.capacity = capacity
+        self.columns = list(columns)
+        self._dates = np.zeros(capacity, dtype = 'datetime64[ns]')
+        self._prices = np.full((capacity, len(self.columns)), np.nan)
+        self.count = 0
+
+    @property
+    def first(self):
+        # Number of the oldest bar held
+        return max(0, self.count - self.capacity)
+
+    @property
+    def last_date(self):
+        return None if self.count == 0 else self._dates[(self.count - 1) % self.capacity]
+
+    def append(self, price_data):
+        # Add the bars of price_data (sorted by date) that are newer than the latest bar held; a
+        # bar dated like the latest bar replaces it. Returns the number of the first bar written
+        # (count if no bar was written).
+        dates = price_data['Date'].to_numpy(dtype = 'datetime64[ns]')
+        prices = price_data[self.columns].to_numpy(dtype = np.float64)
+        first_written = self.count
+        if self.count:
+            newer = dates >= self.last_date
+            dates, prices = dates[newer], prices[newer]
+            if len(dates) and dates[0] == self.last_date:
+                first_written = self.count - 1
+        numbers = np.arange(first_written, first_written + len(dates))[-self.capacity:]
+        self._dates[numbers % self.capacity] = dates[len(dates) - len(numbers):]
+        self._prices[numbers % self.capacity] = prices[len(dates) - len(numbers):]
+        self.count = max(self.count, first_written + len(dates))
+        return first_written
+
+    def dates(self):
+        # Dates of the bars held, oldest first
+        return self._dates[np.arange(self.first, self.count) % self.capacity]
+
+    def frame(self, start = None):
+        # Bars numbered start (or the oldest bar held, if start is None or no longer held) to the
+        # latest, as a DataFrame like the daily histories (a 'Date' column and a DatetimeIndex)
+        start = self.first if start is None else max(start, self.first)
+        slots = np.arange(start, self.count) % self.capacity
+        dates = self._dates[slots]
+        price_data = pd.DataFrame(self._prices[slots], columns = self.columns, index = pd.DatetimeIndex(dates))
+        price_data.insert(0, 'Date', dates)
+        return price_data
+
+# Bars of a stream from a given bar on, with the moving average of those bars and the extrema
+# of all the bars held (positions counted from first, the oldest bar held)
+IntradayView = namedtuple('IntradayView', ['version', 'first', 'count', 'bars', 'dates', 'extrema', 'line_values'])
+
+class IntradayStream:
+    # Ring buffer of one (ticker, interval) with the extrema and rolling statistics of its bars
+    def __init__(self, capacity):
+        self.buffer = BarRingBuffer(capacity)
+        self.extrema = SlidingExtrema(capacity)
+        self.version = 0 # incremented whenever bars are added or changed
+        self.last_fetch = None # time.monotonic() of the last download
+        self.fetch_lock = threading.Lock()
+        self._statistics = None # built on first use
+        self._statistics_start = 0 # number of the first bar in the statistics
+        self._lock = threading.Lock()
+
+    def add(self, price_data):
+        # Append downloaded bars; returns False if no bar was added or changed
+        with self._lock:
+            previous_count = self.buffer.count
+            previous_last = self.buffer.frame(previous_count - 1) if previous_count else None
+            first_written = self.buffer.append(price_data)
+            new_bars = self.buffer.frame(first_written)
+            if new_bars.empty or (first_written == previous_count - 1 and len(new_bars) == 1
+                                  and new_bars[PRICE_COLUMNS].equals(previous_last[PRICE_COLUMNS])):
+                return False
+            start = max(first_written, self.buffer.first)
+            self.extrema.add(new_bars, start)
+            if self._statistics is not None:
+                if (start not in (previous_count - 1, previous_count)
+                    or self.buffer.count - self._statistics_start > STATISTICS_MAX_CAPACITIES * self.buffer.capacity):
+                    self._statistics = None
+                else:
+                    self._statistics.extend(new_bars, replace_last = start < previous_count)
+            self.version += 1
+            return True
+
+    def view(self, start = None, moving_average_settings = None):
+        # Consistent view of the stream for a chart update: the bars from number start on (all
+        # the bars held if None) and their moving average lines (moving_average_settings is None
+        # or (moving average type, # of bars)), the dates and extrema of all the bars held
+        with self._lock:
+            first, count = self.buffer.first, self.buffer.count
+            start = first if start is None else max(start, first)
+            extrema = {extremum_key:(extremum, numbers - first) for extremum_key, (extremum, numbers) in self.extrema.extrema().items()}
+            line_values = []
+            if moving_average_settings is not None:
+                if self._statistics is None:
+                    self._statistics = RollingStatistics(self.buffer.frame())
+                    self._statistics_start = first
+                moving_average_type, moving_average_bars = moving_average_settings
+                line_values = self._statistics.moving_average_lines(start - self._statistics_start, count - self._statistics_start,
+                                                                    moving_average_type, moving_average_bars)
+            return IntradayView(self.version, first, count, self.buffer.frame(start), self.buffer.dates(),
+                                extrema, line_values)
+
+class IntradayFeed:
+    # Intraday streams of the tickers shown in intraday mode, shared by the callbacks of this process
+    def __init__(self, fetcher = None, capacity = 1000):
+        self.fetcher = fetcher if fetcher is not None else YFinanceIntradayFetcher()
+        self.capacity = capacity
+        # minimum time between two downloads of a stream, per bar interval
+        self.refresh_intervals = {interval:refresh_interval for interval, (period, refresh_interval) in INTRADAY_INTERVALS.items()}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def stream(self, ticker_symbol, interval):
+        with self._lock:
+            stream = self._streams.get((ticker_symbol, interval))
+            if stream is None:
+                stream = IntradayStream(self.capacity)
+                self._streams[(ticker_symbol, interval)] = stream
+            return stream
+
+    def is_due(self, ticker_symbol, interval):
+        # True if the stream has not been downloaded yet or its last download is older than its refresh interval
+        last_fetch = self.stream(ticker_symbol, interval).last_fetch
+        return last_fetch is None or time.monotonic() - last_fetch >= self.refresh_intervals[interval].total_seconds()
+
+    def refresh(self, ticker_symbol, interval):
+        # Download the bars since the latest bar held (the whole history the first time) unless
+        # the stream was refreshed less than its refresh interval ago. Concurrent refreshes of a
+        # stream wait for the running one. Returns the stream.
+        stream = self.stream(ticker_symbol, interval)
+        with stream.fetch_lock:
+            if self.is_due(ticker_symbol, interval):
+                ticker_data = self.fetcher.fetch(ticker_symbol, interval, start = stream.buffer.last_date)
+                if ticker_data.empty and stream.buffer.count == 0:
+                    raise ValueError(f'No {interval} bars returned for {ticker_symbol}')
+                stream.add(normalize_ticker_data(ticker_data))
+                stream.last_fetch = time.monotonic()
+        return stream
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight instrumentation for the stock/index dashboard: latency histograms
+of the callback stages, values collected at scrape time (e.g. cache
+statistics), rendered in the Prometheus text exposition format, and an opt-in
+per-request profiler.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds (bytes) of the response size histogram buckets
+SIZE_BUCKETS = (1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000)
+
+def format_labels(label_names, label_values):
+    if not label_names:
+        return ''
+    escaped_values = [str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in label_values]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(label_names, escaped_values)) + '}'
+
+class Histogram:
+    # Cumulative histogram per combination of label values (Prometheus histogram semantics)
+    def __init__(self, name, documentation, label_names = (), buckets = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for bucket, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        # Observe the duration of the with block
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = sorted(self._series.items())
+            for label_values, series in series_items:
+                for upper_bound, bucket_count in zip(self.buckets + ('+Inf',), series[:len(self.buckets)] + [series[-1]]):
+                    labels = format_labels(self.label_names + ('le',), label_values + (upper_bound,))
+                    lines.append(f'{self.name}_bucket{labels} {bucket_count}')
+                labels = format_labels(self.label_names, label_values)
+                lines.append(f'{self.name}_sum{labels} {series[-2]}')
+                lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+class CollectedMetric:
+    # Counter or gauge read at scrape time: collect() returns {label values: value}
+    def __init__(self, name, documentation, metric_type, collect, label_names = ()):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.collect = collect
+        self.label_names = tuple(label_names)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        for label_values, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, documentation, label_names = (), buckets = LATENCY_BUCKETS):
+        histogram = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def collected(self, name, documentation, metric_type, collect, label_names = ()):
+        self._metrics.append(CollectedMetric(name, documentation, metric_type, collect, label_names))
+
+    def render(self):
+        # All metrics in the Prometheus text exposition format (version 0.0.4)
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class RequestProfiler:
+    # Opt-in per-request profiling: start() / stop() around a request run it under cProfile,
+    # stop() writes the top hot spots (sorted by cumulative time) to stream
+    def __init__(self, top = 25, stream = None):
+        self.top = top
+        self.stream = stream if stream is not None else sys.stderr
+
+    def start(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile, description):
+        profile.disable()
+        report = io.StringIO()
+        pstats.Stats(profile, stream = report).sort_stats('cumulative').print_stats(self.top)
+        self.stream.write(f'Profile of {description}\n{report.getvalue()}\n')
+        self.stream.flush()
+        return report.getvalue()
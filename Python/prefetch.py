@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Background warm-up and refresh of the dashboard tickers.
+
+Every ticker is loaded once at startup and then refreshed shortly after the
+close of the exchange it trades on, so the Dash callbacks can be served from
+the local caches without waiting on the network. Tickers the callbacks need
+that are not cached yet are downloaded on a background job queue (FetchQueue).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Exchange (by ticker suffix) -> (exchange time zone, local closing time)
+EXCHANGE_CLOSING_TIMES = {'':('America/New_York', time(16, 0)),
+                          '.L':('Europe/London', time(16, 30)),
+                          '.DE':('Europe/Berlin', time(17, 30)),
+                          '.PA':('Europe/Paris', time(17, 30)),
+                          '.SW':('Europe/Zurich', time(17, 30)),
+                          '.T':('Asia/Tokyo', time(15, 30)),
+                          '.HK':('Asia/Hong_Kong', time(16, 0)),
+                          '.SS':('Asia/Shanghai', time(15, 0))}
+
+# Indices without an exchange suffix that are not listed in New York
+INDEX_EXCHANGES = {'^GDAXI':'.DE',
+                   '^FTSE':'.L',
+                   '^N225':'.T',
+                   '^HSI':'.HK'}
+
+def ticker_exchange(ticker_symbol):
+    # Exchange suffix of a ticker ('' for US listed tickers)
+    if ticker_symbol in INDEX_EXCHANGES:
+        return INDEX_EXCHANGES[ticker_symbol]
+    if '.' in ticker_symbol:
+        suffix = ticker_symbol[ticker_symbol.rindex('.'):]
+        if suffix in EXCHANGE_CLOSING_TIMES:
+            return suffix
+    return ''
+
+def next_refresh_time(ticker_symbol, now, refresh_delay):
+    # First exchange close (plus refresh_delay) after now, skipping weekends.
+    # now must be timezone aware, the result is returned in UTC.
+    time_zone_name, closing_time = EXCHANGE_CLOSING_TIMES[ticker_exchange(ticker_symbol)]
+    exchange_now = now.astimezone(ZoneInfo(time_zone_name))
+    refresh_day = exchange_now.date()
+    while True:
+        refresh_time = datetime.combine(refresh_day, closing_time, tzinfo = ZoneInfo(time_zone_name)) + refresh_delay
+        if refresh_day.weekday() < 5 and refresh_time > exchange_now:
+            return refresh_time.astimezone(timezone.utc)
+        refresh_day += timedelta(days = 1)
+
+class PrefetchScheduler:
+    # loader(ticker_symbol, force_refresh) loads a ticker into the dashboard caches;
+    # force_refresh is False for the startup warm-up and True for the scheduled refreshes.
+    def __init__(self, ticker_symbols, loader, max_workers = 4,
+                 refresh_delay = timedelta(minutes = 30), retry_delay = timedelta(minutes = 15)):
+        self.ticker_symbols = list(dict.fromkeys(ticker_symbols))
+        self.loader = loader
+        self.max_workers = max_workers
+        self.refresh_delay = refresh_delay
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {ticker_symbol:{'loaded':False,
+                                       'last_refresh':None,
+                                       'next_refresh':None,
+                                       'failures':0,
+                                       'last_error':None} for ticker_symbol in self.ticker_symbols}
+
+    def is_loaded(self, ticker_symbol):
+        # True once the ticker has been loaded by the scheduler at least once
+        with self._lock:
+            return ticker_symbol in self._status and self._status[ticker_symbol]['loaded']
+
+    def status(self):
+        # Copy of the per ticker status: loaded flag, last / next refresh time, failure count and last error
+        with self._lock:
+            return {ticker_symbol:dict(ticker_status) for ticker_symbol, ticker_status in self._status.items()}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target = self._run, name = 'prefetch-scheduler', daemon = True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _load(self, ticker_symbol, force_refresh):
+        try:
+            self.loader(ticker_symbol, force_refresh)
+        except Exception as error:
+            now = datetime.now(timezone.utc)
+            with self._lock:
+                ticker_status = self._status[ticker_symbol]
+                ticker_status['failures'] += 1
+                ticker_status['last_error'] = repr(error)
+                ticker_status['next_refresh'] = now + self.retry_delay
+            return
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            ticker_status = self._status[ticker_symbol]
+            ticker_status['loaded'] = True
+            ticker_status['last_refresh'] = now
+            ticker_status['last_error'] = None
+            ticker_status['next_refresh'] = next_refresh_time(ticker_symbol, now, self.refresh_delay)
+
+    def run_once(self, ticker_symbols, force_refresh):
+        # Load the given tickers on a bounded thread pool and wait for all of them
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            list(executor.map(lambda ticker_symbol: self._load(ticker_symbol, force_refresh), ticker_symbols))
+
+    def _run(self):
+        # startup warm-up, then refresh every ticker once its exchange has closed
+        self.run_once(self.ticker_symbols, False)
+        while not self._stop.is_set():
+            with self._lock:
+                next_refresh = {ticker_symbol:ticker_status['next_refresh'] for ticker_symbol, ticker_status in self._status.items()}
+            now = datetime.now(timezone.utc)
+            due = [ticker_symbol for ticker_symbol, refresh_time in next_refresh.items() if refresh_time <= now]
+            if due:
+                self.run_once(due, True)
+                continue
+            wait_seconds = (min(next_refresh.values()) - now).total_seconds()
+            self._stop.wait(max(wait_seconds, 1))
+
+class FetchQueue:
+    # Downloads requested by the Dash callbacks, run in the background so a slow data source does
+    # not hold up the web workers. loader(ticker_symbol) runs on a bounded thread pool and at
+    # most one job per ticker is queued or running at a time.
+    def __init__(self, loader, max_workers = 4):
+        self.loader = loader
+        self._executor = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = 'fetch-queue')
+        self._lock = threading.Lock()
+        self._jobs = {} # ticker -> Future of its last download
+
+    def submit(self, ticker_symbol):
+        # Queue a download of the ticker unless one is already queued or running
+        with self._lock:
+            job = self._jobs.get(ticker_symbol)
+            if job is None or job.done():
+                self._jobs[ticker_symbol] = self._executor.submit(self.loader, ticker_symbol)
+
+    def take_error(self, ticker_symbol):
+        # Exception of the last download of the ticker if it failed (None otherwise). The failed
+        # job is forgotten, so the next submit() tries again.
+        with self._lock:
+            job = self._jobs.get(ticker_symbol)
+            if job is None or not job.done() or job.exception() is None:
+                return None
+            del self._jobs[ticker_symbol]
+            return job.exception()
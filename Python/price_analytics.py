@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Price data helpers used by the dashboard callbacks (date windows, moving averages,
+rolling statistics, summary table extrema (also of streamed intraday bars),
+downsampling of long date ranges, aligned multi-ticker comparisons, currency
+conversion).
+
+The cached price histories are sorted by date and indexed by a DatetimeIndex, so
+date windows are located with a binary search instead of full-length boolean masks.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from startup import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+def date_window_positions(price_data, begin_date, end_date = None):
+    # Row positions [start, stop) of the bars dated begin_date up to and including end_date
+    # (up to the last bar if end_date is None), found in O(log n) on the sorted DatetimeIndex
+    start = price_data.index.searchsorted(pd.Timestamp(begin_date), side = 'left')
+    if end_date is None:
+        stop = len(price_data)
+    else:
+        stop = price_data.index.searchsorted(pd.Timestamp(end_date), side = 'right')
+    return start, stop
+
+# Summary table rows: (row label, extremum key)
+SUMMARY_TABLE_ROWS = [('Maximum Price', 'max_high'),
+                      ('Maximum Closing Price', 'max_close'),
+                      ('Minimum Closing Price', 'min_close'),
+                      ('Minimum Price', 'min_low')]
+
+def price_extrema(price_data):
+    # Maximum high, maximum close, minimum close and minimum low of the window together with
+    # the row positions of every bar that ties with the extremum, computed on the NumPy arrays
+    extrema = {}
+    for extremum_key, column, reduce_function in [('max_high', 'High', np.nanmax),
+                                                  ('max_close', 'Close', np.nanmax),
+                                                  ('min_close', 'Close', np.nanmin),
+                                                  ('min_low', 'Low', np.nanmin)]:
+        values = price_data[column].to_numpy()
+        if len(values) == 0 or np.isnan(values).all():
+            extrema[extremum_key] = (np.nan, np.array([], dtype = np.int64))
+            continue
+        extremum = reduce_function(values)
+        extrema[extremum_key] = (extremum, np.flatnonzero(values == extremum))
+    return extrema
+
+def summary_table_records(price_data, extrema, y_label, date_format = '%m-%d-%Y'):
+    # DataTable records for the summary table: one row per extremum, tied dates are listed
+    # on additional rows with an empty label
+    dates = price_data['Date'].to_numpy()
+    records = []
+    for row_label, extremum_key in SUMMARY_TABLE_ROWS:
+        extremum, positions = extrema[extremum_key]
+        date_labels = pd.DatetimeIndex(dates[positions]).strftime(date_format)
+        for row_number, date_label in enumerate(date_labels):
+            records.append({' ':row_label if row_number == 0 else '',
+                            'Date':date_label,
+                            y_label:float(extremum)})
+    return records
+
+class RollingStatistics:
+    # Precomputed rolling statistics of the closing prices of one ticker. Cumulative sums of the
+    # prices (and their squares) make the simple moving average / standard deviation of any
+    # window an O(1) difference per point, and new bars are added in O(new bars).
+    # Exponential moving averages are kept per span (for the MAX_EXPONENTIAL_AVERAGES spans used
+    # last) and continued when bars are appended.
+    MAX_EXPONENTIAL_AVERAGES = 4
+
+    def __init__(self, price_data):
+        self._lock = threading.Lock()
+        self._rebuild(price_data)
+
+    def _rebuild(self, price_data):
+        closing_prices = price_data['Close'].to_numpy(dtype = np.float64)
+        finite_prices = closing_prices[np.isfinite(closing_prices)]
+        # prices are shifted by the first price to limit cancellation errors in the sums of squares
+        self._offset = finite_prices[0] if len(finite_prices) else 0.0
+        self._closing_prices = np.empty(0)
+        self._cumulative_sums = np.zeros((1, 3)) # running sums of price, price**2 and missing prices
+        self._count = 0
+        self._last_date = None
+        self._exponential_averages = OrderedDict() # span -> averages, least recently used first
+        self._append(price_data)
+
+    def _append(self, price_data):
+        closing_prices = price_data['Close'].to_numpy(dtype = np.float64)
+        new_count = self._count + len(closing_prices)
+        if new_count + 1 > len(self._cumulative_sums):
+            # grow the buffers geometrically, so appending stays O(new bars) amortized
+            capacity = max(2 * len(self._cumulative_sums), new_count + 1)
+            self._cumulative_sums = np.resize(self._cumulative_sums, (capacity, 3))
+            self._closing_prices = np.resize(self._closing_prices, capacity)
+        missing = ~np.isfinite(closing_prices)
+        shifted_prices = np.where(missing, 0.0, closing_prices - self._offset)
+        increments = np.column_stack([shifted_prices, shifted_prices ** 2, missing])
+        self._cumulative_sums[self._count + 1:new_count + 1] = self._cumulative_sums[self._count] + np.cumsum(increments, axis = 0)
+        self._closing_prices[self._count:new_count] = closing_prices
+        for span, averages in self._exponential_averages.items():
+            self._exponential_averages[span] = extend_exponential_average(averages[:self._count], closing_prices, span)
+        self._count = new_count
+        if len(price_data):
+            self._last_date = price_data['Date'].iloc[-1]
+
+    def update(self, price_data):
+        # Bring the statistics up to date with a (refreshed) price history. If the history only
+        # gained bars at the end (the previous last bar may have been replaced, since it could
+        # be a partial bar) only those are processed, otherwise everything is recomputed.
+        with self._lock:
+            count = self._count
+            if (count >= 2 and len(price_data) >= count
+                and price_data['Date'].iloc[count - 1] == self._last_date
+                and price_data['Close'].iloc[count - 2] == self._closing_prices[count - 2]):
+                if len(price_data) == count and price_data['Close'].iloc[-1] == self._closing_prices[count - 1]:
+                    return
+                self._count = count - 1
+                for span in self._exponential_averages:
+                    self._exponential_averages[span] = self._exponential_averages[span][:count - 1]
+                self._append(price_data.iloc[count - 1:])
+            else:
+                self._rebuild(price_data)
+
+    def extend(self, price_data, replace_last = False):
+        # Add bars at the end without passing the whole history (e.g. streamed intraday bars);
+        # with replace_last the first bar replaces the last bar added before (a partial bar)
+        with self._lock:
+            if replace_last and self._count:
+                self._count -= 1
+                for span in self._exponential_averages:
+                    self._exponential_averages[span] = self._exponential_averages[span][:self._count]
+            self._append(price_data)
+
+    def _window_sums(self, start, stop, window):
+        # Sums over the window ending at each row of [start, stop) (NaN where the window is incomplete)
+        window_sums = np.full((stop - start, 3), np.nan)
+        first_complete = min(max(start, window - 1), stop)
+        window_sums[first_complete - start:] = (self._cumulative_sums[first_complete + 1:stop + 1]
+                                                - self._cumulative_sums[first_complete + 1 - window:stop + 1 - window])
+        window_sums[window_sums[:, 2] > 0] = np.nan # windows with missing prices
+        return window_sums
+
+    def simple_moving_average(self, start, stop, window):
+        # Same values as Close.rolling(window).mean() for the rows [start, stop)
+        with self._lock:
+            window_sums = self._window_sums(start, stop, window)
+            return window_sums[:, 0] / window + self._offset
+
+    def bollinger_bands(self, start, stop, window, number_of_deviations = 2):
+        # Simple moving average and the bands number_of_deviations (sample) standard deviations
+        # above and below it for the rows [start, stop)
+        with self._lock:
+            window_sums = self._window_sums(start, stop, window)
+        means = window_sums[:, 0] / window
+        if window < 2:
+            # the sample standard deviation of a single price is undefined (NaN, as in pandas)
+            variances = np.full(len(means), np.nan)
+        else:
+            variances = np.maximum(window_sums[:, 1] - window * means ** 2, 0) / (window - 1)
+        deviations = number_of_deviations * np.sqrt(variances)
+        return means + self._offset, means + self._offset + deviations, means + self._offset - deviations
+
+    def exponential_moving_average(self, start, stop, span):
+        # Same values as Close.ewm(span = span, adjust = False).mean() for the rows [start, stop),
+        # the full-history average of each span is computed once and then only extended
+        with self._lock:
+            if span in self._exponential_averages:
+                self._exponential_averages.move_to_end(span)
+            else:
+                self._exponential_averages[span] = extend_exponential_average(np.empty(0), self._closing_prices[:self._count], span)
+                if len(self._exponential_averages) > self.MAX_EXPONENTIAL_AVERAGES:
+                    self._exponential_averages.popitem(last = False)
+            return self._exponential_averages[span][start:stop].copy()
+
+    def moving_average_lines(self, start, stop, moving_average_type, window):
+        # Moving average for the rows [start, stop): 'SMA', 'EMA', or 'bollinger' for the simple
+        # moving average followed by the upper and lower Bollinger bands
+        if (moving_average_type == 'EMA'):
+            return [self.exponential_moving_average(start, stop, window)]
+        if (moving_average_type == 'bollinger'):
+            return list(self.bollinger_bands(start, stop, window))
+        return [self.simple_moving_average(start, stop, window)]
+
+    def nbytes(self):
+        # Memory used by the price buffers and the exponential moving averages kept
+        with self._lock:
+            return (self._closing_prices.nbytes + self._cumulative_sums.nbytes
+                    + sum(averages.nbytes for averages in self._exponential_averages.values()))
+
+def extend_exponential_average(averages, new_prices, span):
+    # Continue the exponential moving average recursion over new_prices
+    if len(new_prices) == 0:
+        return averages
+    if len(averages) == 0:
+        new_averages = pd.Series(new_prices).ewm(span = span, adjust = False).mean().to_numpy()
+    else:
+        # seed the recursion with the last average (its first output reproduces that value)
+        new_averages = pd.Series(np.concatenate([averages[-1:], new_prices])).ewm(span = span, adjust = False).mean().to_numpy()[1:]
+    return np.concatenate([averages, new_averages])
+
+class SlidingExtrema:
+    # Summary table extrema (as returned by price_extrema) of the last capacity bars of a stream of
+    # bars, kept up to date in O(1) amortized per bar with monotonic queues instead of rescanning
+    # the window. Bars are numbered in the order they arrive. The latest bar may still change (a
+    # partial bar), so it is only added to the queues once the next bar has arrived.
+    EXTREMA = [('max_high', 'High', True),
+               ('max_close', 'Close', True),
+               ('min_close', 'Close', False),
+               ('min_low', 'Low', False)]
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._queues = {extremum_key:deque() for extremum_key, column, is_maximum in self.EXTREMA} # (bar number, value)
+        self._count = 0
+        self._pending = None # values of the latest bar
+
+    def add(self, price_data, first_number):
+        # Add the bars of price_data, numbered first_number on. first_number may be the number of
+        # the latest bar (which is then replaced) or skip bars (which are then left out).
+        if first_number < self._count:
+            self._pending = None
+        elif first_number > self._count and self._pending is not None:
+            self._push(self._count - 1, self._pending)
+            self._pending = None
+        self._count = first_number
+        columns = {column:price_data[column].to_numpy(dtype = np.float64) for column in ['High', 'Close', 'Low']}
+        for row in range(len(price_data)):
+            if self._pending is not None:
+                self._push(self._count - 1, self._pending)
+            self._pending = {column:values[row] for column, values in columns.items()}
+            self._count += 1
+        self._evict()
+
+    def _push(self, number, values):
+        for extremum_key, column, is_maximum in self.EXTREMA:
+            value = values[column]
+            if np.isnan(value):
+                continue
+            queue = self._queues[extremum_key]
+            # bars that can no longer be the extremum are dropped, equal values are kept (ties)
+            while queue and (queue[-1][1] < value if is_maximum else queue[-1][1] > value):
+                queue.pop()
+            queue.append((number, value))
+
+    def _evict(self):
+        first = max(0, self._count - self.capacity)
+        for queue in self._queues.values():
+            while queue and queue[0][0] < first:
+                queue.popleft()
+
+    def extrema(self):
+        # {extremum key: (extremum, bar numbers of every bar tied with it)}, NaN and no bars if
+        # the window has no prices
+        extrema = {}
+        for extremum_key, column, is_maximum in self.EXTREMA:
+            queue = self._queues[extremum_key]
+            # the queue values decrease (maxima) / increase (minima) from the front, ties are at the front
+            extremum = queue[0][1] if queue else np.nan
+            numbers = []
+            for number, value in queue:
+                if value != extremum:
+                    break
+                numbers.append(number)
+            pending_value = np.nan if self._pending is None else self._pending[column]
+            if not np.isnan(pending_value):
+                if np.isnan(extremum) or (pending_value > extremum if is_maximum else pending_value < extremum):
+                    extremum, numbers = pending_value, []
+                if pending_value == extremum:
+                    numbers.append(self._count - 1)
+            extrema[extremum_key] = (extremum, np.array(numbers, dtype = np.int64))
+        return extrema
+
+def downsample_ohlc(price_data, target_points):
+    # Aggregate daily bars into weekly, monthly, quarterly or yearly candles (the finest period
+    # giving at most target_points candles). Each candle is dated by its last bar; the row
+    # positions of those bars are returned as well, to sample other series (e.g. moving
+    # averages) at the same points. Windows that already fit are returned unchanged.
+    if len(price_data) <= target_points:
+        return price_data, np.arange(len(price_data))
+    starts = period_starts(price_data.index, target_points)
+    last_positions = np.append(starts[1:], len(price_data)) - 1
+    downsampled_data = pd.DataFrame({'Date':price_data['Date'].to_numpy()[last_positions],
+                                     'Open':price_data['Open'].to_numpy()[starts],
+                                     'High':np.fmax.reduceat(price_data['High'].to_numpy(), starts),
+                                     'Low':np.fmin.reduceat(price_data['Low'].to_numpy(), starts),
+                                     'Close':price_data['Close'].to_numpy()[last_positions]},
+                                    index = price_data.index[last_positions])
+    return downsampled_data, last_positions
+
+def period_starts(dates, target_points):
+    # Row positions where a new week, month, quarter or year starts in the sorted DatetimeIndex
+    # dates, for the finest of those periods giving at most target_points periods
+    for frequency in ['W', 'M', 'Q', 'Y']:
+        period_keys = dates.to_period(frequency).asi8
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(period_keys)) + 1])
+        if len(starts) <= target_points:
+            break
+    return starts
+
+def lttb_positions(x_values, y_values, target_points):
+    # Largest-Triangle-Three-Buckets: row positions of at most target_points points that keep
+    # the visual shape of the line. The first and last points are always kept; for every
+    # bucket in between the point forming the largest triangle with the previously selected
+    # point and the average of the next bucket is selected. Missing y values are skipped.
+    finite_positions = np.flatnonzero(np.isfinite(y_values))
+    if len(finite_positions) <= target_points or target_points < 3:
+        return finite_positions
+    x_values = np.asarray(x_values, dtype = np.float64)[finite_positions]
+    y_values = np.asarray(y_values, dtype = np.float64)[finite_positions]
+    bucket_edges = np.linspace(1, len(x_values) - 1, target_points - 1).astype(np.int64)
+    selected = np.empty(target_points, dtype = np.int64)
+    selected[0] = 0
+    selected[-1] = len(x_values) - 1
+    for bucket in range(target_points - 2):
+        bucket_start, bucket_stop = bucket_edges[bucket], bucket_edges[bucket + 1]
+        next_stop = bucket_edges[bucket + 2] if bucket + 2 < len(bucket_edges) else len(x_values)
+        next_x = x_values[bucket_stop:next_stop].mean()
+        next_y = y_values[bucket_stop:next_stop].mean()
+        previous_x, previous_y = x_values[selected[bucket]], y_values[selected[bucket]]
+        areas = np.abs((previous_x - next_x) * (y_values[bucket_start:bucket_stop] - previous_y)
+                       - (previous_x - x_values[bucket_start:bucket_stop]) * (next_y - previous_y))
+        selected[bucket + 1] = bucket_start + np.argmax(areas)
+    return finite_positions[selected]
+
+def align_closing_prices(price_data_list, begin_date, end_date = None):
+    # Closing prices of several tickers on a shared calendar: the union of their trading days
+    # within the window. Returns (calendar DatetimeIndex, matrix of shape (days, tickers)); a
+    # ticker without a bar on a calendar day carries its last close forward (NaN before its
+    # first bar). Every ticker is aligned with one binary search over the calendar.
+    windows = []
+    for price_data in price_data_list:
+        start, stop = date_window_positions(price_data, begin_date, end_date)
+        windows.append((price_data.index.asi8[start:stop], price_data['Close'].to_numpy(dtype = np.float64)[start:stop]))
+    calendar = np.unique(np.concatenate([dates for dates, closing_prices in windows] + [np.empty(0, dtype = np.int64)]))
+    matrix = np.full((len(calendar), len(windows)), np.nan)
+    for column, (dates, closing_prices) in enumerate(windows):
+        # position of the last bar on or before every calendar day
+        positions = np.searchsorted(dates, calendar, side = 'right') - 1
+        has_bar = positions >= 0
+        matrix[has_bar, column] = closing_prices[positions[has_bar]]
+    return pd.DatetimeIndex(calendar), matrix
+
+def rebase(matrix, base = 100.0):
+    # Every column divided by its first finite value and multiplied by base
+    if len(matrix) == 0:
+        return matrix.copy()
+    finite = np.isfinite(matrix)
+    first_rows = np.argmax(finite, axis = 0)
+    first_values = matrix[first_rows, np.arange(matrix.shape[1])]
+    first_values[~finite.any(axis = 0)] = np.nan
+    return matrix / first_values * base
+
+def return_correlation(matrix):
+    # Correlation matrix of the daily (log) returns of the columns, using the days on which
+    # both tickers of a pair have a return (pairwise complete observations)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        returns = np.diff(np.log(matrix), axis = 0)
+    return pd.DataFrame(returns).corr(min_periods = 2).to_numpy()
+
+def asof_rates(dates, fx_data):
+    # Exchange rate of every date: the last FX close on or before that date (NaN before the
+    # first FX bar), found with one binary search over the sorted FX history
+    positions = fx_data.index.searchsorted(dates, side = 'right') - 1
+    fx_closes = fx_data['Close'].to_numpy(dtype = np.float64)
+    rates = np.full(len(positions), np.nan)
+    rates[positions >= 0] = fx_closes[positions[positions >= 0]]
+    return rates
+
+def convert_prices(price_data, rates, price_columns = ('Open', 'High', 'Low', 'Close')):
+    # Prices multiplied by rates (one rate per row, or a single rate), as a new frame with the
+    # same dates; all the price columns are converted in one operation on their 2D block and
+    # the other columns (the volume) are kept as they are
+    price_columns = list(price_columns)
+    rates = np.asarray(rates, dtype = np.float64)
+    if rates.ndim == 1:
+        rates = rates[:, np.newaxis]
+    converted_data = pd.DataFrame(price_data[price_columns].to_numpy(dtype = np.float64) * rates,
+                                  columns = price_columns, index = price_data.index)
+    converted_data.insert(0, 'Date', price_data['Date'].to_numpy())
+    for column in price_data.columns.difference(['Date'] + price_columns, sort = False):
+        converted_data[column] = price_data[column].to_numpy()
+    return converted_data
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Local on-disk store of daily price history for the stock/index dashboard.
+
+Each ticker is kept in its own SQLite file. The full history is downloaded
+once, after that only the most recent bars are fetched and merged in.
+
+The store can be shared by several processes on the same host (e.g. gunicorn
+workers): downloads are serialized per ticker with a file lock, so a ticker is
+only fetched once per host, and every saved history is also written as a NumPy
+snapshot that the processes memory-map, so they share one copy of the prices
+through the page cache instead of each holding its own.
+
+Only the columns used by the dashboard are kept (STORED_COLUMNS, dates as day
+numbers in the snapshots) and the prices can optionally be stored as float32.
+The forecasts made by forecasting.py are kept in the SQLite file of their ticker
+as well.
+"""
+
+import os
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from startup import lazy_import
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Price columns (yfinance also returns Volume, Dividends and Stock Splits)
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+# Columns kept in the store: the prices and the volume (used by the volume weighted indicators,
+# NaN for data sources without volumes). The volume is stored in the price dtype as well.
+STORED_COLUMNS = PRICE_COLUMNS + ['Volume']
+
+class YFinanceFetcher:
+    # Default price data source. Any object with a fetch(ticker_symbol, start = None)
+    # method that returns a DataFrame with a 'Date' column can be used instead
+    # (e.g. a fake backend serving recorded data for offline use).
+    def fetch(self, ticker_symbol, start = None):
+        import yfinance as yf
+        ticker = yf.Ticker(ticker_symbol)
+        if start is None:
+            ticker_data = ticker.history(period = 'max')
+        else:
+            ticker_data = ticker.history(start = pd.Timestamp(start).strftime('%Y-%m-%d'))
+        ticker_data.reset_index(inplace = True)
+        return ticker_data
+
+def normalize_ticker_data(ticker_data):
+    # Make sure the 'Date' column is timezone naive and the rows are sorted by date
+    # with no duplicated bars, so the cached frames can be merged and compared.
+    # The dates are also used as a (sorted) DatetimeIndex to allow binary search slicing.
+    # Columns not used by the dashboard are dropped.
+    ticker_data = with_volume(ticker_data)[['Date'] + STORED_COLUMNS].copy()
+    dates = pd.to_datetime(ticker_data['Date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    ticker_data['Date'] = dates
+    ticker_data = ticker_data.drop_duplicates(subset = 'Date', keep = 'last')
+    ticker_data = ticker_data.sort_values('Date', kind = 'mergesort')
+    ticker_data.index = pd.DatetimeIndex(ticker_data['Date'].values)
+    return ticker_data
+
+def with_volume(ticker_data):
+    # ticker_data with a NaN 'Volume' column if it has none (data sources without volumes, stores
+    # written before the volumes were kept)
+    if 'Volume' in ticker_data:
+        return ticker_data
+    ticker_data = ticker_data.copy(deep = False)
+    ticker_data['Volume'] = np.nan
+    return ticker_data
+
+class PriceStore:
+    def __init__(self, store_dir, fetcher = None, max_staleness = timedelta(hours = 12), retries = 3, backoff = 1.0,
+                 price_dtype = 'float64'):
+        self.store_dir = store_dir
+        self.fetcher = fetcher if fetcher is not None else YFinanceFetcher()
+        # cached data younger than max_staleness is served without any network access
+        self.max_staleness = max_staleness
+        # failed downloads are retried up to retries times, waiting backoff * 2**attempt seconds in between
+        self.retries = retries
+        self.backoff = backoff
+        # np.float32 halves the memory of the prices; the relative rounding error of every
+        # price is then at most 2**-24 (about 6e-8, e.g. 0.0024 on a price of 40,000)
+        self._price_dtype = price_dtype
+        os.makedirs(store_dir, exist_ok = True)
+
+    @property
+    def price_dtype(self):
+        # Resolved on use, so creating the store does not import numpy
+        return np.dtype(self._price_dtype)
+
+    def _path(self, ticker_symbol):
+        # Ticker symbols such as '^GSPC' or '0386.HK' are mapped to safe file names
+        file_name = re.sub(r'[^A-Za-z0-9._-]', '_', ticker_symbol)
+        return os.path.join(self.store_dir, f'{file_name}.sqlite')
+
+    def _connect(self, ticker_symbol):
+        connection = sqlite3.connect(self._path(ticker_symbol), timeout = 30)
+        connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        return connection
+
+    def _snapshot_path(self, ticker_symbol):
+        return self._path(ticker_symbol)[:-len('.sqlite')] + '.npy'
+
+    @contextmanager
+    def _fetch_lock(self, ticker_symbol):
+        # Host-wide lock held while a ticker is downloaded and saved (shared by all processes using the store)
+        with file_lock(self._path(ticker_symbol)[:-len('.sqlite')] + '.lock'):
+            yield
+
+    def _meta(self, ticker_symbol):
+        # {key: value} of the meta table (None if the ticker has not been cached yet)
+        if not os.path.exists(self._path(ticker_symbol)):
+            return None
+        with self._connect(ticker_symbol) as connection:
+            meta = dict(connection.execute('SELECT key, value FROM meta').fetchall())
+        connection.close()
+        if 'last_refresh' not in meta:
+            return None
+        return meta
+
+    def last_refresh(self, ticker_symbol):
+        # Time the ticker was last checked against the data source (None if never cached)
+        meta = self._meta(ticker_symbol)
+        if meta is None:
+            return None
+        return datetime.fromisoformat(meta['last_refresh'])
+
+    def load(self, ticker_symbol):
+        # Read the cached history (None if the ticker has not been cached yet). The memory-mapped
+        # snapshot is used when available, the frames returned from it are read-only.
+        meta = self._meta(ticker_symbol)
+        if meta is None:
+            return None
+        if 'snapshot_layout' in meta:
+            ticker_data = self._load_snapshot(ticker_symbol, json.loads(meta['snapshot_layout']))
+            if ticker_data is not None:
+                return ticker_data
+        with self._connect(ticker_symbol) as connection:
+            ticker_data = pd.read_sql('SELECT * FROM prices ORDER BY Date', connection, parse_dates = ['Date'])
+        connection.close()
+        # stores written before the columns were pruned may hold additional columns
+        ticker_data = with_volume(ticker_data)[['Date'] + STORED_COLUMNS].astype({column:self.price_dtype for column in STORED_COLUMNS})
+        ticker_data.index = pd.DatetimeIndex(ticker_data['Date'].values)
+        return ticker_data
+
+    def _load_snapshot(self, ticker_symbol, layout):
+        # The snapshot is one array of the price dtype: the first row holds the dates as day
+        # numbers since 1970-01-01 (int32 for float32 prices, int64 for float64 prices, stored
+        # bit for bit), the following rows the price columns. The price columns are views of
+        # the mapped file; the dates are expanded to datetime64 for the index and 'Date' column.
+        try:
+            snapshot = np.load(self._snapshot_path(ticker_symbol), mmap_mode = 'r')
+        except (OSError, ValueError):
+            return None
+        if (snapshot.ndim != 2 or len(snapshot) != len(layout['columns']) + 1
+            or snapshot.dtype != np.dtype(layout['dtype']) or snapshot.dtype != self.price_dtype):
+            # snapshot replaced while the meta table was read (or written with another
+            # price dtype), fall back to SQLite
+            return None
+        day_number_dtype = np.int32 if snapshot.dtype.itemsize == 4 else np.int64
+        dates = snapshot[0].view(day_number_dtype).astype('datetime64[D]').astype('datetime64[ns]')
+        ticker_data = pd.DataFrame(snapshot[1:].T, columns = layout['columns'], index = pd.DatetimeIndex(dates, copy = False), copy = False)
+        ticker_data.insert(0, 'Date', dates)
+        return with_volume(ticker_data)
+
+    def _save_snapshot(self, ticker_symbol, ticker_data):
+        # Written to a temporary file and renamed, so processes still mapping the previous
+        # snapshot keep a consistent copy until they reload
+        day_number_dtype = np.int32 if self.price_dtype.itemsize == 4 else np.int64
+        snapshot = np.empty((len(STORED_COLUMNS) + 1, len(ticker_data)), dtype = self.price_dtype)
+        snapshot[0] = ticker_data['Date'].to_numpy(dtype = 'datetime64[D]').astype(day_number_dtype).view(self.price_dtype)
+        for row, column in enumerate(STORED_COLUMNS, start = 1):
+            snapshot[row] = ticker_data[column].to_numpy()
+        temporary_path = self._snapshot_path(ticker_symbol) + f'.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as snapshot_file:
+            np.save(snapshot_file, snapshot)
+        os.replace(temporary_path, self._snapshot_path(ticker_symbol))
+        return {'columns':STORED_COLUMNS, 'dtype':self.price_dtype.name}
+
+    def save(self, ticker_symbol, ticker_data):
+        layout = self._save_snapshot(ticker_symbol, ticker_data)
+        with self._connect(ticker_symbol) as connection:
+            ticker_data[['Date'] + STORED_COLUMNS].to_sql('prices', connection, if_exists = 'replace', index = False)
+            connection.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                   [('last_refresh', datetime.now().isoformat()),
+                                    ('snapshot_layout', json.dumps(layout))])
+        connection.close()
+
+    def save_forecast(self, ticker_symbol, forecast, details):
+        # Forecast of a cached ticker (Date, Forecast, Lower, Upper rows, see forecasting.py) and its
+        # details (model, scores, last bar used, ...), kept in the ticker's SQLite file
+        with self._connect(ticker_symbol) as connection:
+            forecast.to_sql('forecast', connection, if_exists = 'replace', index = False)
+            connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('forecast', json.dumps(details)))
+        connection.close()
+
+    def load_forecast(self, ticker_symbol):
+        # (details, forecast frame) of the stored forecast (None if the ticker has none)
+        if not os.path.exists(self._path(ticker_symbol)):
+            return None
+        with self._connect(ticker_symbol) as connection:
+            # details and rows read in one transaction, so they belong to the same forecast
+            connection.execute('BEGIN')
+            details = connection.execute("SELECT value FROM meta WHERE key = 'forecast'").fetchone()
+            forecast = None if details is None else pd.read_sql('SELECT * FROM forecast ORDER BY Date', connection, parse_dates = ['Date'])
+        connection.close()
+        if details is None:
+            return None
+        return json.loads(details[0]), forecast
+
+    def _fetch(self, ticker_symbol, start = None):
+        for attempt in range(self.retries + 1):
+            try:
+                ticker_data = self.fetcher.fetch(ticker_symbol, start = start)
+                if ticker_data.empty and start is None:
+                    raise ValueError(f'No price data returned for {ticker_symbol}')
+                return normalize_ticker_data(ticker_data)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def is_fresh(self, ticker_symbol):
+        last_refresh = self.last_refresh(ticker_symbol)
+        return last_refresh is not None and datetime.now() - last_refresh < self.max_staleness
+
+    def refresh(self, ticker_symbol, refreshed_before = None):
+        # Fetch only the most recent bars and merge them into the store. The download starts
+        # at the second to last cached bar: the last bar may have been a partial (intraday) bar
+        # and the one before it is used to check that the cached history is still valid.
+        # If refreshed_before is given and another process refreshed the ticker since then
+        # (while this one was waiting for the lock), the stored history is returned as is.
+        with self._fetch_lock(ticker_symbol):
+            if refreshed_before is not None:
+                last_refresh = self.last_refresh(ticker_symbol)
+                if last_refresh is not None and last_refresh >= refreshed_before:
+                    return self.load(ticker_symbol)
+            cached_data = self.load(ticker_symbol)
+            if cached_data is None or len(cached_data) < 2:
+                ticker_data = self._fetch(ticker_symbol)
+            else:
+                new_data = self._fetch(ticker_symbol, start = cached_data['Date'].iloc[-2])
+                if needs_full_reload(cached_data, new_data):
+                    ticker_data = self._fetch(ticker_symbol)
+                else:
+                    ticker_data = pd.concat([cached_data.iloc[:-2], new_data])
+            self.save(ticker_symbol, ticker_data)
+        # serve the memory-mapped copy, so this process shares it with the others as well
+        return self.load(ticker_symbol)
+
+    def get(self, ticker_symbol, allow_stale = False):
+        # Serve the cached history if it is fresh enough, otherwise bring it up to date first.
+        # With allow_stale any cached history is served (e.g. when refreshes are scheduled elsewhere).
+        if allow_stale or self.is_fresh(ticker_symbol):
+            ticker_data = self.load(ticker_symbol)
+            if ticker_data is not None:
+                return ticker_data
+        # another process may be refreshing the ticker, it is only fetched again if it is
+        # still stale once that download has finished
+        return self.refresh(ticker_symbol, refreshed_before = datetime.now() - self.max_staleness)
+
+    def get_many(self, ticker_symbols, max_workers = 8, errors = None):
+        # Concurrent version of get() for a list of tickers, at most max_workers downloads run at
+        # the same time. Returns {ticker: DataFrame} for the tickers that could be loaded; if an
+        # errors dict is given, the exception of every ticker that failed is stored in it.
+        ticker_symbols = list(dict.fromkeys(ticker_symbols))
+        def get_ticker(ticker_symbol):
+            try:
+                return self.get(ticker_symbol), None
+            except Exception as error:
+                return None, error
+        with ThreadPoolExecutor(max_workers = max_workers) as executor:
+            results = list(executor.map(get_ticker, ticker_symbols))
+        ticker_data_dict = {}
+        for ticker_symbol, (ticker_data, error) in zip(ticker_symbols, results):
+            if error is None:
+                ticker_data_dict[ticker_symbol] = ticker_data
+            elif errors is not None:
+                errors[ticker_symbol] = error
+        return ticker_data_dict
+
+# Retry interval of a blocking file lock on Windows (msvcrt has no call that waits until the lock is free)
+FILE_LOCK_POLL_INTERVAL = 0.05
+
+@contextmanager
+def file_lock(path, blocking = True):
+    # Exclusive lock on the file at path, held by one process of the host at a time (fcntl.flock on
+    # Unix, msvcrt.locking on Windows). Yields True once the lock is held; with blocking = False,
+    # yields False right away if another process (or another open of the file) holds it.
+    # opened for appending: truncating a file another process has locked fails on Windows
+    with open(path, 'a') as lock_file:
+        if not _acquire_file_lock(lock_file, blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _acquire_file_lock(lock_file, blocking):
+    if os.name == 'nt':
+        # locks the first byte of the file
+        while True:
+            lock_file.seek(0)
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(FILE_LOCK_POLL_INTERVAL)
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+def needs_full_reload(cached_data, new_data):
+    # yfinance returns dividend / split adjusted prices, so a new corporate action rewrites the
+    # whole history. If the first downloaded bar (already in the cache) no longer matches the
+    # cached bar, merging would mix differently adjusted prices and a full reload is needed.
+    if new_data.empty:
+        return True
+    if new_data['Date'].iloc[0] != cached_data['Date'].iloc[-2]:
+        return True
+    # histories stored before the volumes were kept are downloaded again to get them
+    if np.isnan(cached_data['Volume'].iloc[-2]) and not np.isnan(new_data['Volume'].iloc[0]):
+        return True
+    return not np.isclose(cached_data['Close'].iloc[-2], new_data['Close'].iloc[0], rtol = 1e-6, equal_nan = True)
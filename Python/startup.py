@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Cold start of the stock/index dashboard.
+
+The app module only needs Dash and Flask to serve its first page; pandas
+(and the plotly modules loaded on the first figure) are imported on first
+use instead of when the module loads. The time spent importing every
+deferred module is recorded, and a background warm-up imports them once the
+app is up, so the first chart does not stall on an import either. The app is
+ready (see the /ready endpoint) when the warm-up has finished.
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+import types
+
+# Set the DASHBOARD_LAZY_IMPORTS environment variable to 0 to import everything when the modules load
+LAZY_IMPORTS_ENABLED = os.environ.get('DASHBOARD_LAZY_IMPORTS', '1') == '1'
+
+# Modules used to serialize the responses, imported up front rather than by the warm-up while
+# requests are already being served: plotly takes orjson (if installed) from sys.modules as soon as
+# its import has started, orjson then resolves the numpy types (crashing the process if numpy is
+# half imported), and importing plotly.io from two threads at once can deadlock
+SERIALIZATION_MODULES = ['numpy', 'orjson', 'plotly.io.json']
+
+# Module name -> seconds spent importing it (dependencies included) through load_module: up front,
+# on first use or by the warm-up
+import_seconds = {}
+_import_seconds_lock = threading.Lock()
+
+def load_module(name):
+    # Import a module, recording the time of the import if it had not been imported yet
+    if name in sys.modules:
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _import_seconds_lock:
+        import_seconds.setdefault(name, time.perf_counter() - start)
+    return module
+
+class LazyModule(types.ModuleType):
+    # Stands in for a module until one of its attributes is used, which imports it. The module's
+    # attributes are then copied, so later lookups do not go through __getattr__.
+    def __getattr__(self, attribute):
+        module = load_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+def lazy_import(name):
+    # Use as 'pd = lazy_import('pandas')' instead of 'import pandas as pd': the module itself if it
+    # has been imported already or lazy imports are disabled, otherwise a LazyModule
+    if not LAZY_IMPORTS_ENABLED or name in sys.modules:
+        return load_module(name)
+    return LazyModule(name)
+
+def prepare_imports():
+    # Import the SERIALIZATION_MODULES that are installed
+    for name in SERIALIZATION_MODULES:
+        try:
+            load_module(name)
+        except ImportError:
+            pass
+
+class WarmUp:
+    # Imports the given modules and runs the given functions (e.g. building a first figure) in a
+    # background thread, so the first requests that need them do not wait
+    def __init__(self, module_names, tasks = ()):
+        self.module_names = list(module_names)
+        self.tasks = list(tasks)
+        self._started = time.monotonic()
+        self._seconds = None
+        self._error = None
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # In the background with lazy imports, otherwise right away (as part of loading the app)
+        if not LAZY_IMPORTS_ENABLED:
+            self._run()
+        elif self._thread is None:
+            self._thread = threading.Thread(target = self._run, name = 'warm-up', daemon = True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            for name in self.module_names:
+                load_module(name)
+            for task in self.tasks:
+                task()
+        except Exception as error:
+            self._error = repr(error)
+        self._seconds = time.monotonic() - self._started
+        self._done.set()
+
+    def is_ready(self):
+        # True once the warm-up has finished without error
+        return self._done.is_set() and self._error is None
+
+    def wait(self, timeout = None):
+        return self._done.wait(timeout)
+
+    def status(self):
+        # Ready flag, duration of the warm-up, its error (if any) and the import_seconds
+        with _import_seconds_lock:
+            imports = {name:round(seconds, 4) for name, seconds in import_seconds.items()}
+        return {'ready':self.is_ready(),
+                'lazy_imports':LAZY_IMPORTS_ENABLED,
+                'warm_up_seconds':None if self._seconds is None else round(self._seconds, 4),
+                'error':self._error,
+                'import_seconds':imports}
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the stock/index dashboard modules, run offline on fixture bars.
+
+Run from the Python folder:  python -m pytest tests
+"""
+
+import os
+import sys
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the dashboard modules are imported by name, as the app does (the benchmarks hold the reference implementations)
+for path in [PYTHON_DIR, os.path.join(PYTHON_DIR, 'benchmarks')]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import pytest
+
+@pytest.fixture(scope = 'session')
+def dashboard():
+    # Dash_stock_dashboard imported offline on synthetic bars (see benchmarks/fixtures.py), failed
+    # downloads are not retried after a delay
+    from fixtures import import_dashboard
+    dashboard = import_dashboard()
+    dashboard.price_store.backoff = 0
+    return dashboard
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Batch loading of several tickers (PriceStore.get_many / get_stock_ticker_data_batch)
+with a data source that fails for some of the tickers.
+"""
+
+import numpy as np
+import pytest
+
+from fixtures import SyntheticFetcher
+from price_analytics import asof_rates
+from price_store import PriceStore
+
+class FailingFetcher(SyntheticFetcher):
+    # Synthetic bars, except for the tickers in failing whose downloads raise
+    def __init__(self, failing):
+        super().__init__(years = 2)
+        self.failing = set(failing)
+
+    def fetch(self, ticker_symbol, start = None):
+        if ticker_symbol in self.failing:
+            raise ConnectionError(f'{ticker_symbol} not available')
+        return super().fetch(ticker_symbol, start)
+
+def test_get_many_reports_failed_tickers(tmp_path):
+    store = PriceStore(str(tmp_path), fetcher = FailingFetcher(['BAD']), retries = 2, backoff = 0)
+    errors = {}
+    ticker_data_dict = store.get_many(['AAPL', 'BAD', 'AAPL', 'BP.L'], max_workers = 2, errors = errors)
+    assert sorted(ticker_data_dict) == ['AAPL', 'BP.L']
+    assert list(errors) == ['BAD']
+    assert isinstance(errors['BAD'], ConnectionError)
+    np.testing.assert_array_equal(ticker_data_dict['AAPL']['Close'].to_numpy(), store.load('AAPL')['Close'].to_numpy())
+
+@pytest.fixture
+def batch_dashboard(dashboard, monkeypatch):
+    # dashboard whose downloads fail for BAD and for the euro / pound rates, with empty caches
+    monkeypatch.setattr(dashboard.price_store, 'fetcher', FailingFetcher(['BAD', 'EURGBP=X']))
+    dashboard.ticker_cache.clear()
+    dashboard.converted_price_cache.clear()
+    yield dashboard
+    dashboard.ticker_cache.clear()
+    dashboard.converted_price_cache.clear()
+
+def test_batch_local_currency_converts_pence(batch_dashboard):
+    errors = {}
+    stock_data_dict = batch_dashboard.get_stock_ticker_data_batch(['AAPL', 'BP.L', 'BAD'], errors = errors)
+    assert sorted(stock_data_dict) == ['AAPL', 'BP.L']
+    assert list(errors) == ['BAD']
+    raw_data = batch_dashboard.load_ticker_data_batch(['AAPL', 'BP.L'])
+    # US prices as quoted, London prices in pounds like the charts of get_stock_ticker_data + display_price_data
+    assert stock_data_dict['AAPL'] is raw_data['AAPL']
+    for column in ['Open', 'High', 'Low', 'Close']:
+        np.testing.assert_allclose(stock_data_dict['BP.L'][column].to_numpy(), raw_data['BP.L'][column].to_numpy() / 100)
+    np.testing.assert_array_equal(stock_data_dict['BP.L']['Volume'].to_numpy(), raw_data['BP.L']['Volume'].to_numpy())
+    pounds = batch_dashboard.display_price_data('BP.L', batch_dashboard.get_stock_ticker_data('BP.L'), 'GBP')
+    np.testing.assert_array_equal(stock_data_dict['BP.L']['Close'].to_numpy(), pounds['Close'].to_numpy())
+
+def test_batch_base_currency_converts_with_fx_rates(batch_dashboard):
+    errors = {}
+    stock_data_dict = batch_dashboard.get_stock_ticker_data_batch(['AAPL', 'BP.L', 'AI.PA'], base_currency = 'GBP', errors = errors)
+    # the euro rates could not be downloaded, so the Paris stock is left out
+    assert sorted(stock_data_dict) == ['AAPL', 'BP.L']
+    assert list(errors) == ['EURGBP=X']
+    raw_data = batch_dashboard.load_ticker_data_batch(['AAPL', 'BP.L', 'USDGBP=X'])
+    rates = asof_rates(raw_data['AAPL'].index, raw_data['USDGBP=X'])
+    np.testing.assert_allclose(stock_data_dict['AAPL']['Close'].to_numpy(), raw_data['AAPL']['Close'].to_numpy() * rates)
+    np.testing.assert_allclose(stock_data_dict['BP.L']['Close'].to_numpy(), raw_data['BP.L']['Close'].to_numpy() / 100)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+LRUCache of the ticker histories and the single-flight coalescing of its loads.
+"""
+
+import threading
+import time
+
+import pytest
+
+import caching
+from caching import LRUCache, SingleFlight
+
+class FakeClock:
+    # Replaces time.monotonic in caching.py, advanced by hand
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(caching.time, 'monotonic', clock)
+    return clock
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = LRUCache(10, 60, sizeof = len)
+    cache.put('A', 'aaaa')
+    cache.put('B', 'bbb')
+    cache.put('C', 'cc')
+    assert cache.get('A') == 'aaaa' # B is now the least recently used entry
+    cache.put('D', 'ddd')
+    assert cache.get('B') is None
+    assert [cache.get(key) for key in 'ACD'] == ['aaaa', 'cc', 'ddd']
+    assert cache.current_bytes == 9
+    # a large entry evicts as many entries as needed, oldest use first (A, then C)
+    cache.put('E', 'eeeeee')
+    assert cache.get('A') is None and cache.get('C') is None
+    assert cache.get('D') == 'ddd' and cache.get('E') == 'eeeeee'
+    assert cache.stats()['evictions'] == 3
+
+def test_entry_larger_than_the_budget_is_not_cached():
+    cache = LRUCache(10, 60, sizeof = len)
+    cache.put('A', 'aaaa')
+    cache.put('B', 'b' * 11)
+    assert cache.get('B') is None
+    assert cache.get('A') == 'aaaa'
+    assert cache.current_bytes == 4
+
+def test_replacing_an_entry_updates_the_size():
+    cache = LRUCache(10, 60, sizeof = len)
+    cache.put('A', 'aaaa')
+    cache.put('A', 'aaaaaaaa')
+    assert cache.current_bytes == 8
+    assert cache.stats()['entries'] == 1
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = LRUCache(100, 60, sizeof = len)
+    cache.put('A', 'aaaa')
+    clock.now += 60
+    assert cache.get('A') == 'aaaa'
+    clock.now += 1
+    assert cache.get('A') is None
+    assert cache.current_bytes == 0
+    # storing the value again restarts its time to live
+    cache.put('A', 'aaaa')
+    clock.now += 30
+    assert cache.get('A') == 'aaaa'
+
+def test_counters(clock):
+    cache = LRUCache(8, 60, sizeof = len)
+    assert cache.get('A') is None
+    cache.put('A', 'aaaa')
+    cache.get('A')
+    cache.get('A')
+    cache.put('B', 'bbbb')
+    cache.put('C', 'cccc') # evicts A
+    clock.now += 61
+    assert cache.get('B') is None # expired
+    assert cache.stats() == {'entries':1, 'bytes':4, 'hits':2, 'misses':2, 'evictions':2, 'coalesced':0}
+
+def test_get_or_load_loads_a_miss_once():
+    cache = LRUCache(100, 60, sizeof = len)
+    loads = []
+    def loader(key):
+        loads.append(key)
+        return key * 2
+    assert cache.get_or_load('A', loader) == 'AA'
+    assert cache.get_or_load('A', loader) == 'AA'
+    assert loads == ['A']
+
+def test_setdefault_keeps_the_value_stored_in_the_meantime():
+    cache = LRUCache(100, 60, sizeof = len)
+    cache.put('AAPL', 'fresh')
+    assert cache.setdefault('AAPL', 'stale') == 'fresh'
+    assert cache.get('AAPL') == 'fresh'
+
+def test_setdefault_stores_an_absent_or_expired_key():
+    cache = LRUCache(100, 60, sizeof = len)
+    assert cache.setdefault('AAPL', 'stale') == 'stale'
+    assert cache.get('AAPL') == 'stale'
+    expired_cache = LRUCache(100, -1, sizeof = len)
+    expired_cache.put('AAPL', 'old')
+    assert expired_cache.setdefault('AAPL', 'stale') == 'stale'
+    assert expired_cache.current_bytes == len('stale')
+
+def call_concurrently(single_flight, key, function, callers):
+    # Calls single_flight.do(key, function) from callers threads, the first one leading. Returns
+    # the results (or exceptions) once the other callers wait on the leader's call.
+    outcomes = [None] * callers
+    def call(caller):
+        try:
+            outcomes[caller] = single_flight.do(key, function)
+        except Exception as error:
+            outcomes[caller] = error
+    threads = [threading.Thread(target = call, args = (caller,)) for caller in range(callers)]
+    threads[0].start()
+    return threads, outcomes
+
+def wait_for_followers(single_flight, threads, coalesced):
+    for thread in threads[1:]:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while single_flight.coalesced < coalesced:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    def load():
+        calls.append(threading.current_thread().name)
+        started.set()
+        assert release.wait(5)
+        return 'history'
+    threads, outcomes = call_concurrently(single_flight, 'AAPL', load, 5)
+    assert started.wait(5)
+    wait_for_followers(single_flight, threads, 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert outcomes == ['history'] * 5
+    # the call is over: the next one runs the function again
+    assert single_flight.do('AAPL', lambda: 'refreshed') == 'refreshed'
+
+def test_single_flight_shares_the_exception():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    error = ConnectionError('AAPL not available')
+    def load():
+        started.set()
+        assert release.wait(5)
+        raise error
+    threads, outcomes = call_concurrently(single_flight, 'AAPL', load, 3)
+    assert started.wait(5)
+    wait_for_followers(single_flight, threads, 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert outcomes == [error] * 3
+    assert single_flight.do('AAPL', lambda: 'history') == 'history'
+
+def test_single_flight_keys_are_independent():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    threads, outcomes = call_concurrently(single_flight, 'AAPL', lambda: release.wait(5) and 'AAPL', 1)
+    # another key is not held up by the call in flight
+    assert single_flight.do('MSFT', lambda: 'MSFT') == 'MSFT'
+    release.set()
+    threads[0].join(5)
+    assert outcomes == ['AAPL'] and single_flight.coalesced == 0
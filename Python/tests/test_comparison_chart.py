@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Memoized comparison charts: built from the histories their cache key was taken
+from, rebuilt when a history changes.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def comparison_dashboard(dashboard, monkeypatch):
+    # downloads within the callback, empty caches
+    monkeypatch.setattr(dashboard, 'ASYNC_FETCH_ENABLED', False)
+    dashboard.ticker_cache.clear()
+    dashboard.comparison_chart_cache.clear()
+    yield dashboard
+    dashboard.ticker_cache.clear()
+    dashboard.comparison_chart_cache.clear()
+
+def test_chart_is_memoized(comparison_dashboard):
+    begin_date = pd.Timestamp('2025-06-30')
+    chart = comparison_dashboard.comparison_chart(['AAPL', 'MSFT'], begin_date, 'percent', 'USD')
+    assert comparison_dashboard.comparison_chart(['AAPL', 'MSFT'], begin_date, 'percent', 'USD') is chart
+    assert comparison_dashboard.comparison_chart_cache.stats()['entries'] == 1
+    assert 0 < comparison_dashboard.comparison_chart_cache.current_bytes <= comparison_dashboard.COMPARISON_CACHE_MAX_BYTES
+    assert len(chart.figure.data) == 2
+
+def test_chart_is_built_from_the_keyed_histories(comparison_dashboard, monkeypatch):
+    begin_date = pd.Timestamp('2025-06-30')
+    chart = comparison_dashboard.comparison_chart(['AAPL', 'BP.L'], begin_date, 'rebased', 'USD')
+    # a refreshed history with one more bar: the chart is rebuilt from the frames the callback
+    # loaded, without loading the histories again
+    price_data = comparison_dashboard.ticker_cache.get('AAPL')
+    last_bar = price_data.iloc[-1:]
+    new_bar = last_bar.assign(Date = last_bar['Date'] + pd.Timedelta(days = 1), Close = last_bar['Close'] * 2)
+    new_bar.index = pd.DatetimeIndex(new_bar['Date'])
+    comparison_dashboard.ticker_cache.put('AAPL', pd.concat([price_data, new_bar]))
+    fx_data = comparison_dashboard.ticker_cache.get('GBPUSD=X')
+    comparison_dashboard.ticker_cache.put('GBPUSD=X', pd.concat([fx_data, fx_data.iloc[-1:].set_axis(new_bar.index).assign(Date = new_bar['Date'].to_numpy())]))
+    monkeypatch.setattr(comparison_dashboard, 'get_stock_ticker_data', lambda ticker_symbol: pytest.fail('history loaded again'))
+    new_chart = comparison_dashboard.comparison_chart(['AAPL', 'BP.L'], begin_date, 'rebased', 'USD')
+    assert new_chart is not chart
+    assert len(new_chart.figure.data[0].x) == len(chart.figure.data[0].x) + 1
+    np.testing.assert_allclose(new_chart.figure.data[0].y[-1], 2 * chart.figure.data[0].y[-1], rtol = 1e-3)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Downsampling of long date ranges: LTTB line sampling, OHLC candles of weeks /
+months / quarters / years and the period boundaries they are built on.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_analytics import downsample_ohlc, lttb_positions, period_starts
+
+def ohlc_bars(dates, seed = 0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+    open_price = close * np.exp(rng.normal(0, 0.01, len(dates)))
+    return pd.DataFrame({'Date':dates,
+                         'Open':open_price,
+                         'High':np.maximum(open_price, close) * 1.01,
+                         'Low':np.minimum(open_price, close) * 0.99,
+                         'Close':close},
+                        index = dates)
+
+def test_lttb_keeps_first_and_last_points():
+    rng = np.random.default_rng(0)
+    y_values = np.cumsum(rng.normal(size = 5000))
+    positions = lttb_positions(np.arange(5000), y_values, 100)
+    assert len(positions) == 100
+    assert positions[0] == 0 and positions[-1] == 4999
+    assert (np.diff(positions) > 0).all()
+
+def test_lttb_keeps_the_spikes():
+    y_values = np.zeros(1000)
+    y_values[[123, 456, 789]] = [10, -10, 10]
+    positions = lttb_positions(np.arange(1000), y_values, 50)
+    assert {123, 456, 789} <= set(positions)
+
+@pytest.mark.parametrize('points', [0, 1, 50, 100])
+def test_lttb_short_window_is_unchanged(points):
+    positions = lttb_positions(np.arange(points), np.arange(points, dtype = np.float64), 100)
+    np.testing.assert_array_equal(positions, np.arange(points))
+
+def test_lttb_skips_missing_values():
+    y_values = np.arange(10, dtype = np.float64)
+    y_values[[0, 4]] = np.nan
+    np.testing.assert_array_equal(lttb_positions(np.arange(10), y_values, 20), [1, 2, 3, 5, 6, 7, 8, 9])
+
+def test_ohlc_candles():
+    price_data = ohlc_bars(pd.bdate_range('2020-01-01', '2023-12-29'))
+    downsampled_data, last_positions = downsample_ohlc(price_data, 60)
+    # about 48 months fit in 60 points, 209 weeks do not
+    months = price_data['Date'].dt.to_period('M')
+    assert len(downsampled_data) == months.nunique() == 48
+    grouped = price_data.groupby(months.to_numpy())
+    np.testing.assert_array_equal(downsampled_data['Open'].to_numpy(), grouped['Open'].first().to_numpy())
+    np.testing.assert_array_equal(downsampled_data['High'].to_numpy(), grouped['High'].max().to_numpy())
+    np.testing.assert_array_equal(downsampled_data['Low'].to_numpy(), grouped['Low'].min().to_numpy())
+    np.testing.assert_array_equal(downsampled_data['Close'].to_numpy(), grouped['Close'].last().to_numpy())
+    # candles are dated by their last bar
+    np.testing.assert_array_equal(downsampled_data['Date'].to_numpy(), grouped['Date'].last().to_numpy())
+    np.testing.assert_array_equal(price_data['Date'].to_numpy()[last_positions], downsampled_data['Date'].to_numpy())
+
+def test_ohlc_short_window_is_unchanged():
+    price_data = ohlc_bars(pd.bdate_range('2023-01-02', periods = 50))
+    downsampled_data, last_positions = downsample_ohlc(price_data, 50)
+    assert downsampled_data is price_data
+    np.testing.assert_array_equal(last_positions, np.arange(50))
+
+def test_period_starts_at_quarter_and_year_boundaries():
+    dates = pd.DatetimeIndex(['2022-12-29', '2022-12-30', # Thu, Fri
+                              '2023-01-02', '2023-01-03', # Mon: new week, month, quarter and year
+                              '2023-01-31', '2023-02-01', # new week on Mon 30, new month mid-week
+                              '2023-03-31', '2023-04-03', # Fri, Mon: new quarter
+                              '2023-06-30', '2023-07-03'])
+    # 7 weeks, 7 months, 4 quarters, 2 years
+    np.testing.assert_array_equal(period_starts(dates, 7), [0, 2, 4, 6, 7, 8, 9])
+    np.testing.assert_array_equal(period_starts(dates, 6), [0, 2, 7, 9])
+    np.testing.assert_array_equal(period_starts(dates, 3), [0, 2])
+    # the years are the coarsest periods, returned even if there are more of them
+    np.testing.assert_array_equal(period_starts(dates, 1), [0, 2])
+
+def test_period_starts_at_month_boundaries():
+    dates = pd.DatetimeIndex(['2023-01-31', '2023-02-01', # Tue, Wed
+                              '2023-02-08', '2023-02-15',
+                              '2023-02-28', '2023-03-01']) # Tue, Wed
+    # 4 weeks, 3 months
+    np.testing.assert_array_equal(period_starts(dates, 4), [0, 2, 3, 4])
+    np.testing.assert_array_equal(period_starts(dates, 3), [0, 1, 5])
+    np.testing.assert_array_equal(period_starts(dates, 2), [0])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Batch price forecasts (forecasting.py) on fixture bars, and their round trip
+through the price store.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fixtures import SyntheticFetcher
+from forecasting import forecast_prices, retrain, FORECAST_HORIZON, FORECAST_MODELS
+from price_store import PriceStore, normalize_ticker_data
+
+TICKERS = ['AAPL', '^GSPC']
+
+@pytest.fixture
+def price_data():
+    return normalize_ticker_data(SyntheticFetcher(years = 3).history('AAPL'))
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceStore(str(tmp_path), fetcher = SyntheticFetcher(years = 3))
+    for ticker_symbol in TICKERS:
+        store.get(ticker_symbol)
+    return store
+
+def test_forecast_prices(price_data):
+    forecast, details = forecast_prices(price_data)
+    assert list(forecast.columns) == ['Date', 'Forecast', 'Lower', 'Upper']
+    assert len(forecast) == FORECAST_HORIZON
+    # the next business days after the last bar
+    last_date = price_data['Date'].iloc[-1]
+    pd.testing.assert_index_equal(pd.DatetimeIndex(forecast['Date']), pd.bdate_range(last_date + pd.Timedelta(days = 1), periods = FORECAST_HORIZON),
+                                  check_names = False)
+    assert ((forecast['Lower'] < forecast['Forecast']) & (forecast['Forecast'] < forecast['Upper'])).all()
+    # the confidence band widens with the horizon
+    assert (np.diff(np.log(forecast['Upper'] / forecast['Lower'])) > 0).all()
+    assert details['model'] in FORECAST_MODELS
+    assert set(details['scores']) == set(FORECAST_MODELS)
+    assert details['last_bar'] == last_date.isoformat()
+    assert details['last_close'] == pytest.approx(price_data['Close'].iloc[-1])
+
+def test_forecast_prices_skips_missing_closes(price_data):
+    with_gaps = price_data.copy()
+    with_gaps.iloc[-1, with_gaps.columns.get_loc('Close')] = np.nan
+    forecast, details = forecast_prices(with_gaps)
+    assert details['last_bar'] == price_data['Date'].iloc[-2].isoformat()
+    assert np.isfinite(forecast[['Forecast', 'Lower', 'Upper']].to_numpy()).all()
+
+def test_forecast_prices_needs_enough_history(price_data):
+    with pytest.raises(ValueError):
+        forecast_prices(price_data.iloc[:100])
+
+def test_retrain_skips_tickers_without_a_new_bar(store):
+    results = retrain(store.store_dir, TICKERS + ['NOT_CACHED'], max_workers = 1)
+    assert sorted(results['trained']) == sorted(TICKERS)
+    assert results['skipped'] == ['NOT_CACHED']
+    assert results['errors'] == {}
+    # nothing new: every ticker is skipped
+    results = retrain(store.store_dir, TICKERS, max_workers = 1)
+    assert results['trained'] == {} and sorted(results['skipped']) == sorted(TICKERS)
+    # a new bar for one ticker: only that one is fitted again
+    price_data = store.load('AAPL')
+    new_bar = price_data.iloc[[-1]].copy()
+    new_bar['Date'] = new_bar['Date'] + pd.offsets.BDay()
+    store.save('AAPL', pd.concat([price_data, new_bar]))
+    results = retrain(store.store_dir, TICKERS, max_workers = 1)
+    assert list(results['trained']) == ['AAPL']
+    assert results['skipped'] == ['^GSPC']
+    assert results['trained']['AAPL']['last_bar'] == new_bar['Date'].iloc[0].isoformat()
+
+def test_stored_forecast_round_trip(store):
+    forecast, details = forecast_prices(store.load('AAPL'))
+    store.save_forecast('AAPL', forecast, details)
+    stored_details, stored_forecast = store.load_forecast('AAPL')
+    assert stored_details == details
+    pd.testing.assert_frame_equal(stored_forecast, forecast, check_dtype = False)
+    assert pd.api.types.is_datetime64_any_dtype(stored_forecast['Date'])
+    assert store.load_forecast('^GSPC') is None
+    assert store.load_forecast('NOT_CACHED') is None
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Technical indicators computed over the full history (TechnicalIndicators).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import TechnicalIndicators
+
+def price_history(count, seed = 0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    dates = pd.bdate_range('2024-01-01', periods = count)
+    return pd.DataFrame({'Date':dates,
+                         'Open':close,
+                         'High':close * 1.01,
+                         'Low':close * 0.99,
+                         'Close':close,
+                         'Volume':rng.integers(1000, 100000, count).astype(np.float64)},
+                        index = pd.DatetimeIndex(dates))
+
+def rolling_vwap(price_data, period):
+    typical_prices = (price_data['High'] + price_data['Low'] + price_data['Close']) / 3
+    return ((typical_prices * price_data['Volume']).rolling(period).sum() / price_data['Volume'].rolling(period).sum()).to_numpy()
+
+@pytest.mark.parametrize('period', [2, 14, 50])
+def test_vwap_matches_rolling_sums(period):
+    price_data = price_history(50)
+    vwap = TechnicalIndicators(price_data).lines('VWAP', period, 0, len(price_data))[0]
+    np.testing.assert_allclose(vwap, rolling_vwap(price_data, period), rtol = 1e-10)
+
+@pytest.mark.parametrize('period', [51, 52, 53, 500])
+def test_periods_longer_than_the_history_give_nan(period):
+    price_data = price_history(50)
+    ticker_indicators = TechnicalIndicators(price_data)
+    for indicator in ['VWAP', 'RSI', 'ATR']:
+        line = ticker_indicators.lines(indicator, period, 10, 50)[0]
+        assert len(line) == 40
+        assert np.isnan(line).all()
+
+def test_vwap_of_an_empty_history():
+    assert len(TechnicalIndicators(price_history(0)).lines('VWAP', 14, 0, 0)[0]) == 0
+
+def gapping_price_history(count, seed = 1):
+    # Bars opening away from the previous close, so that the true range often extends to it
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, count)))
+    open_ = np.concatenate([[100.0], close[:-1]]) * np.exp(rng.normal(0, 0.01, count))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, count))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, count))
+    dates = pd.bdate_range('2024-01-01', periods = count)
+    return pd.DataFrame({'Date':dates, 'Open':open_, 'High':high, 'Low':low, 'Close':close,
+                         'Volume':rng.integers(1000, 100000, count).astype(np.float64)},
+                        index = pd.DatetimeIndex(dates))
+
+def wilder_reference(values, period):
+    # Wilder's smoothing written out: the mean of the first period values, then
+    # average = (previous average * (period - 1) + value) / period
+    averages = pd.Series(np.nan, index = values.index)
+    average = values.iloc[:period].mean()
+    averages.iloc[period - 1] = average
+    for position in range(period, len(values)):
+        average = (average * (period - 1) + values.iloc[position]) / period
+        averages.iloc[position] = average
+    return averages
+
+def ema_reference(values, span):
+    # EMA with alpha = 2 / (span + 1), started at the first value
+    alpha = 2 / (span + 1)
+    averages = pd.Series(np.nan, index = values.index)
+    average = values.iloc[0]
+    for position in range(len(values)):
+        average = alpha * values.iloc[position] + (1 - alpha) * average if position else average
+        averages.iloc[position] = average
+    return averages
+
+@pytest.mark.parametrize('period', [2, 14, 30])
+def test_rsi_matches_wilder_smoothing(period):
+    price_data = gapping_price_history(120)
+    changes = price_data['Close'].diff().iloc[1:]
+    average_gains = wilder_reference(changes.clip(lower = 0), period)
+    average_losses = wilder_reference((-changes).clip(lower = 0), period)
+    expected = pd.concat([pd.Series([np.nan]), 100 - 100 / (1 + average_gains / average_losses)]).to_numpy()
+    rsi = TechnicalIndicators(price_data).lines('RSI', period, 0, len(price_data))[0]
+    assert np.isnan(rsi[:period]).all()
+    np.testing.assert_allclose(rsi, expected, rtol = 1e-10)
+
+def test_rsi_of_rising_prices_is_100():
+    price_data = price_history(30)
+    price_data['Close'] = np.arange(100.0, 130.0)
+    rsi = TechnicalIndicators(price_data).lines('RSI', 14, 0, 30)[0]
+    np.testing.assert_array_equal(rsi[14:], 100.0)
+
+def test_macd_matches_exponential_averages():
+    price_data = gapping_price_history(120)
+    close = price_data['Close'].reset_index(drop = True)
+    macd_line = ema_reference(close, 12) - ema_reference(close, 26)
+    signal_line = ema_reference(macd_line, 9)
+    # the period is ignored for MACD
+    lines = TechnicalIndicators(price_data).lines('MACD', 14, 0, len(price_data))
+    assert len(lines) == 3
+    for line, expected in zip(lines, [macd_line, signal_line, macd_line - signal_line]):
+        np.testing.assert_allclose(line, expected.to_numpy(), rtol = 1e-10, atol = 1e-12)
+
+@pytest.mark.parametrize('period', [1, 14, 30])
+def test_atr_matches_wilder_average_of_true_ranges(period):
+    price_data = gapping_price_history(120)
+    previous_closes = price_data['Close'].shift()
+    true_ranges = pd.concat([price_data['High'] - price_data['Low'],
+                             (price_data['High'] - previous_closes).abs(),
+                             (price_data['Low'] - previous_closes).abs()], axis = 1).max(axis = 1)
+    # the gaps make the previous close matter
+    assert (true_ranges > price_data['High'] - price_data['Low']).sum() > 10
+    atr = TechnicalIndicators(price_data).lines('ATR', period, 0, len(price_data))[0]
+    np.testing.assert_allclose(atr, wilder_reference(true_ranges, period).to_numpy(), rtol = 1e-10)
+
+def test_drawdown_from_running_peak():
+    price_data = gapping_price_history(120)
+    close = price_data['Close']
+    lines = TechnicalIndicators(price_data).lines('drawdown', None, 0, len(price_data))
+    np.testing.assert_allclose(lines[0], ((close / close.cummax() - 1) * 100).to_numpy(), rtol = 1e-10, atol = 1e-12)
+    price_data = price_history(4)
+    price_data['Close'] = [100.0, 120.0, 90.0, 130.0]
+    np.testing.assert_allclose(TechnicalIndicators(price_data).lines('drawdown', None, 0, 4)[0], [0, 0, -25, 0])
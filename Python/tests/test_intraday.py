@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Intraday mode: ring buffer of the streamed bars, extrema of a sliding window of
+bars, and the charts patched poll after poll on a replayed feed against the same
+charts built in full.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_figure_payload import STOCK_INPUTS
+from dash_requests import apply_patch, post_callback
+from fixtures import ReplayFetcher
+from intraday import BarRingBuffer, IntradayFeed
+from price_analytics import SlidingExtrema, price_extrema
+
+def minute_bars(first_minute, count, seed = 0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, count))
+    return pd.DataFrame({'Date':pd.Timestamp('2025-12-31 09:30') + pd.to_timedelta(np.arange(first_minute, first_minute + count), unit = 'min'),
+                         'Open':close - 0.5,
+                         'High':close + rng.uniform(0, 1, count),
+                         'Low':close - rng.uniform(0, 1, count),
+                         'Close':close})
+
+def test_ring_buffer_wraps_around_and_evicts_the_oldest_bars():
+    buffer = BarRingBuffer(5)
+    first_bars = minute_bars(0, 3)
+    assert buffer.append(first_bars) == 0
+    assert (buffer.first, buffer.count) == (0, 3)
+    # bar 2 (dated like the latest bar held) is replaced, bars 3 to 6 are added and bars 0 and 1 evicted
+    new_bars = minute_bars(2, 5, seed = 1)
+    assert buffer.append(new_bars) == 2
+    assert (buffer.first, buffer.count) == (2, 7)
+    frame = buffer.frame()
+    np.testing.assert_array_equal(frame['Date'].to_numpy(), new_bars['Date'].to_numpy())
+    np.testing.assert_array_equal(frame[['Open', 'High', 'Low', 'Close']].to_numpy(), new_bars[['Open', 'High', 'Low', 'Close']].to_numpy())
+    assert (frame.index == frame['Date']).all()
+    np.testing.assert_array_equal(buffer.dates(), new_bars['Date'].to_numpy())
+    assert buffer.last_date == new_bars['Date'].to_numpy()[-1]
+    # from a bar number on; bars no longer held are left out
+    np.testing.assert_array_equal(buffer.frame(5)['Close'].to_numpy(), new_bars['Close'].to_numpy()[3:])
+    assert len(buffer.frame(0)) == 5
+    # bars older than the latest bar held are ignored
+    assert buffer.append(minute_bars(0, 2)) == 7
+    assert buffer.count == 7
+
+def test_ring_buffer_keeps_the_last_bars_of_a_long_batch():
+    buffer = BarRingBuffer(5)
+    buffer.append(minute_bars(0, 7))
+    long_batch = minute_bars(7, 12, seed = 1)
+    assert buffer.append(long_batch) == 7
+    assert (buffer.first, buffer.count) == (14, 19)
+    np.testing.assert_array_equal(buffer.frame()['Close'].to_numpy(), long_batch['Close'].to_numpy()[-5:])
+
+def assert_same_extrema(sliding_extrema, window_bars, first_number):
+    extrema = sliding_extrema.extrema()
+    for extremum_key, (extremum, positions) in price_extrema(window_bars.reset_index(drop = True)).items():
+        assert extrema[extremum_key][0] == extremum, extremum_key
+        np.testing.assert_array_equal(extrema[extremum_key][1] - first_number, positions)
+
+def test_sliding_extrema_after_eviction():
+    sliding_extrema = SlidingExtrema(4)
+    bars = pd.DataFrame({'High':[10.0, 5, 6, 7, 8, 9], 'Close':[9.0, 4, 5, 6, 7, 8], 'Low':[1.0, 3, 4, 5, 6, 7]})
+    sliding_extrema.add(bars.iloc[:4], 0)
+    assert sliding_extrema.extrema()['max_high'][0] == 10 and sliding_extrema.extrema()['min_low'][0] == 1
+    # bar 0 (the maximum and the minimum) drops out of the window
+    sliding_extrema.add(bars.iloc[4:5], 4)
+    assert_same_extrema(sliding_extrema, bars.iloc[1:5], 1)
+    assert sliding_extrema.extrema()['max_high'] == (8, np.array([4]))
+    assert sliding_extrema.extrema()['min_low'] == (3, np.array([1]))
+    sliding_extrema.add(bars.iloc[5:], 5)
+    assert_same_extrema(sliding_extrema, bars.iloc[2:], 2)
+
+def test_sliding_extrema_of_a_stream_with_partial_bars():
+    # bars arrive in batches, the first bar of a batch replacing the latest (partial) bar
+    rng = np.random.default_rng(0)
+    capacity = 50
+    sliding_extrema = SlidingExtrema(capacity)
+    stream_bars = minute_bars(0, 1)
+    sliding_extrema.add(stream_bars, 0)
+    for batch in range(200):
+        new_bars = minute_bars(len(stream_bars) - 1, int(rng.integers(1, 8)), seed = batch + 1)
+        # ties with the current extrema
+        new_bars.loc[new_bars.index[0], 'High'] = stream_bars['High'].iloc[-capacity:].max()
+        stream_bars = pd.concat([stream_bars.iloc[:-1], new_bars], ignore_index = True)
+        sliding_extrema.add(new_bars, len(stream_bars) - len(new_bars))
+        first_number = max(0, len(stream_bars) - capacity)
+        assert_same_extrema(sliding_extrema, stream_bars.iloc[first_number:], first_number)
+
+POLLS = 30
+
+@pytest.fixture
+def replay(dashboard, monkeypatch):
+    # Intraday feed of the dashboard replaying synthetic 1 minute bars, downloaded on every poll
+    fetcher = ReplayFetcher(history_bars = 2 * dashboard.INTRADAY_BARS, replay_bars = POLLS, allow_synthetic = True)
+    intraday_feed = IntradayFeed(fetcher, capacity = dashboard.INTRADAY_BARS)
+    intraday_feed.refresh_intervals = {interval:refresh_interval * 0 for interval, refresh_interval in intraday_feed.refresh_intervals.items()}
+    monkeypatch.setattr(dashboard, 'intraday_feed', intraday_feed)
+    monkeypatch.setattr(dashboard, 'ASYNC_FETCH_ENABLED', False)
+    return fetcher
+
+def callback_outputs(client, dashboard, input_values, changed_inputs):
+    status, body = post_callback(client, dashboard.app, 'stock_plot.figure', input_values, changed_inputs)
+    assert status == 200, body
+    return json.loads(body)['response']
+
+def update_page(page, outputs):
+    # Apply the callback outputs to the properties shown by the page, as the browser does
+    for component_id, properties in outputs.items():
+        for component_property, value in properties.items():
+            if isinstance(value, dict) and '__dash_patch_update' in value:
+                apply_patch(page[(component_id, component_property)], value)
+            else:
+                page[(component_id, component_property)] = value
+
+def trace_values(trace, key):
+    return np.array([np.nan if value is None else value for value in trace.get(key, [])], dtype = np.float64)
+
+@pytest.mark.filterwarnings('ignore:No recorded fixture')
+@pytest.mark.parametrize('plot_type, moving_average_option, moving_average_type', [('candle', 'display_MA', 'SMA'),
+                                                                                   ('candle', 'display_MA', 'bollinger'),
+                                                                                   ('closing', 'do_not_display_MA', 'SMA')])
+def test_patched_chart_matches_a_new_chart(dashboard, replay, plot_type, moving_average_option, moving_average_type):
+    client = dashboard.server.test_client()
+    input_values = dict(STOCK_INPUTS, **{'stock_interval.value':'1m',
+                                         'stock_plot_type.value':plot_type,
+                                         'moving_average_option.value':moving_average_option,
+                                         'moving_average_type.value':moving_average_type,
+                                         'moving_average_days.value':20})
+    page = {}
+    update_page(page, callback_outputs(client, dashboard, input_values, ['stock_interval.value']))
+    for poll in range(1, POLLS + 1):
+        # one new bar per poll, the oldest bar held drops out of the ring buffer
+        replay.advance()
+        input_values['stock_intraday_poll.n_intervals'] = poll
+        input_values['stock_chart_loaded.data'] = page[('stock_chart_loaded', 'data')]
+        input_values['stock_intraday_state.data'] = page[('stock_intraday_state', 'data')]
+        outputs = callback_outputs(client, dashboard, input_values, ['stock_intraday_poll.n_intervals'])
+        assert '__dash_patch_update' in outputs['stock_plot']['figure']
+        update_page(page, outputs)
+    new_outputs = callback_outputs(client, dashboard, input_values, ['stock_ticker.value'])
+    patched_figure = page[('stock_plot', 'figure')]
+    new_figure = new_outputs['stock_plot']['figure']
+    assert len(patched_figure['data']) == len(new_figure['data'])
+    for patched_trace, new_trace in zip(patched_figure['data'], new_figure['data']):
+        assert patched_trace['x'] == new_trace['x']
+        for key in ['open', 'high', 'low', 'close', 'y']:
+            np.testing.assert_allclose(trace_values(patched_trace, key), trace_values(new_trace, key), rtol = 1e-12)
+    assert len(patched_figure['data'][0]['x']) == dashboard.INTRADAY_BARS
+    # summary table and state of the page
+    for (component_id, component_property), value in page.items():
+        if component_id != 'stock_plot':
+            assert new_outputs[component_id][component_property] == value, component_id
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Refresh schedule of the prefetch scheduler (exchange closes, weekends, daylight
+saving time, retries after a failure) and the background download queue.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from prefetch import FetchQueue, PrefetchScheduler, next_refresh_time
+
+def utc(*arguments):
+    return datetime(*arguments, tzinfo = timezone.utc)
+
+@pytest.mark.parametrize('ticker_symbol, refresh_time', [('AAPL', utc(2024, 1, 10, 21)),       # 16:00 EST
+                                                         ('^GSPC', utc(2024, 1, 10, 21)),
+                                                         ('BP.L', utc(2024, 1, 10, 16, 30)),   # 16:30 GMT
+                                                         ('^FTSE', utc(2024, 1, 10, 16, 30)),
+                                                         ('BAS.DE', utc(2024, 1, 10, 16, 30)), # 17:30 CET
+                                                         ('^GDAXI', utc(2024, 1, 10, 16, 30)),
+                                                         ('AI.PA', utc(2024, 1, 10, 16, 30)),
+                                                         ('NESN.SW', utc(2024, 1, 10, 16, 30)),
+                                                         ('7203.T', utc(2024, 1, 10, 6, 30)),  # 15:30 JST
+                                                         ('^N225', utc(2024, 1, 10, 6, 30)),
+                                                         ('0700.HK', utc(2024, 1, 10, 8)),     # 16:00 HKT
+                                                         ('^HSI', utc(2024, 1, 10, 8)),
+                                                         ('600519.SS', utc(2024, 1, 10, 7))])  # 15:00 CST
+def test_exchange_closes(ticker_symbol, refresh_time):
+    # Wednesday, before every exchange closes
+    assert next_refresh_time(ticker_symbol, utc(2024, 1, 10, 0, 0), timedelta(0)) == refresh_time
+
+def test_refresh_delay_and_same_day():
+    assert next_refresh_time('AAPL', utc(2024, 1, 10, 15), timedelta(minutes = 30)) == utc(2024, 1, 10, 21, 30)
+    # after the close (and the delay): the next business day
+    assert next_refresh_time('AAPL', utc(2024, 1, 10, 21, 30), timedelta(minutes = 30)) == utc(2024, 1, 11, 21, 30)
+
+def test_weekends_are_skipped():
+    # Friday after the close in Tokyo
+    assert next_refresh_time('7203.T', utc(2024, 1, 12, 7), timedelta(0)) == utc(2024, 1, 15, 6, 30)
+    # Saturday in UTC, still Friday (after the close) in New York
+    assert next_refresh_time('AAPL', utc(2024, 1, 13, 1), timedelta(0)) == utc(2024, 1, 15, 21)
+    # Sunday in New York, already Monday in Tokyo
+    assert next_refresh_time('7203.T', utc(2024, 1, 14, 23), timedelta(0)) == utc(2024, 1, 15, 6, 30)
+
+def test_daylight_saving_time():
+    # US clocks move forward on Sunday 10 March 2024: the Friday close is at 21:00 UTC, the Monday close at 20:00 UTC
+    assert next_refresh_time('AAPL', utc(2024, 3, 8, 12), timedelta(minutes = 30)) == utc(2024, 3, 8, 21, 30)
+    assert next_refresh_time('AAPL', utc(2024, 3, 8, 22), timedelta(minutes = 30)) == utc(2024, 3, 11, 20, 30)
+    # European clocks move forward on Sunday 31 March 2024
+    assert next_refresh_time('BP.L', utc(2024, 3, 29, 18), timedelta(minutes = 30)) == utc(2024, 4, 1, 16)
+    assert next_refresh_time('BAS.DE', utc(2024, 3, 29, 18), timedelta(0)) == utc(2024, 4, 1, 15, 30)
+    # and back on Sunday 27 October 2024
+    assert next_refresh_time('BP.L', utc(2024, 10, 25, 18), timedelta(0)) == utc(2024, 10, 28, 16, 30)
+    # no daylight saving time in Tokyo
+    assert next_refresh_time('7203.T', utc(2024, 3, 29, 18), timedelta(0)) == utc(2024, 4, 1, 6, 30)
+
+class FlakyLoader:
+    # Fails for the tickers in failing, records every call
+    def __init__(self, failing):
+        self.failing = set(failing)
+        self.calls = []
+
+    def __call__(self, ticker_symbol, force_refresh):
+        self.calls.append((ticker_symbol, force_refresh))
+        if ticker_symbol in self.failing:
+            raise ConnectionError(f'{ticker_symbol} not available')
+
+def test_failed_load_is_retried_after_the_retry_delay():
+    loader = FlakyLoader(['BAD'])
+    scheduler = PrefetchScheduler(['AAPL', 'BAD'], loader, max_workers = 2,
+                                  refresh_delay = timedelta(minutes = 30), retry_delay = timedelta(minutes = 15))
+    before = datetime.now(timezone.utc)
+    scheduler.run_once(['AAPL', 'BAD'], False)
+    after = datetime.now(timezone.utc)
+    status = scheduler.status()
+    assert sorted(loader.calls) == [('AAPL', False), ('BAD', False)]
+    assert not scheduler.is_loaded('BAD') and status['BAD']['failures'] == 1
+    assert status['BAD']['last_error'] == repr(ConnectionError('BAD not available'))
+    assert before + timedelta(minutes = 15) <= status['BAD']['next_refresh'] <= after + timedelta(minutes = 15)
+    assert scheduler.is_loaded('AAPL') and status['AAPL']['failures'] == 0
+    assert status['AAPL']['next_refresh'] == next_refresh_time('AAPL', status['AAPL']['last_refresh'], timedelta(minutes = 30))
+    # the retry succeeds: back on the exchange schedule, the failure count is kept
+    loader.failing.clear()
+    scheduler.run_once(['BAD'], True)
+    status = scheduler.status()
+    assert scheduler.is_loaded('BAD') and status['BAD']['last_error'] is None and status['BAD']['failures'] == 1
+    assert status['BAD']['next_refresh'] == next_refresh_time('BAD', status['BAD']['last_refresh'], timedelta(minutes = 30))
+
+class BlockingLoader:
+    # Waits for release before returning (or raising error), records every call
+    def __init__(self, error = None):
+        self.release = threading.Event()
+        self.error = error
+        self.calls = []
+
+    def __call__(self, ticker_symbol):
+        self.calls.append(ticker_symbol)
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return ticker_symbol
+
+def test_fetch_queue_runs_one_job_per_ticker():
+    loader = BlockingLoader()
+    queue = FetchQueue(loader, max_workers = 2)
+    queue.submit('AAPL')
+    queue.submit('AAPL')
+    queue.submit('MSFT')
+    queue.submit('AAPL')
+    loader.release.set()
+    queue._jobs['AAPL'].result(5)
+    queue._jobs['MSFT'].result(5)
+    assert sorted(loader.calls) == ['AAPL', 'MSFT']
+    assert queue.take_error('AAPL') is None
+    # once the download has finished, a new one can be queued
+    queue.submit('AAPL')
+    queue._jobs['AAPL'].result(5)
+    assert sorted(loader.calls) == ['AAPL', 'AAPL', 'MSFT']
+
+def test_fetch_queue_error_is_taken_once():
+    error = ConnectionError('AAPL not available')
+    loader = BlockingLoader(error)
+    queue = FetchQueue(loader)
+    queue.submit('AAPL')
+    job = queue._jobs['AAPL']
+    # no error while the download is running
+    assert queue.take_error('AAPL') is None
+    loader.release.set()
+    assert job.exception(5) is error
+    assert queue.take_error('AAPL') is error
+    assert queue.take_error('AAPL') is None
+    # the failed job is forgotten: the next submit downloads again
+    queue.submit('AAPL')
+    assert queue._jobs['AAPL'] is not job
+    assert queue._jobs['AAPL'].exception(5) is error
+    assert loader.calls == ['AAPL', 'AAPL']
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental refresh of the price store (PriceStore.refresh / needs_full_reload)
+against a fake data source.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_store import PriceStore, file_lock
+
+def daily_bars(periods, end = '2024-06-28'):
+    # Bars in the format returned by yfinance (timezone aware dates, extra columns)
+    dates = pd.bdate_range(end = end, periods = periods, tz = 'America/New_York')
+    close = 100 + np.arange(periods, dtype = np.float64)
+    return pd.DataFrame({'Date':dates,
+                         'Open':close - 0.5,
+                         'High':close + 1,
+                         'Low':close - 1,
+                         'Close':close,
+                         'Volume':np.full(periods, 1000.0),
+                         'Dividends':0.0,
+                         'Stock Splits':0.0})
+
+class FakeFetcher:
+    # Serves the rows of bars from start on, and records the start of every call
+    def __init__(self, bars):
+        self.bars = bars
+        self.starts = []
+
+    def fetch(self, ticker_symbol, start = None):
+        self.starts.append(start)
+        if start is None:
+            return self.bars.copy()
+        return self.bars.loc[self.bars['Date'].dt.tz_localize(None) >= pd.Timestamp(start)].reset_index(drop = True)
+
+@pytest.fixture
+def fetcher():
+    return FakeFetcher(daily_bars(30))
+
+@pytest.fixture
+def store(tmp_path, fetcher):
+    return PriceStore(str(tmp_path), fetcher = fetcher, backoff = 0)
+
+def test_appended_bar_is_merged(store, fetcher):
+    store.get('TEST')
+    fetcher.bars = daily_bars(31, end = '2024-07-01')
+    ticker_data = store.refresh('TEST')
+    # only the bars from the second to last stored bar on are downloaded
+    assert fetcher.starts == [None, pd.Timestamp('2024-06-27')]
+    assert len(ticker_data) == 31
+    assert ticker_data['Date'].iloc[-1] == pd.Timestamp('2024-07-01')
+    assert ticker_data.index.is_monotonic_increasing and ticker_data.index.is_unique
+    np.testing.assert_array_equal(ticker_data['Close'].to_numpy(), fetcher.bars['Close'].to_numpy())
+
+def test_revised_overlapping_bar_forces_full_reload(store, fetcher):
+    store.get('TEST')
+    # a 2:1 split: the whole history is adjusted, including the bars already stored
+    revised_bars = daily_bars(31, end = '2024-07-01')
+    revised_bars[['Open', 'High', 'Low', 'Close']] /= 2
+    fetcher.bars = revised_bars
+    ticker_data = store.refresh('TEST')
+    assert fetcher.starts == [None, pd.Timestamp('2024-06-27'), None]
+    np.testing.assert_allclose(ticker_data['Close'].to_numpy(), revised_bars['Close'].to_numpy())
+    np.testing.assert_allclose(store.load('TEST')['Close'].to_numpy(), revised_bars['Close'].to_numpy())
+
+def test_fresh_store_skips_the_fetch(store, fetcher):
+    first_data = store.get('TEST')
+    ticker_data = store.get('TEST')
+    assert fetcher.starts == [None]
+    pd.testing.assert_frame_equal(ticker_data, first_data)
+
+def test_stale_store_is_refreshed(tmp_path, fetcher):
+    store = PriceStore(str(tmp_path), fetcher = fetcher, max_staleness = timedelta(0), backoff = 0)
+    store.get('TEST')
+    store.get('TEST')
+    assert fetcher.starts == [None, pd.Timestamp('2024-06-27')]
+
+def test_file_lock_is_exclusive(tmp_path):
+    lock_path = str(tmp_path / 'TEST.lock')
+    with file_lock(lock_path) as locked:
+        assert locked
+        with file_lock(lock_path, blocking = False) as other_locked:
+            assert not other_locked
+    with file_lock(lock_path, blocking = False) as locked:
+        assert locked
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Moving averages of RollingStatistics against the pandas rolling / ewm references,
+on a full history, after bars are appended and after the history is rewritten.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_analytics import RollingStatistics
+
+def closing_bars(periods, seed = 0, end = '2024-06-28'):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, periods)))
+    return pd.DataFrame({'Date':pd.bdate_range(end = end, periods = periods), 'Close':close})
+
+def assert_matches_pandas(statistics, price_data, window, start = 0, stop = None):
+    stop = len(price_data) if stop is None else stop
+    closing_prices = price_data['Close']
+    np.testing.assert_allclose(statistics.simple_moving_average(start, stop, window),
+                               closing_prices.rolling(window).mean().to_numpy()[start:stop], rtol = 1e-10)
+    mean, upper, lower = statistics.bollinger_bands(start, stop, window)
+    deviations = 2 * closing_prices.rolling(window).std().to_numpy()[start:stop]
+    # the differences of the sums of squares lose some precision where the deviation is tiny
+    np.testing.assert_allclose(upper - mean, deviations, rtol = 1e-6, atol = 1e-6)
+    np.testing.assert_allclose(mean - lower, deviations, rtol = 1e-6, atol = 1e-6)
+    np.testing.assert_allclose(statistics.exponential_moving_average(start, stop, window),
+                               closing_prices.ewm(span = window, adjust = False).mean().to_numpy()[start:stop], rtol = 1e-10)
+
+@pytest.mark.parametrize('window', [1, 2, 20, 200])
+def test_full_history(window):
+    price_data = closing_bars(500)
+    assert_matches_pandas(RollingStatistics(price_data), price_data, window)
+
+def test_window_slice():
+    price_data = closing_bars(500)
+    assert_matches_pandas(RollingStatistics(price_data), price_data, 50, start = 30, stop = 420)
+
+def test_missing_prices():
+    price_data = closing_bars(300)
+    price_data.loc[100, 'Close'] = np.nan
+    statistics = RollingStatistics(price_data)
+    reference = price_data['Close'].rolling(20).mean().to_numpy()
+    np.testing.assert_allclose(statistics.simple_moving_average(0, 300, 20), reference, rtol = 1e-10)
+    assert np.isnan(statistics.simple_moving_average(100, 120, 20)).all()
+
+def test_extend_and_replace_last():
+    price_data = closing_bars(400)
+    statistics = RollingStatistics(price_data.iloc[:300])
+    # averages computed before the extension are continued
+    statistics.exponential_moving_average(0, 300, 10)
+    statistics.extend(price_data.iloc[300:350])
+    # the last bar was partial: replaced by the first bar of the next batch
+    partial_bar = price_data.iloc[350:351].assign(Close = 1.0)
+    statistics.extend(partial_bar)
+    statistics.extend(price_data.iloc[350:], replace_last = True)
+    assert_matches_pandas(statistics, price_data, 10)
+    assert_matches_pandas(statistics, price_data, 30, start = 250)
+
+def test_update_with_appended_bars():
+    price_data = closing_bars(400)
+    statistics = RollingStatistics(price_data.iloc[:390])
+    statistics.exponential_moving_average(0, 390, 20)
+    # the previous last bar is revised (partial bar) and new bars are appended
+    refreshed_data = price_data.copy()
+    refreshed_data.loc[389, 'Close'] *= 1.01
+    statistics.update(refreshed_data)
+    assert_matches_pandas(statistics, refreshed_data, 20)
+
+def test_update_with_rewritten_history():
+    price_data = closing_bars(400)
+    statistics = RollingStatistics(price_data)
+    statistics.exponential_moving_average(0, 400, 20)
+    # dividend adjusted history: every price changes
+    adjusted_data = price_data.assign(Close = price_data['Close'] * 0.97)
+    statistics.update(adjusted_data)
+    assert_matches_pandas(statistics, adjusted_data, 20)
+    # shorter history starting at another date
+    shorter_data = closing_bars(250, seed = 1, end = '2024-07-31')
+    statistics.update(shorter_data)
+    assert_matches_pandas(statistics, shorter_data, 20)
+
+def test_exponential_averages_are_bounded():
+    price_data = closing_bars(1000)
+    statistics = RollingStatistics(price_data)
+    base_bytes = statistics.nbytes()
+    for span in range(2, 20):
+        statistics.exponential_moving_average(0, 1000, span)
+    statistics.exponential_moving_average(0, 1000, 16) # most recently used again
+    statistics.exponential_moving_average(0, 1000, 30)
+    assert list(statistics._exponential_averages) == [18, 19, 16, 30]
+    assert statistics.nbytes() == base_bytes + RollingStatistics.MAX_EXPONENTIAL_AVERAGES * 1000 * 8
+    # a span that was dropped is computed again
+    assert_matches_pandas(statistics, price_data, 2)
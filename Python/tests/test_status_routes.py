@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of the dashboard: status routes served only on request and
+latency of the ticker data loads on the background download path.
+"""
+
+def ticker_data_load_count(dashboard):
+    for line in dashboard.ticker_data_seconds.render():
+        if line.startswith('dashboard_ticker_data_seconds_count'):
+            return int(line.split()[-1])
+    return 0
+
+def test_status_routes_are_not_served_by_default(dashboard):
+    assert not dashboard.STATUS_ROUTES_ENABLED
+    client = dashboard.server.test_client()
+    for path in ['/metrics', '/cache_status', '/prefetch_status', '/forecast_status']:
+        # Dash serves its page on every path it has no route for
+        response = client.get(path)
+        assert response.mimetype == 'text/html'
+        assert b'dashboard_' not in response.data and b'evictions' not in response.data
+    assert client.get('/ready').status_code in (200, 503)
+
+def test_background_downloads_are_timed(dashboard):
+    count = ticker_data_load_count(dashboard)
+    dashboard.ticker_cache.invalidate('AMZN')
+    dashboard.fetch_queue.submit('AMZN')
+    dashboard.fetch_queue._jobs['AMZN'].result()
+    assert ticker_data_load_count(dashboard) == count + 1
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Summary table extrema (price_extrema / summary_table_records) against the
+original construct_data_table, kept as the reference in
+benchmarks/benchmark_summary_table.py.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_summary_table import reference_records, vectorized_records, synthetic_window
+
+Y_LABEL = 'Price ($)'
+
+def price_window(close, high = None, low = None):
+    dates = pd.bdate_range('2024-01-01', periods = len(close))
+    close = np.asarray(close, dtype = np.float64)
+    return pd.DataFrame({'Date':dates,
+                         'Open':close,
+                         'High':close + 1 if high is None else np.asarray(high, dtype = np.float64),
+                         'Low':close - 1 if low is None else np.asarray(low, dtype = np.float64),
+                         'Close':close},
+                        index = pd.DatetimeIndex(dates))
+
+@pytest.mark.parametrize('length', [30, 1000])
+@pytest.mark.parametrize('seed', range(5))
+def test_synthetic_windows_match_the_reference(length, seed):
+    # whole number prices, so most windows have tied extrema
+    price_data = synthetic_window(length, seed)
+    assert vectorized_records(price_data, Y_LABEL) == reference_records(price_data, Y_LABEL)
+
+def test_tied_highs_and_lows_are_listed_in_date_order():
+    price_data = price_window([10, 12, 11, 12, 10], high = [13, 15, 14, 15, 13], low = [9, 11, 9, 11, 9])
+    records = vectorized_records(price_data, Y_LABEL)
+    assert records == reference_records(price_data, Y_LABEL)
+    assert [record[' '] for record in records] == ['Maximum Price', '', 'Maximum Closing Price', '',
+                                                   'Minimum Closing Price', '', 'Minimum Price', '', '']
+
+def test_one_row_window():
+    price_data = price_window([10])
+    records = vectorized_records(price_data, Y_LABEL)
+    assert records == reference_records(price_data, Y_LABEL)
+    assert len(records) == 4
+
+def test_empty_window():
+    # the original implementation failed on an empty window, the table is now left empty
+    price_data = price_window([])
+    with pytest.raises(ValueError):
+        reference_records(price_data, Y_LABEL)
+    assert vectorized_records(price_data, Y_LABEL) == []
+
+@pytest.mark.parametrize('nan_positions', [[2], [1, 3], [4]])
+def test_nan_closes_are_skipped(nan_positions):
+    close = np.array([10.0, 12.0, 11.0, 9.0, 12.0, 10.0])
+    price_data = price_window(close, high = close + 1, low = close - 1)
+    price_data.loc[price_data.index[nan_positions], 'Close'] = np.nan
+    assert vectorized_records(price_data, Y_LABEL) == reference_records(price_data, Y_LABEL)